@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Callable, Coroutine
+
+from pydantic import BaseModel
+
+from exceptions import (
+    PredictionBodyTooLargeError,
+    PredictionDeadlineExceededError,
+    PredictionOverloadedError,
+    PredictionTooLargeError
+)
+
+
+class AdmissionCounters(BaseModel):
+    admitted_requests: int = 0
+    admitted_samples: int = 0
+    rejected_too_large: int = 0
+    rejected_overloaded: int = 0
+    deadline_exceeded: int = 0
+    in_flight_requests: int = 0
+    in_flight_samples: int = 0
+    peak_in_flight_samples: int = 0
+
+
+class AdmissionController:
+    def __init__(
+            self,
+            max_in_flight_samples: int | None = None,
+            max_samples_per_request: int | None = None,
+            deadline_seconds: float | None = None,
+            retry_after_seconds: int = 1,
+            max_request_bytes: int | None = None
+    ) -> None:
+        self.max_in_flight_samples = max_in_flight_samples
+        self.max_samples_per_request = max_samples_per_request
+        self.deadline_seconds = deadline_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.max_request_bytes = max_request_bytes
+        self._counters = AdmissionCounters()
+        self._lock = threading.Lock()
+
+    def precheck(self, content_length: int | None) -> None:
+        # Runs before the body is read, so a request that cannot be admitted does not pay for parsing and validating
+        # it; the sample count is only known afterwards and is still checked by run
+        with self._lock:
+            if self.max_request_bytes is not None and content_length is not None and (
+                content_length > self.max_request_bytes
+            ):
+                self._counters.rejected_too_large += 1
+                raise PredictionBodyTooLargeError(n_bytes=content_length, max_bytes=self.max_request_bytes)
+            if (
+                self.max_in_flight_samples is not None
+                and self._counters.in_flight_samples >= self.max_in_flight_samples
+            ):
+                self._counters.rejected_overloaded += 1
+                raise PredictionOverloadedError(retry_after_seconds=self.retry_after_seconds)
+
+    def _admit(self, n_samples: int) -> None:
+        limits = [limit for limit in (self.max_samples_per_request, self.max_in_flight_samples) if limit is not None]
+        with self._lock:
+            if limits and n_samples > min(limits):
+                self._counters.rejected_too_large += 1
+                raise PredictionTooLargeError(n_samples=n_samples, max_samples=min(limits))
+            if (
+                self.max_in_flight_samples is not None
+                and self._counters.in_flight_samples + n_samples > self.max_in_flight_samples
+            ):
+                self._counters.rejected_overloaded += 1
+                raise PredictionOverloadedError(retry_after_seconds=self.retry_after_seconds)
+            self._counters.admitted_requests += 1
+            self._counters.admitted_samples += n_samples
+            self._counters.in_flight_requests += 1
+            self._counters.in_flight_samples += n_samples
+            self._counters.peak_in_flight_samples = max(
+                self._counters.peak_in_flight_samples, self._counters.in_flight_samples
+            )
+
+    def _release(self, n_samples: int) -> None:
+        with self._lock:
+            self._counters.in_flight_requests -= 1
+            self._counters.in_flight_samples -= n_samples
+
+    def _release_when_done(self, task: asyncio.Future, n_samples: int) -> None:
+        self._release(n_samples)
+        # Retrieves the outcome of work abandoned at the deadline, so its error is not reported as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, n_samples: int, func: Callable[..., Coroutine], *args) -> Any:
+        # Rejection happens before any work is scheduled, so an overloaded service answers without queueing
+        self._admit(n_samples)
+        task = asyncio.ensure_future(func(*args))
+        # Executor threads cannot be interrupted, so samples stay charged until the work finishes, not until the
+        # deadline, otherwise new requests would be admitted while abandoned ones still hold the CPU
+        task.add_done_callback(lambda done: self._release_when_done(done, n_samples))
+        if self.deadline_seconds is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=self.deadline_seconds)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counters.deadline_exceeded += 1
+            raise PredictionDeadlineExceededError(
+                deadline_seconds=self.deadline_seconds, retry_after_seconds=self.retry_after_seconds
+            )
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            counters = self._counters.dict()
+        return {
+            **counters,
+            "max_in_flight_samples": self.max_in_flight_samples,
+            "max_samples_per_request": self.max_samples_per_request,
+            "max_request_bytes": self.max_request_bytes,
+            "deadline_seconds": self.deadline_seconds
+        }
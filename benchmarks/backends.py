@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import time
+from os.path import dirname, join
+
+import numpy as np
+
+import services
+from data.extractors import NearestNeighborsBasedRepresentativenessExtractor
+from data.models import Dataset, Sample
+from data.processors import DatasetProcessor
+from ml.models import REGRESSOR_BACKENDS, EnsembleRandomForestBasedRegressor, get_regressor_backend
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+HOLDOUT_FRACTION: float = 0.1
+
+
+def _load_dataset(path: str) -> Dataset:
+    with open(path) as file:
+        return Dataset(**json.load(file))
+
+
+def _split_holdout(chunk: Dataset) -> tuple[Dataset, Dataset]:
+    holdout_size = max(1, int(len(chunk) * HOLDOUT_FRACTION))
+    return Dataset(samples=chunk.samples[holdout_size:]), Dataset(samples=chunk.samples[:holdout_size])
+
+
+def _measure_latency(regressor: EnsembleRandomForestBasedRegressor, samples: list[Sample], repeats: int) -> float:
+    async def _predict() -> None:
+        await regressor.predict_batch(samples)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        asyncio.run(_predict())
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def benchmark_backend(
+        backend: str, chunks: list[Dataset], holdouts: list[Dataset], labeling_seconds: float, repeats: int
+) -> dict:
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in chunks:
+        regressor.register_regressor(get_regressor_backend(backend)())
+
+    start = time.perf_counter()
+    asyncio.run(regressor.fit(chunks))
+    fit_seconds = time.perf_counter() - start
+    requires_labels = regressor.get_regressors()[0].requires_labels
+
+    holdout_samples = [sample for holdout in holdouts for sample in holdout.samples]
+    targets = np.array([sample.representativeness for sample in holdout_samples])
+    predictions = asyncio.run(regressor.predict_batch(holdout_samples))
+
+    return {
+        "backend": backend,
+        "fit_seconds": round(fit_seconds, 3),
+        "train_seconds": round(fit_seconds + (labeling_seconds if requires_labels else 0), 3),
+        "predict_1_ms": round(_measure_latency(regressor, holdout_samples[:1], repeats), 3),
+        "predict_1000_ms": round(_measure_latency(regressor, holdout_samples[:1000], repeats), 3),
+        "model_megabytes": round(
+            sum(len(pickle.dumps(member.model)) for member in regressor.get_regressors()) / 2 ** 20, 3
+        ),
+        "holdout_mae": round(float(np.mean(np.abs(predictions - targets))), 5),
+    }
+
+
+def format_table(results: list[dict]) -> str:
+    columns = list(results[0])
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + "|".join("---" for _ in columns) + "|",
+    ]
+    lines.extend("| " + " | ".join(str(result[column]) for column in columns) + " |" for result in results)
+    return "\n".join(lines)
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare fit time, predict latency and size of regressor backends")
+    parser.add_argument("--dataset", default="artifacts/dataset_10_000_samples_10_features.json")
+    parser.add_argument("--splits", type=int, default=services.NUMBER_OF_ENSEMBLE_MODELS)
+    parser.add_argument("--backends", nargs="+", default=list(REGRESSOR_BACKENDS))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default=join(RESULTS_DIRECTORY, "backends.json"))
+    args = parser.parse_args(arguments)
+
+    chunks = asyncio.run(DatasetProcessor.split(_load_dataset(args.dataset), args.splits))
+
+    extractor = NearestNeighborsBasedRepresentativenessExtractor()
+    start = time.perf_counter()
+    labeled_chunks = [DatasetProcessor.run_labeling(chunk, extractor) for chunk in chunks]
+    labeling_seconds = time.perf_counter() - start
+    chunks, holdouts = zip(*map(_split_holdout, labeled_chunks))
+
+    results = [
+        benchmark_backend(backend, list(chunks), list(holdouts), labeling_seconds, args.repeats)
+        for backend in args.backends
+    ]
+
+    os.makedirs(dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({"dataset": args.dataset, "splits": args.splits, "results": results}, file, indent=2)
+    print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
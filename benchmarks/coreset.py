@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import time
+from os.path import dirname, join
+
+import numpy as np
+
+import services
+from data.extractors import CoresetBasedRepresentativenessExtractor, NearestNeighborsBasedRepresentativenessExtractor
+from data.models import Dataset
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+DATASETS: tuple[str, ...] = (
+    "artifacts/dataset_1_000_samples_5_features.json",
+    "artifacts/dataset_10_000_samples_10_features.json"
+)
+
+
+def _load_features(path: str) -> np.ndarray:
+    with open(path) as file:
+        return Dataset(**json.load(file)).get_feature_representation()
+
+
+def _timed(extractor, features: np.ndarray) -> tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    representativeness = extractor.extract(features)
+    return representativeness, time.perf_counter() - start
+
+
+def _rank_correlation(first: np.ndarray, second: np.ndarray) -> float:
+    return float(np.corrcoef(np.argsort(np.argsort(first)), np.argsort(np.argsort(second)))[0, 1])
+
+
+def _clustered_features(n_rows: int, n_features: int, n_clusters: int = 8) -> np.ndarray:
+    # Clusters of different spread give the data density structure at the scale a coreset can resolve
+    random_state = np.random.default_rng(0)
+    centers = random_state.random((n_clusters, n_features)) * 10
+    scales = np.geomspace(0.1, 2.0, n_clusters)
+    labels = random_state.integers(n_clusters, size=n_rows)
+    return (centers[labels] + random_state.normal(size=(n_rows, n_features)) * scales[labels, np.newaxis]).round(5)
+
+
+def measure_error(
+        name: str, features: np.ndarray, coreset_sizes: list[int], strategies: list[str], min_rank_correlation: float
+) -> list[dict]:
+    # The first extraction pays for importing sklearn, which would inflate the exact timing
+    NearestNeighborsBasedRepresentativenessExtractor().extract(features[:100])
+    exact, exact_seconds = _timed(NearestNeighborsBasedRepresentativenessExtractor(), features)
+
+    results = []
+    for strategy in strategies:
+        for coreset_size in coreset_sizes:
+            extractor = CoresetBasedRepresentativenessExtractor(coreset_size, strategy=strategy, random_state=0)
+            approximate, seconds = _timed(extractor, features)
+            errors = np.abs(approximate - exact)
+            probe_rank_correlation = extractor.probe_rank_correlation(features, None, approximate)
+            # With the threshold the service applies, the probe cost is paid and rejected labels are redone exactly
+            gated = CoresetBasedRepresentativenessExtractor(
+                coreset_size, strategy=strategy, random_state=0, min_rank_correlation=min_rank_correlation
+            )
+            _, gated_seconds = _timed(gated, features)
+            results.append({
+                "dataset": name,
+                "strategy": strategy,
+                "coreset_size": coreset_size,
+                "mae": round(float(np.mean(errors)), 5),
+                "max_error": round(float(np.max(errors)), 5),
+                "rank_correlation": round(_rank_correlation(approximate, exact), 4),
+                "probe_rank_correlation": round(probe_rank_correlation, 4),
+                "accepted": probe_rank_correlation >= min_rank_correlation,
+                "exact_seconds": round(exact_seconds, 3),
+                "coreset_seconds": round(seconds, 3),
+                "gated_seconds": round(gated_seconds, 3),
+                "speedup": round(exact_seconds / seconds, 1)
+            })
+    return results
+
+
+def measure_scaling(rows: list[int], n_features: int, coreset_size: int) -> list[dict]:
+    results = []
+    for n_rows in rows:
+        features = np.random.random((n_rows, n_features)).round(5)
+        _, seconds = _timed(CoresetBasedRepresentativenessExtractor(coreset_size, random_state=0), features)
+        results.append({
+            "rows": n_rows,
+            "coreset_seconds": round(seconds, 3),
+            "rows_per_second": round(n_rows / seconds)
+        })
+    return results
+
+
+def format_table(results: list[dict]) -> str:
+    columns = list(results[0])
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + "|".join("---" for _ in columns) + "|",
+    ]
+    lines.extend("| " + " | ".join(str(result[column]) for column in columns) + " |" for result in results)
+    return "\n".join(lines)
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare coreset-based labels with exact k-NN labels")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS))
+    parser.add_argument("--coreset-sizes", nargs="+", type=int, default=[250, 500, 1000])
+    parser.add_argument(
+        "--strategies", nargs="+", default=list(CoresetBasedRepresentativenessExtractor.SAMPLING_STRATEGIES)
+    )
+    parser.add_argument("--clustered-rows", type=int, default=10_000, help="Rows of a synthetic clustered dataset")
+    parser.add_argument(
+        "--min-rank-correlation", type=float, default=services.LABELING_CORESET_MIN_RANK_CORRELATION
+    )
+    parser.add_argument("--scaling-rows", nargs="+", type=int, default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--scaling-features", type=int, default=10)
+    parser.add_argument("--output", default=join(RESULTS_DIRECTORY, "coreset.json"))
+    args = parser.parse_args(arguments)
+
+    datasets = {os.path.basename(path): _load_features(path) for path in args.datasets}
+    if args.clustered_rows:
+        datasets["clustered"] = _clustered_features(args.clustered_rows, args.scaling_features)
+    error = [
+        result
+        for name, features in datasets.items()
+        for result in measure_error(name, features, args.coreset_sizes, args.strategies, args.min_rank_correlation)
+    ]
+    scaling = measure_scaling(args.scaling_rows, args.scaling_features, max(args.coreset_sizes))
+
+    os.makedirs(dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({"error": error, "scaling": scaling}, file, indent=2)
+    print(format_table(error))
+    print()
+    print(format_table(scaling))
+
+
+if __name__ == "__main__":
+    main()
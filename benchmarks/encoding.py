@@ -0,0 +1,68 @@
+import argparse
+import gzip
+import json
+import os
+import timeit
+from os.path import dirname, join
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from main import GZIP_COMPRESS_LEVEL, GZIP_MINIMUM_SIZE
+from responses import ARROW_MEDIA_TYPE, ENCODERS, JSON_MEDIA_TYPE, NPY_MEDIA_TYPE
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+
+
+def _encode_with_jsonable_encoder(predictions: np.ndarray) -> bytes:
+    representativeness = [round(value, 5) for value in predictions]
+    return JSONResponse(content=jsonable_encoder({"representativeness": representativeness})).body
+
+
+def _gzip_json(predictions: np.ndarray) -> bytes:
+    return gzip.compress(ENCODERS[JSON_MEDIA_TYPE](predictions), compresslevel=GZIP_COMPRESS_LEVEL)
+
+
+def benchmark_batch_size(batch_size: int, repeats: int) -> dict:
+    predictions = np.round(np.random.default_rng(0).random(batch_size), 5)
+    encoders = {
+        "jsonable_encoder": _encode_with_jsonable_encoder,
+        "orjson": ENCODERS[JSON_MEDIA_TYPE],
+        "orjson_gzip": _gzip_json,
+        "npy": ENCODERS[NPY_MEDIA_TYPE],
+        "arrow": ENCODERS[ARROW_MEDIA_TYPE],
+    }
+
+    result = {"batch_size": batch_size}
+    for name, encoder in encoders.items():
+        seconds = min(timeit.repeat(lambda: encoder(predictions), number=1, repeat=repeats))
+        result[f"{name}_us"] = round(seconds * 1e6, 1)
+        result[f"{name}_bytes"] = len(encoder(predictions))
+    return result
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure /predict response encoding cost per batch size")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[10, 100, 1_000, 10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default=join(RESULTS_DIRECTORY, "encoding.json"))
+    args = parser.parse_args(arguments)
+
+    results = [benchmark_batch_size(batch_size, args.repeats) for batch_size in args.batch_sizes]
+
+    os.makedirs(dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({
+            "gzip_minimum_size": GZIP_MINIMUM_SIZE, "gzip_compress_level": GZIP_COMPRESS_LEVEL, "results": results
+        }, file, indent=2)
+
+    columns = ["batch_size"] + [column for column in results[0] if column.endswith("_us")]
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    for result in results:
+        print("| " + " | ".join(str(result[column]) for column in columns) + " |")
+
+
+if __name__ == "__main__":
+    main()
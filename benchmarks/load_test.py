@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from os.path import dirname, join
+
+import httpx
+import numpy as np
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+TRAINING_FINISHED_STATUSES: set[str] = {"Training has finished", "An error has occurred during training"}
+
+
+class EndpointStatistics:
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.latencies: list[float] = []
+        self.status_codes: dict[int, int] = {}
+        self.errors: int = 0
+
+    def record(self, latency: float, status_code: int | None) -> None:
+        self.latencies.append(latency)
+        if status_code is None or status_code >= 400:
+            self.errors += 1
+        if status_code is not None:
+            self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+
+    def summarize(self, duration: float) -> dict:
+        requests = len(self.latencies)
+        latencies = np.array(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 95, 99]) if requests else [None, None, None]
+        return {
+            "requests": requests,
+            "throughput_rps": round(requests / duration, 3) if duration > 0 else None,
+            "error_rate": round(self.errors / requests, 5) if requests else None,
+            "status_codes": {str(code): count for code, count in sorted(self.status_codes.items())},
+            "latency_ms": {
+                "p50": _round_or_none(percentiles[0]),
+                "p95": _round_or_none(percentiles[1]),
+                "p99": _round_or_none(percentiles[2]),
+                "max": _round_or_none(latencies.max() if requests else None),
+            }
+        }
+
+
+def _round_or_none(value: float | None) -> float | None:
+    return None if value is None else round(float(value), 3)
+
+
+def _find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _load_dataset(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def _create_samples(batch_size: int, features: int) -> list[dict]:
+    return [
+        {"features": [round(random.random(), 5) for _ in range(features)]}
+        for _ in range(batch_size)
+    ]
+
+
+async def _timed_request(
+        client: httpx.AsyncClient, statistics: EndpointStatistics, method: str, url: str, **kwargs
+) -> httpx.Response | None:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        statistics.record(time.perf_counter() - start, None)
+        return None
+    statistics.record(time.perf_counter() - start, response.status_code)
+    return response
+
+
+async def _get_start_time(client: httpx.AsyncClient) -> str | None:
+    return (await client.get("/status")).json().get("start_time")
+
+
+async def _wait_for_training(client: httpx.AsyncClient, timeout: float, previous_start_time: str | None) -> dict:
+    # Right after a submission /status can still report the previous run as finished, which is told apart by its
+    # start time, or by having seen the new run in progress when both started within the same second
+    deadline = time.perf_counter() + timeout
+    started = False
+    while time.perf_counter() < deadline:
+        status = (await client.get("/status")).json()
+        if status.get("status") not in TRAINING_FINISHED_STATUSES:
+            started = True
+        elif started or status.get("start_time") != previous_start_time:
+            return status
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"Training has not finished within {timeout} seconds")
+
+
+async def _drive_at_rate(qps: float, duration: float, request_factory, tasks: list[asyncio.Task]) -> None:
+    # Open-loop generator: requests are scheduled on a fixed clock regardless of how long the previous
+    # ones take, so latency under overload is not hidden by coordinated omission.
+    if qps <= 0:
+        return
+    interval = 1 / qps
+    start = time.perf_counter()
+    sent = 0
+    while True:
+        scheduled_at = start + sent * interval
+        if scheduled_at - start >= duration:
+            break
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(request_factory()))
+        sent += 1
+
+
+async def _run_training(
+        client: httpx.AsyncClient, statistics: EndpointStatistics, dataset: dict, delay: float, timeline: dict
+) -> None:
+    await asyncio.sleep(delay)
+    previous_start_time = await _get_start_time(client)
+    timeline["train_submitted_at"] = round(time.perf_counter() - timeline["_start"], 3)
+    await _timed_request(client, statistics, "POST", "/train", json=dataset)
+    status = await _wait_for_training(client, timeout=3600, previous_start_time=previous_start_time)
+    timeline["train_finished_at"] = round(time.perf_counter() - timeline["_start"], 3)
+    timeline["train_status"] = status
+
+
+async def run_load_test(
+        base_url: str,
+        duration: float,
+        predict_qps: float,
+        status_qps: float,
+        batch_size: int,
+        features: int,
+        warmup_dataset: dict | None,
+        train_dataset: dict | None,
+        train_at: float | None
+) -> dict:
+    statistics = {
+        endpoint: EndpointStatistics(endpoint) for endpoint in ("/predict", "/status", "/train")
+    }
+    timeline: dict = {}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        if warmup_dataset is not None:
+            previous_start_time = await _get_start_time(client)
+            await client.post("/train", json=warmup_dataset)
+            await _wait_for_training(client, timeout=3600, previous_start_time=previous_start_time)
+
+        samples = _create_samples(batch_size, features)
+        tasks: list[asyncio.Task] = []
+        timeline["_start"] = time.perf_counter()
+
+        generators = [
+            _drive_at_rate(
+                predict_qps, duration,
+                lambda: _timed_request(client, statistics["/predict"], "POST", "/predict", json=samples),
+                tasks
+            ),
+            _drive_at_rate(
+                status_qps, duration,
+                lambda: _timed_request(client, statistics["/status"], "GET", "/status"),
+                tasks
+            )
+        ]
+        training = None
+        if train_dataset is not None and train_at is not None:
+            training = asyncio.create_task(
+                _run_training(client, statistics["/train"], train_dataset, train_at, timeline)
+            )
+
+        await asyncio.gather(*generators)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - timeline["_start"]
+        if training is not None:
+            await training
+        timeline.pop("_start")
+
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "timeline": timeline,
+        "endpoints": {
+            endpoint: endpoint_statistics.summarize(elapsed)
+            for endpoint, endpoint_statistics in statistics.items()
+            if endpoint_statistics.latencies
+        }
+    }
+
+
+def _start_server(port: int) -> subprocess.Popen:
+    root = dirname(dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"
+        ],
+        cwd=root
+    )
+
+
+def _wait_for_server(base_url: str, timeout: float = 30) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{base_url}/status").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"Server at {base_url} has not started within {timeout} seconds")
+
+
+def parse_arguments(arguments: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure /predict and /status latency while training runs")
+    parser.add_argument("--url", help="Base URL of a running service. A local uvicorn instance is started if omitted")
+    parser.add_argument("--duration", type=float, default=30, help="Load duration in seconds")
+    parser.add_argument("--predict-qps", type=float, default=20)
+    parser.add_argument("--status-qps", type=float, default=5)
+    parser.add_argument("--batch-size", type=int, default=10, help="Number of samples per /predict request")
+    parser.add_argument("--warmup-dataset", help="Dataset the model is trained on before the load starts")
+    parser.add_argument("--train-dataset", help="Dataset submitted to /train in the middle of the run")
+    parser.add_argument("--train-at", type=float, help="Seconds after the load start to submit --train-dataset")
+    parser.add_argument("--output", help="Path of the JSON results file")
+    return parser.parse_args(arguments)
+
+
+def main(arguments: list[str] | None = None) -> None:
+    args = parse_arguments(arguments)
+    warmup_dataset = _load_dataset(args.warmup_dataset) if args.warmup_dataset else None
+    train_dataset = _load_dataset(args.train_dataset) if args.train_dataset else None
+    reference_dataset = warmup_dataset or train_dataset
+    features = len(reference_dataset["samples"][0]["features"]) if reference_dataset else 10
+    train_at = args.train_at if args.train_at is not None else (args.duration / 3 if train_dataset else None)
+
+    server, base_url = None, args.url
+    if base_url is None:
+        port = _find_free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = _start_server(port)
+    try:
+        _wait_for_server(base_url)
+        results = asyncio.run(run_load_test(
+            base_url=base_url,
+            duration=args.duration,
+            predict_qps=args.predict_qps,
+            status_qps=args.status_qps,
+            batch_size=args.batch_size,
+            features=features,
+            warmup_dataset=warmup_dataset,
+            train_dataset=train_dataset,
+            train_at=train_at
+        ))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results["configuration"] = {
+        key: value for key, value in vars(args).items() if key != "output"
+    } | {"train_at": train_at, "features": features}
+    output = args.output or join(
+        RESULTS_DIRECTORY, f"load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    print(json.dumps(results["endpoints"], indent=2))
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
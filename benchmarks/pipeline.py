@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from os.path import dirname, join
+
+import services
+from data.extractors import NearestNeighborsBasedRepresentativenessExtractor
+from data.models import Dataset
+from data.processors import DatasetProcessor
+from ml.models import EnsembleRandomForestBasedRegressor, TrainingStatus
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+
+
+def _create_ensemble(splits: int, backend: str) -> EnsembleRandomForestBasedRegressor:
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in range(splits):
+        regressor.register_regressor(services.create_regressor(backend))
+    return regressor
+
+
+async def train_with_barriers(dataset: Dataset, splits: int, backend: str) -> EnsembleRandomForestBasedRegressor:
+    regressor = _create_ensemble(splits, backend)
+    chunks = await DatasetProcessor.to_supervised(dataset, splits, NearestNeighborsBasedRepresentativenessExtractor())
+    await regressor.fit(chunks)
+    return regressor
+
+
+async def train_pipelined(
+        dataset: Dataset, splits: int, backend: str, labeling_concurrency: int | None, fitting_concurrency: int | None
+) -> EnsembleRandomForestBasedRegressor:
+    regressor = _create_ensemble(splits, backend)
+    chunks = DatasetProcessor.stream_supervised(
+        dataset, splits, NearestNeighborsBasedRepresentativenessExtractor(), max_concurrency=labeling_concurrency
+    )
+    await regressor.fit_pipelined(chunks, max_concurrency=fitting_concurrency)
+    return regressor
+
+
+def measure(train, repeats: int) -> float:
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        regressor = asyncio.run(train())
+        durations.append(time.perf_counter() - start)
+        if regressor.status != TrainingStatus.FINISHED:
+            raise RuntimeError("Training has failed during the benchmark")
+    return statistics.median(durations)
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare training wall-clock with and without stage pipelining")
+    parser.add_argument("--dataset", default="artifacts/dataset_10_000_samples_10_features.json")
+    parser.add_argument("--splits", type=int, default=services.NUMBER_OF_ENSEMBLE_MODELS)
+    parser.add_argument("--backend", default=services.REGRESSOR_BACKEND)
+    parser.add_argument("--labeling-concurrency", type=int, default=services.LABELING_CONCURRENCY)
+    parser.add_argument("--fitting-concurrency", type=int, default=services.FITTING_CONCURRENCY)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=join(RESULTS_DIRECTORY, "pipeline.json"))
+    args = parser.parse_args(arguments)
+
+    with open(args.dataset) as file:
+        dataset = Dataset(**json.load(file))
+
+    barrier_seconds = measure(lambda: train_with_barriers(dataset, args.splits, args.backend), args.repeats)
+    pipelined_seconds = measure(
+        lambda: train_pipelined(
+            dataset, args.splits, args.backend, args.labeling_concurrency, args.fitting_concurrency
+        ),
+        args.repeats
+    )
+    results = {
+        "dataset": args.dataset,
+        "splits": args.splits,
+        "backend": args.backend,
+        "fitting_concurrency": args.fitting_concurrency,
+        "available_cores": services.get_available_cores(),
+        "barrier_seconds": round(barrier_seconds, 3),
+        "pipelined_seconds": round(pipelined_seconds, 3),
+        "speedup": round(barrier_seconds / pipelined_seconds, 3)
+    }
+
+    os.makedirs(dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    columns = ["splits", "fitting_concurrency", "available_cores", "barrier_seconds", "pipelined_seconds", "speedup"]
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    print("| " + " | ".join(str(results[column]) for column in columns) + " |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import time
+from os.path import dirname, join
+
+import numpy as np
+
+from data.extractors import NearestNeighborsBasedRepresentativenessExtractor, ProjectedRepresentativenessExtractor
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+
+
+def _create_features(n_rows: int, n_features: int, intrinsic_dimension: int) -> np.ndarray:
+    # Wide vectors with a low intrinsic dimension, as produced by embeddings, plus a little isotropic noise
+    random_state = np.random.default_rng(0)
+    latent = random_state.random((n_rows, intrinsic_dimension))
+    mixing = random_state.normal(size=(intrinsic_dimension, n_features))
+    return (latent @ mixing + 0.01 * random_state.normal(size=(n_rows, n_features))).round(5)
+
+
+def _timed(extractor, features: np.ndarray) -> tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    representativeness = extractor.extract(features)
+    return representativeness, time.perf_counter() - start
+
+
+def _rank_correlation(first: np.ndarray, second: np.ndarray) -> float:
+    return float(np.corrcoef(np.argsort(np.argsort(first)), np.argsort(np.argsort(second)))[0, 1])
+
+
+def measure(n_rows: int, widths: list[int], components: list[int], methods: list[str]) -> list[dict]:
+    results = []
+    for n_features in widths:
+        features = _create_features(n_rows, n_features, intrinsic_dimension=min(components))
+        exact, exact_seconds = _timed(NearestNeighborsBasedRepresentativenessExtractor(), features)
+        for method in methods:
+            for n_components in components:
+                extractor = ProjectedRepresentativenessExtractor(
+                    NearestNeighborsBasedRepresentativenessExtractor(), n_components, method=method, random_state=0
+                )
+                approximate, seconds = _timed(extractor, features)
+                report = extractor.get_report()
+                results.append({
+                    "rows": n_rows,
+                    "features": n_features,
+                    "method": method,
+                    "components": n_components,
+                    "exact_seconds": round(exact_seconds, 3),
+                    "projected_seconds": round(seconds, 3),
+                    "speedup": round(exact_seconds / seconds, 2),
+                    "mean_distortion": report.mean_distortion,
+                    "max_distortion": report.max_distortion,
+                    "mae": round(float(np.mean(np.abs(approximate - exact))), 5),
+                    "rank_correlation": round(_rank_correlation(approximate, exact), 4)
+                })
+    return results
+
+
+def format_table(results: list[dict]) -> str:
+    columns = list(results[0])
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + "|".join("---" for _ in columns) + "|",
+    ]
+    lines.extend("| " + " | ".join(str(result[column]) for column in columns) + " |" for result in results)
+    return "\n".join(lines)
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare labels computed on projected features with exact k-NN labels")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--widths", nargs="+", type=int, default=[100, 300, 1000])
+    parser.add_argument("--components", nargs="+", type=int, default=[8, 16, 32])
+    parser.add_argument(
+        "--methods", nargs="+", default=list(ProjectedRepresentativenessExtractor.PROJECTION_METHODS)
+    )
+    parser.add_argument("--output", default=join(RESULTS_DIRECTORY, "projection.json"))
+    args = parser.parse_args(arguments)
+
+    results = measure(args.rows, args.widths, args.components, args.methods)
+
+    os.makedirs(dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
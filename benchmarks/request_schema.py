@@ -0,0 +1,71 @@
+import argparse
+import base64
+import json
+import os
+import timeit
+from os.path import dirname, join
+
+import numpy as np
+import orjson
+from pydantic import parse_obj_as
+
+from data.models import Sample
+from ingestion import read_feature_matrix
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+
+
+def _decode_samples(body: bytes) -> np.ndarray:
+    # What FastAPI does for a list[Sample] body, followed by the conversion the ensemble performs before predicting
+    samples = parse_obj_as(list[Sample], orjson.loads(body))
+    return np.array([sample.features for sample in samples], dtype=np.float64)
+
+
+def create_bodies(batch_size: int, n_features: int) -> dict[str, bytes]:
+    features = np.random.default_rng(0).random((batch_size, n_features)).round(5)
+    return {
+        "samples": orjson.dumps([{"features": row, "representativeness": None} for row in features.tolist()]),
+        "matrix": orjson.dumps({"features": features.tolist()}),
+        "base64": orjson.dumps({
+            "features_base64": base64.b64encode(features.astype("<f8").tobytes()).decode(), "n_features": n_features
+        })
+    }
+
+
+def benchmark_batch_size(batch_size: int, n_features: int, repeats: int) -> dict:
+    bodies = create_bodies(batch_size, n_features)
+    decoders = {"samples": _decode_samples, "matrix": read_feature_matrix, "base64": read_feature_matrix}
+
+    result = {"batch_size": batch_size}
+    for name, decoder in decoders.items():
+        seconds = min(timeit.repeat(lambda: decoder(bodies[name]), number=1, repeat=repeats))
+        result[f"{name}_rows_per_second"] = round(batch_size / seconds)
+        result[f"{name}_bytes"] = len(bodies[name])
+    result["matrix_speedup"] = round(result["matrix_rows_per_second"] / result["samples_rows_per_second"], 1)
+    result["base64_speedup"] = round(result["base64_rows_per_second"] / result["samples_rows_per_second"], 1)
+    return result
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure request decoding throughput of the /predict request schemas")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[10, 100, 1_000, 10_000, 100_000])
+    parser.add_argument("--features", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", default=join(RESULTS_DIRECTORY, "request_schema.json"))
+    args = parser.parse_args(arguments)
+
+    results = [benchmark_batch_size(batch_size, args.features, args.repeats) for batch_size in args.batch_sizes]
+
+    os.makedirs(dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({"features": args.features, "results": results}, file, indent=2)
+
+    columns = ["batch_size"] + [column for column in results[0] if column.endswith(("_rows_per_second", "_speedup"))]
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    for result in results:
+        print("| " + " | ".join(str(result[column]) for column in columns) + " |")
+
+
+if __name__ == "__main__":
+    main()
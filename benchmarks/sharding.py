@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from os.path import dirname, join
+
+import numpy as np
+
+import services
+from data.models import Dataset, Sample
+from ml.models import EnsembleRandomForestBasedRegressor
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+
+
+async def _fit_ensemble(n_members: int, n_samples: int, n_features: int) -> EnsembleRandomForestBasedRegressor:
+    features = np.random.default_rng(0).random((n_samples, n_features)).round(5)
+    dataset = Dataset(samples=[Sample(features=row) for row in features.tolist()])
+    ensemble = EnsembleRandomForestBasedRegressor()
+    for _ in range(n_members):
+        ensemble.register_regressor(services.create_regressor())
+    await ensemble.fit(await services.prepare_dataset(dataset, splits=n_members))
+    return ensemble
+
+
+async def _measure_latency(ensemble: EnsembleRandomForestBasedRegressor, features: np.ndarray, repeats: int) -> float:
+    # The first request waits for the shards to load their members and is not measured
+    await ensemble._predict(features)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await ensemble._predict(features)
+        latencies.append(time.perf_counter() - start)
+    return round(statistics.median(latencies) * 1000, 2)
+
+
+async def benchmark_members(n_members: int, n_shards: int | None, args: argparse.Namespace) -> dict:
+    ensemble = await _fit_ensemble(n_members, args.samples_per_member * n_members, args.features)
+    features = np.random.default_rng(1).random((args.batch_size, args.features))
+
+    result = {"members": n_members, "in_process_ms": await _measure_latency(ensemble, features, args.repeats)}
+    ensemble.start_shards(n_shards or n_members)
+    try:
+        result["shards"] = ensemble.shards.n_shards
+        result["sharded_ms"] = await _measure_latency(ensemble, features, args.repeats)
+    finally:
+        ensemble.stop_shards()
+    result["speedup"] = round(result["in_process_ms"] / result["sharded_ms"], 1)
+    return result
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure /predict latency with ensemble members sharded across processes"
+    )
+    parser.add_argument("--members", nargs="+", type=int, default=[2, 4, 8, 16])
+    parser.add_argument("--shards", type=int, default=None, help="Shard processes, one per member by default")
+    parser.add_argument("--samples-per-member", type=int, default=2000)
+    parser.add_argument("--features", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default=join(RESULTS_DIRECTORY, "sharding.json"))
+    args = parser.parse_args(arguments)
+
+    results = [asyncio.run(benchmark_members(n_members, args.shards, args)) for n_members in args.members]
+
+    os.makedirs(dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({"batch_size": args.batch_size, "features": args.features, "results": results}, file, indent=2)
+
+    columns = ["members", "shards", "in_process_ms", "sharded_ms", "speedup"]
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    for result in results:
+        print("| " + " | ".join(str(result[column]) for column in columns) + " |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from os.path import dirname, join
+
+import httpx
+
+import services
+from data.models import Dataset
+
+RESULTS_DIRECTORY: str = join(dirname(__file__), "results")
+ROOT_DIRECTORY: str = dirname(dirname(os.path.abspath(__file__)))
+IMPORT_SCRIPT: str = (
+    "import sys, time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start, 'sklearn' in sys.modules)"
+)
+
+
+def measure_import(repeats: int) -> dict:
+    durations, imports_sklearn = [], False
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], capture_output=True, text=True, check=True, cwd=ROOT_DIRECTORY
+        ).stdout.split()
+        durations.append(float(output[0]))
+        imports_sklearn = output[1] == "True"
+    return {
+        "import_main_ms": round(statistics.median(durations) * 1000, 1),
+        "imports_sklearn": imports_sklearn
+    }
+
+
+def _find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _poll(request, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if request().status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"No successful response within {timeout} seconds")
+
+
+def measure_server_start(model_path: str | None, samples: list[dict], timeout: float) -> dict:
+    port = _find_free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    environment = {key: value for key, value in os.environ.items() if key != "MODEL_PATH"}
+    if model_path is not None:
+        environment["MODEL_PATH"] = model_path
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"
+        ],
+        cwd=ROOT_DIRECTORY,
+        env=environment
+    )
+    try:
+        _poll(lambda: httpx.get(f"{base_url}/status"), timeout)
+        first_status_seconds = time.perf_counter() - start
+        result = {"first_status_200_ms": round(first_status_seconds * 1000, 1)}
+        if model_path is not None:
+            _poll(lambda: httpx.post(f"{base_url}/predict", json=samples), timeout)
+            result["first_prediction_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def _train_model(dataset: Dataset, splits: int, path: str) -> None:
+    services.NUMBER_OF_ENSEMBLE_MODELS = splits
+    await services.train_model(dataset)
+    await services.save_model(path)
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure import time, time to first /status and first /predict")
+    parser.add_argument("--dataset", default="artifacts/dataset_10_000_samples_10_features.json")
+    parser.add_argument("--splits", type=int, default=services.NUMBER_OF_ENSEMBLE_MODELS)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", default=join(RESULTS_DIRECTORY, "startup.json"))
+    args = parser.parse_args(arguments)
+
+    with open(args.dataset) as file:
+        dataset = Dataset(**json.load(file))
+    n_features = len(dataset.samples[0].features)
+    samples = [{"features": [random.random() for _ in range(n_features)]}]
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = join(directory, "model.pkl")
+        asyncio.run(_train_model(dataset, args.splits, model_path))
+
+        without_model = [measure_server_start(None, samples, args.timeout) for _ in range(args.repeats)]
+        with_model = [measure_server_start(model_path, samples, args.timeout) for _ in range(args.repeats)]
+        model_megabytes = os.path.getsize(model_path) / 2 ** 20
+
+    results = {
+        **measure_import(args.repeats),
+        "first_status_200_ms": statistics.median(result["first_status_200_ms"] for result in without_model),
+        "first_status_200_with_model_ms": statistics.median(result["first_status_200_ms"] for result in with_model),
+        "first_prediction_ms": statistics.median(result["first_prediction_ms"] for result in with_model),
+        "model_megabytes": round(model_megabytes, 3)
+    }
+
+    os.makedirs(dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump({"dataset": args.dataset, "splits": args.splits, "results": results}, file, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
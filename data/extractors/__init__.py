@@ -1,9 +1,14 @@
 from .representativeness import (
     RepresentativenessExtractor,
-    NearestNeighborsBasedRepresentativenessExtractor
+    NearestNeighborsBasedRepresentativenessExtractor,
+    CoresetBasedRepresentativenessExtractor
 )
+from .projection import ProjectedRepresentativenessExtractor, ProjectionReport
 
 __all__ = [
     RepresentativenessExtractor,
-    NearestNeighborsBasedRepresentativenessExtractor
+    NearestNeighborsBasedRepresentativenessExtractor,
+    CoresetBasedRepresentativenessExtractor,
+    ProjectedRepresentativenessExtractor,
+    ProjectionReport
 ]
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import numpy as np
+from pydantic import BaseModel
+from pydantic.types import PositiveFloat
+
+from .representativeness import RepresentativenessExtractor
+
+PCA_BATCH_SIZE: int = 10_000
+DISTORTION_PAIRS: int = 1000
+
+
+class ProjectionReport(BaseModel):
+    method: str
+    n_features_in: int
+    n_components: int
+    chunks: int
+    projection_seconds: float
+    labeling_seconds: float
+    mean_distortion: float
+    max_distortion: float
+
+
+class ProjectedRepresentativenessExtractor(RepresentativenessExtractor):
+    PROJECTION_METHODS: tuple[str, ...] = ("random", "pca")
+
+    def __init__(
+            self,
+            extractor: RepresentativenessExtractor,
+            n_components: int,
+            method: str = "random",
+            random_state: int | None = None
+    ) -> None:
+        if method not in self.PROJECTION_METHODS:
+            raise ValueError(f"Unknown projection method '{method}'")
+        self.extractor = extractor
+        self.n_components = n_components
+        self.method = method
+        self.random_state = random_state
+        self._reports: list[ProjectionReport] = []
+        self._lock = threading.Lock()
+
+    def extract(self, features: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+        if features.shape[1] <= self.n_components:
+            return self.extractor.extract(features, weights)
+
+        # Only distances are computed on the projection, the labels are assigned to the original samples
+        start = time.perf_counter()
+        projected = self.project(features)
+        projection_seconds = time.perf_counter() - start
+        representativeness = self.extractor.extract(projected, weights)
+        labeling_seconds = time.perf_counter() - start - projection_seconds
+
+        distortion = self.measure_distortion(features, projected)
+        with self._lock:
+            self._reports.append(ProjectionReport(
+                method=self.method,
+                n_features_in=features.shape[1],
+                n_components=self.n_components,
+                chunks=1,
+                projection_seconds=projection_seconds,
+                labeling_seconds=labeling_seconds,
+                mean_distortion=float(np.mean(distortion)) if distortion.size else 0.0,
+                max_distortion=float(np.max(distortion)) if distortion.size else 0.0
+            ))
+        return representativeness
+
+    def project(self, features: np.ndarray) -> np.ndarray:
+        if self.method == "random":
+            from sklearn.random_projection import GaussianRandomProjection
+
+            projection = GaussianRandomProjection(n_components=self.n_components, random_state=self.random_state)
+            return projection.fit_transform(features)
+
+        from sklearn.decomposition import IncrementalPCA
+
+        # Fitted batch by batch, so the covariance of a wide chunk is never materialised at once
+        pca = IncrementalPCA(n_components=self.n_components, batch_size=max(PCA_BATCH_SIZE, self.n_components))
+        return pca.fit_transform(features)
+
+    def measure_distortion(self, features: np.ndarray, projected: np.ndarray) -> np.ndarray:
+        # Relative error of pairwise distances on a sample of pairs, |d(Px, Py) / d(x, y) - 1|
+        random_state = np.random.default_rng(self.random_state)
+        first, second = random_state.integers(0, len(features), size=(2, DISTORTION_PAIRS))
+        original = np.linalg.norm(features[first] - features[second], axis=1)
+        reduced = np.linalg.norm(projected[first] - projected[second], axis=1)
+        distinct = original > 0
+        return np.abs(reduced[distinct] / original[distinct] - 1)
+
+    def get_report(self) -> ProjectionReport | None:
+        with self._lock:
+            reports = list(self._reports)
+        if not reports:
+            return None
+        return ProjectionReport(
+            method=self.method,
+            n_features_in=reports[0].n_features_in,
+            n_components=self.n_components,
+            chunks=len(reports),
+            projection_seconds=round(sum(report.projection_seconds for report in reports), 3),
+            labeling_seconds=round(sum(report.labeling_seconds for report in reports), 3),
+            mean_distortion=round(float(np.mean([report.mean_distortion for report in reports])), 5),
+            max_distortion=round(max(report.max_distortion for report in reports), 5)
+        )
+
+    def _calculate_representativeness(self, mean_distance: PositiveFloat | np.ndarray) -> PositiveFloat | np.ndarray:
+        return self.extractor._calculate_representativeness(mean_distance)
@@ -3,15 +3,17 @@ from abc import ABC, abstractmethod
 
 import numpy as np
 from pydantic.types import PositiveFloat
-from sklearn.neighbors import NearestNeighbors
 
 from exceptions import InvalidNNeighborsError
+from logs import Logger
+
+logger = Logger(__name__)
 
 
 class RepresentativenessExtractor(ABC):
     @staticmethod
     @abstractmethod
-    def extract(features: np.ndarray) -> np.ndarray:
+    def extract(features: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
         ...
 
     @staticmethod
@@ -22,20 +24,223 @@ class RepresentativenessExtractor(ABC):
 
 class NearestNeighborsBasedRepresentativenessExtractor(RepresentativenessExtractor):
     @staticmethod
-    def extract(features: np.ndarray) -> np.ndarray:
+    def parse_n_neighbors() -> list[int]:
+        # A comma-separated list labels several neighborhood scales in one pass, the first one is the default
+        value = os.environ.get("N_NEIGHBORS", "5")
+        try:
+            return list(dict.fromkeys(int(n_neighbors) for n_neighbors in value.split(",")))
+        except ValueError:
+            raise InvalidNNeighborsError(n_neighbors=value)
 
-        n_neighbors = int(os.environ.get("N_NEIGHBORS", 5))
-        if not n_neighbors or not n_neighbors > 0 or n_neighbors > len(features):
-            raise InvalidNNeighborsError(n_neighbors=n_neighbors)
+    @staticmethod
+    def get_n_neighbors_list(n_samples: int) -> list[int]:
+        n_neighbors = NearestNeighborsBasedRepresentativenessExtractor.parse_n_neighbors()
+        for value in n_neighbors:
+            if not value > 0 or value > n_samples:
+                raise InvalidNNeighborsError(n_neighbors=value)
+        return n_neighbors
 
-        neighbors = NearestNeighbors(n_neighbors=n_neighbors).fit(features)
-        distances, _ = neighbors.kneighbors(features)
-        mean_distances = np.mean(distances[:, 1:], axis=1)
+    @staticmethod
+    def get_n_neighbors(n_samples: int) -> int:
+        return NearestNeighborsBasedRepresentativenessExtractor.get_n_neighbors_list(n_samples)[0]
+
+    @staticmethod
+    def extract(features: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+        from sklearn.neighbors import NearestNeighbors
+
+        if weights is None:
+            n_neighbors = NearestNeighborsBasedRepresentativenessExtractor.get_n_neighbors_list(len(features))
+
+            # A single query at the largest k serves every smaller k as well
+            neighbors = NearestNeighbors(n_neighbors=max(n_neighbors)).fit(features)
+            distances, _ = neighbors.kneighbors(features)
+            mean_distances = NearestNeighborsBasedRepresentativenessExtractor._get_mean_distances(
+                distances[:, 1:], n_neighbors
+            )
+        else:
+            n_neighbors = NearestNeighborsBasedRepresentativenessExtractor.get_n_neighbors_list(int(weights.sum()))
 
-        return np.array(
-            list(map(NearestNeighborsBasedRepresentativenessExtractor._calculate_representativeness, mean_distances))
+            # Each unique row stands for at least one sample, so n_neighbors unique rows cover n_neighbors samples
+            neighbors = NearestNeighbors(n_neighbors=min(max(n_neighbors), len(features))).fit(features)
+            distances, indices = neighbors.kneighbors(features)
+            mean_distances = np.column_stack([
+                NearestNeighborsBasedRepresentativenessExtractor._get_weighted_mean_distances(
+                    distances, weights[indices], value
+                )
+                for value in n_neighbors
+            ])
+
+        representativeness = NearestNeighborsBasedRepresentativenessExtractor._calculate_representativeness(
+            mean_distances
         )
+        # One column per k, a single k keeps the flat labels
+        return representativeness[:, 0] if len(n_neighbors) == 1 else representativeness
 
     @staticmethod
-    def _calculate_representativeness(mean_distance: PositiveFloat) -> PositiveFloat:
+    def _get_mean_distances(distances: np.ndarray, n_neighbors: list[int]) -> np.ndarray:
+        # Distances are sorted, so the mean over the k - 1 closest neighbors of every k is read off one cumulative sum
+        cumulative_distances = np.cumsum(distances, axis=1)
+        return np.column_stack([
+            cumulative_distances[:, value - 2] / (value - 1) if value > 1 else np.full(len(distances), np.nan)
+            for value in n_neighbors
+        ])
+
+    @staticmethod
+    def _get_weighted_mean_distances(distances: np.ndarray, counts: np.ndarray, n_neighbors: int) -> np.ndarray:
+        # Copies of each neighbor are taken in order of distance until n_neighbors samples are collected,
+        # the first one being the sample itself at distance 0
+        collected = np.minimum(np.cumsum(counts, axis=1), n_neighbors)
+        taken = np.diff(collected, axis=1, prepend=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sum(taken * distances, axis=1) / (n_neighbors - 1)
+
+    @staticmethod
+    def _calculate_representativeness(mean_distance: PositiveFloat | np.ndarray) -> PositiveFloat | np.ndarray:
         return 1 / (1 + mean_distance)
+
+
+class CoresetBasedRepresentativenessExtractor(NearestNeighborsBasedRepresentativenessExtractor):
+    SAMPLING_STRATEGIES: tuple[str, ...] = ("random", "stratified")
+    N_STRATA: int = 16
+    N_PROBES: int = 256
+
+    def __init__(
+            self,
+            coreset_size: int,
+            strategy: str = "random",
+            random_state: int | None = None,
+            min_rank_correlation: float | None = None
+    ) -> None:
+        if strategy not in self.SAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown coreset sampling strategy '{strategy}'")
+        self.coreset_size = coreset_size
+        self.strategy = strategy
+        self.random_state = random_state
+        self.min_rank_correlation = min_rank_correlation
+
+    def extract(self, features: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+        from sklearn.neighbors import NearestNeighbors
+
+        if len(features) <= self.coreset_size:
+            return NearestNeighborsBasedRepresentativenessExtractor.extract(features, weights)
+
+        n_samples = int(weights.sum()) if weights is not None else len(features)
+        n_neighbors = NearestNeighborsBasedRepresentativenessExtractor.get_n_neighbors_list(
+            min(n_samples, self.coreset_size)
+        )
+        if n_neighbors == [1]:
+            return np.full(len(features), np.nan)
+
+        random_state = np.random.default_rng(self.random_state)
+        coreset_indices = self._sample_coreset(features, weights, random_state)
+        coreset = features[coreset_indices]
+        # Strata are rounded to whole rows, so a stratified coreset can hold fewer rows than requested
+        n_neighbors = [min(value, len(coreset)) for value in n_neighbors]
+
+        neighbors = NearestNeighbors(n_neighbors=max(n_neighbors)).fit(coreset)
+        distances, _ = neighbors.kneighbors(features)
+        # Rows of the coreset find themselves first, the remaining rows use their n_neighbors - 1 closest references
+        in_coreset = np.zeros(len(features), dtype=bool)
+        in_coreset[coreset_indices] = True
+        mean_distances = np.where(
+            in_coreset[:, np.newaxis],
+            NearestNeighborsBasedRepresentativenessExtractor._get_mean_distances(distances[:, 1:], n_neighbors),
+            NearestNeighborsBasedRepresentativenessExtractor._get_mean_distances(distances[:, :-1], n_neighbors)
+        )
+
+        mean_distances *= self._get_density_correction(coreset, n_samples, n_neighbors, random_state)
+        representativeness = NearestNeighborsBasedRepresentativenessExtractor._calculate_representativeness(
+            mean_distances
+        )
+        representativeness = representativeness[:, 0] if len(n_neighbors) == 1 else representativeness
+
+        if self.min_rank_correlation is not None:
+            # Coreset labels measure density at a coarser scale than the exact k-NN, which is only useful when the
+            # data has structure at that scale; the agreement is measured on exact labels of a few probe rows
+            rank_correlation = self.probe_rank_correlation(features, weights, representativeness, random_state)
+            if rank_correlation < self.min_rank_correlation:
+                logger.info(
+                    f"Coreset labels have rank correlation {rank_correlation:.3f} with exact labels, "
+                    f"below {self.min_rank_correlation}, labeling exactly"
+                )
+                return NearestNeighborsBasedRepresentativenessExtractor.extract(features, weights)
+        return representativeness
+
+    def probe_rank_correlation(
+            self,
+            features: np.ndarray,
+            weights: np.ndarray | None,
+            representativeness: np.ndarray,
+            random_state: np.random.Generator | None = None
+    ) -> float:
+        from sklearn.neighbors import NearestNeighbors
+
+        random_state = random_state or np.random.default_rng(self.random_state)
+        n_samples = int(weights.sum()) if weights is not None else len(features)
+        n_neighbors = NearestNeighborsBasedRepresentativenessExtractor.get_n_neighbors(n_samples)
+        probes = random_state.choice(len(features), size=min(self.N_PROBES, len(features)), replace=False)
+
+        # Brute force against the full chunk costs one pass over it per probe and no index over all rows
+        neighbors = NearestNeighbors(n_neighbors=min(n_neighbors, len(features)), algorithm="brute").fit(features)
+        distances, indices = neighbors.kneighbors(features[probes])
+        if weights is None:
+            exact = NearestNeighborsBasedRepresentativenessExtractor._get_mean_distances(
+                distances[:, 1:], [n_neighbors]
+            )[:, 0]
+        else:
+            exact = NearestNeighborsBasedRepresentativenessExtractor._get_weighted_mean_distances(
+                distances, weights[indices], n_neighbors
+            )
+        approximate = representativeness if representativeness.ndim == 1 else representativeness[:, 0]
+        # Spearman correlation, larger distances mean lower representativeness
+        ranks = [np.argsort(np.argsort(values)) for values in (-exact, approximate[probes])]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return float(np.corrcoef(ranks)[0, 1])
+
+    def _sample_coreset(
+            self, features: np.ndarray, weights: np.ndarray | None, random_state: np.random.Generator
+    ) -> np.ndarray:
+        probabilities = weights / weights.sum() if weights is not None else None
+        if self.strategy == "random":
+            return random_state.choice(len(features), size=self.coreset_size, replace=False, p=probabilities)
+
+        from sklearn.cluster import MiniBatchKMeans
+
+        # Strata are sampled in proportion to their size, so sparse regions are covered without biasing the density
+        strata = MiniBatchKMeans(n_clusters=self.N_STRATA, n_init=1, random_state=self.random_state)
+        labels = strata.fit_predict(features)
+        total = weights.sum() if weights is not None else len(features)
+        indices = []
+        for stratum in range(self.N_STRATA):
+            members = np.flatnonzero(labels == stratum)
+            mass = weights[members].sum() if weights is not None else len(members)
+            size = min(len(members), int(round(self.coreset_size * mass / total)))
+            if size == 0:
+                continue
+            stratum_probabilities = weights[members] / mass if weights is not None else None
+            indices.append(random_state.choice(members, size=size, replace=False, p=stratum_probabilities))
+        return np.concatenate(indices)
+
+    @staticmethod
+    def _get_density_correction(
+            coreset: np.ndarray, n_samples: int, n_neighbors: list[int], random_state: np.random.Generator
+    ) -> np.ndarray:
+        from sklearn.neighbors import NearestNeighbors
+
+        # k-NN distances scale as n ** (-1 / d) with the intrinsic dimension d, which is estimated from how the
+        # distances grow when the coreset is halved; the correction rescales them to the density of the full chunk
+        corrections = np.ones(len(n_neighbors))
+        half = coreset[random_state.choice(len(coreset), size=len(coreset) // 2, replace=False)]
+        if len(half) < max(n_neighbors):
+            return corrections
+        distances = [
+            np.mean(NearestNeighborsBasedRepresentativenessExtractor._get_mean_distances(
+                NearestNeighbors(n_neighbors=max(n_neighbors)).fit(reference).kneighbors(reference)[0][:, 1:],
+                n_neighbors
+            ), axis=0)
+            for reference in (coreset, half)
+        ]
+        valid = (distances[0] > 0) & (distances[1] > distances[0])
+        inverse_dimension = np.log(distances[1][valid] / distances[0][valid]) / np.log(2)
+        corrections[valid] = (len(coreset) / n_samples) ** inverse_dimension
+        return corrections
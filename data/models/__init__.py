@@ -1,7 +1,9 @@
-from .sample import Sample
+from .sample import FEATURES_PRECISION, Sample, round_features
 from .dataset import Dataset
 
 __all__ = [
     Sample,
-    Dataset
+    Dataset,
+    FEATURES_PRECISION,
+    round_features
 ]
@@ -1,5 +1,5 @@
 import numpy as np
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, PrivateAttr, validator
 
 from exceptions import IncorrectSamplesShapeInDatasetError
 
@@ -8,6 +8,9 @@ from .sample import Sample
 
 class Dataset(BaseModel):
     samples: list[Sample]
+    weights: list[int] | None = None
+    _features: np.ndarray | None = PrivateAttr(default=None)
+    _targets: np.ndarray | None = PrivateAttr(default=None)
 
     @validator("samples")
     def validate_samples(cls, samples: list[Sample]) -> list[Sample]:
@@ -17,11 +20,44 @@ class Dataset(BaseModel):
 
         return samples
 
+    @validator("weights")
+    def validate_weights(cls, weights: list[int] | None, values: dict) -> list[int] | None:
+        if weights is not None and "samples" in values and len(weights) != len(values["samples"]):
+            raise ValueError("Dataset weights must have the same length as samples")
+        if weights is not None and any(weight < 1 for weight in weights):
+            raise ValueError("Dataset weights must be positive")
+        return weights
+
+    @classmethod
+    def from_features(
+            cls, features: np.ndarray, weights: list[int] | None = None, targets: np.ndarray | None = None
+    ) -> "Dataset":
+        # Backed by a validated, already rounded feature matrix, rows are never turned into Sample objects
+        dataset = cls.construct(samples=[], weights=weights)
+        dataset._features = features
+        dataset._targets = targets
+        return dataset
+
+    @property
+    def is_array_backed(self) -> bool:
+        return self._features is not None
+
     def __len__(self):
+        if self.is_array_backed:
+            return len(self._features)
         return len(self.samples)
 
     def get_feature_representation(self) -> np.ndarray:
+        if self.is_array_backed:
+            return self._features
         return np.array([sample.features for sample in self.samples])
 
-    def get_target_representation(self) -> np.ndarray:
+    def get_target_representation(self) -> np.ndarray | None:
+        if self.is_array_backed:
+            return self._targets
         return np.array([sample.representativeness for sample in self.samples])
+
+    def get_weight_representation(self) -> np.ndarray | None:
+        if self.weights is None:
+            return None
+        return np.array(self.weights)
@@ -1,14 +1,32 @@
+import numpy as np
 from pydantic import BaseModel, validator
 
+FEATURES_PRECISION: int = 5
+
+
+def round_features(features: np.ndarray) -> np.ndarray:
+    features = np.asarray(features, dtype=np.float64)
+    scale = 10.0 ** FEATURES_PRECISION
+    scaled = features * scale
+    rounded = np.rint(scaled) / scale
+    # Scaling is inexact, so values landing next to a tie, and values too large to hold decimals, are rounded with
+    # Python's round as in the Sample validator. Features parsed in bulk then match validated samples to the last bit
+    with np.errstate(invalid="ignore"):
+        ambiguous = np.abs(scaled - np.floor(scaled) - 0.5) <= 2 * np.abs(np.spacing(scaled))
+        ambiguous |= ~(np.abs(scaled) < 2.0 ** 52)
+    if ambiguous.any():
+        rounded[ambiguous] = [round(value, FEATURES_PRECISION) for value in features[ambiguous].tolist()]
+    return rounded
+
 
 class Sample(BaseModel):
     features: list[float | int]
-    representativeness: float | None = None
+    representativeness: float | list[float] | None = None
 
     @validator("features", pre=True)
     def round_features_precision(cls, features):
         if isinstance(features, list):
-            return [round(value, 5) if isinstance(value, float) else value for value in features]
+            return [round(value, FEATURES_PRECISION) if isinstance(value, float) else value for value in features]
         return features
 
     class Config:
@@ -1,5 +1,6 @@
-from .dataset import DatasetProcessor
+from .dataset import ChunkCache, DatasetProcessor
 
 __all__ = [
+    ChunkCache,
     DatasetProcessor
 ]
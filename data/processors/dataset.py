@@ -1,17 +1,31 @@
 import asyncio
 import random
 from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Collection, Protocol
 
 import numpy as np
 
 from data.extractors import RepresentativenessExtractor
 from data.models import Dataset, Sample
 from logs import Logger
+from profiling import run_in_executor
 
 logger = Logger(__name__)
 # TODO: logowanie
 
 
+class ChunkCache(Protocol):
+    def load_chunk(self, index: int) -> Dataset | None:
+        ...
+
+    def save_chunk(self, index: int, chunk: Dataset) -> None:
+        ...
+
+
+def _is_contiguous(indices: np.ndarray) -> bool:
+    return len(indices) > 0 and indices[-1] - indices[0] + 1 == len(indices) and bool(np.all(np.diff(indices) == 1))
+
+
 class DatasetProcessor:
     @staticmethod
     async def create_dataset(samples: int, features: int) -> Dataset:
@@ -19,44 +33,142 @@ class DatasetProcessor:
             return Dataset(samples=[
                 Sample(features=[random.random() for _ in range(_features)]) for _ in range(_samples)
             ])
-        loop = asyncio.get_event_loop()
         with ThreadPoolExecutor() as executor:
-            dataset = await loop.run_in_executor(executor, _create, samples, features)
+            dataset = await run_in_executor(executor, _create, samples, features)
         return dataset
 
     @staticmethod
     def run_labeling(dataset: Dataset, extractor: RepresentativenessExtractor) -> Dataset:
+        if dataset.is_array_backed:
+            representativeness = extractor.extract(
+                dataset.get_feature_representation(), dataset.get_weight_representation()
+            )
+            # Labels are attached next to the shared feature matrix instead of being copied into samples
+            return Dataset.from_features(dataset.get_feature_representation(), dataset.weights, representativeness)
+
         _dataset = dataset.copy()
         features = _dataset.get_feature_representation()
 
-        representativeness: np.ndarray[float] = extractor.extract(features)
-        for sample, value in zip(_dataset.samples, representativeness):
+        representativeness: np.ndarray[float] = extractor.extract(features, _dataset.get_weight_representation())
+        # Rows of multi-k labels become lists, one value per k in N_NEIGHBORS order
+        for sample, value in zip(_dataset.samples, representativeness.tolist()):
             sample.representativeness = value
 
         return _dataset
 
     @staticmethod
-    async def to_supervised(dataset: Dataset, splits: int, extractor: RepresentativenessExtractor) -> list[Dataset]:
-        _dataset = dataset.copy()
-        np.random.shuffle(_dataset.samples)
+    def deduplicate(dataset: Dataset) -> Dataset:
+        features = dataset.get_feature_representation()
+        unique_features, first_indices, inverse = np.unique(features, axis=0, return_index=True, return_inverse=True)
+        weights = dataset.get_weight_representation()
+        counts = np.bincount(inverse.ravel(), weights=weights, minlength=len(unique_features)).astype(int)
 
-        def _to_dataset(_chunk: np.ndarray) -> Dataset:
-            return Dataset(samples=_chunk.tolist())
+        logger.info(f"Deduplication kept {len(unique_features)} of {len(dataset)} samples")
+        if dataset.is_array_backed:
+            return Dataset.from_features(unique_features, counts.tolist())
+        # Features are already rounded by Sample, so the first occurrence of each unique row is kept as is
+        return Dataset(samples=[dataset.samples[index] for index in first_indices], weights=counts.tolist())
 
-        with ThreadPoolExecutor() as executor:
+    @staticmethod
+    def take(dataset: Dataset, indices: np.ndarray) -> Dataset:
+        weights = dataset.get_weight_representation()
+        if dataset.is_array_backed:
+            targets = dataset.get_target_representation()
+            # A contiguous range of an array-backed dataset is taken as a view instead of a copy
+            rows = slice(indices[0], indices[-1] + 1) if _is_contiguous(indices) else indices
+            return Dataset.from_features(
+                dataset.get_feature_representation()[rows],
+                weights[rows].tolist() if weights is not None else None,
+                targets[rows] if targets is not None else None
+            )
+        return Dataset(
+            samples=[dataset.samples[index] for index in indices],
+            weights=weights[indices].tolist() if weights is not None else None
+        )
 
-            loop = asyncio.get_event_loop()
+    @staticmethod
+    def shuffle(dataset: Dataset) -> np.ndarray:
+        # Weights and labels would have to be permuted along with the rows
+        if not dataset.is_array_backed or dataset.weights is not None or \
+                dataset.get_target_representation() is not None:
+            return np.random.permutation(len(dataset))
+        # Rows of an array-backed dataset are permuted in place, so contiguous chunks of it are views and splitting
+        # never holds a second copy of the feature matrix. The dataset's row order changes
+        np.random.shuffle(dataset.get_feature_representation())
+        return np.arange(len(dataset))
+
+    @staticmethod
+    async def split(dataset: Dataset, splits: int) -> list[Dataset]:
+        order = await run_in_executor(None, DatasetProcessor.shuffle, dataset)
+
+        with ThreadPoolExecutor() as executor:
             tasks = [
-                loop.run_in_executor(executor, _to_dataset, chunk)
-                for chunk in np.array_split(_dataset.samples, splits)
+                run_in_executor(executor, DatasetProcessor.take, dataset, chunk)
+                for chunk in np.array_split(order, splits)
             ]
             chunks = await asyncio.gather(*tasks)
 
+        return list(chunks)
+
+    @staticmethod
+    async def label(chunks: list[Dataset], extractor: RepresentativenessExtractor) -> list[Dataset]:
+        with ThreadPoolExecutor() as executor:
             tasks = [
-                loop.run_in_executor(executor, DatasetProcessor.run_labeling, chunk, extractor)
+                run_in_executor(executor, DatasetProcessor.run_labeling, chunk, extractor)
                 for chunk in chunks
             ]
 
             labeled_chunks = await asyncio.gather(*tasks)
 
         return list(labeled_chunks)
+
+    @staticmethod
+    async def to_supervised(
+            dataset: Dataset, splits: int, extractor: RepresentativenessExtractor, deduplicate: bool = False
+    ) -> list[Dataset]:
+        if deduplicate:
+            dataset = await run_in_executor(None, DatasetProcessor.deduplicate, dataset)
+        chunks = await DatasetProcessor.split(dataset, splits)
+        return await DatasetProcessor.label(chunks, extractor)
+
+    @staticmethod
+    async def stream_supervised(
+            dataset: Dataset,
+            splits: int,
+            extractor: RepresentativenessExtractor | None,
+            max_concurrency: int | None = None,
+            order: np.ndarray | None = None,
+            include: Collection[int] | None = None,
+            cache: ChunkCache | None = None
+    ) -> AsyncIterator[tuple[int, Dataset]]:
+        def _prepare(_index: int, _indices: np.ndarray) -> Dataset:
+            if cache is not None and (cached := cache.load_chunk(_index)) is not None:
+                return cached
+            chunk = DatasetProcessor.take(dataset, _indices)
+            if extractor is not None:
+                chunk = DatasetProcessor.run_labeling(chunk, extractor)
+            if cache is not None:
+                cache.save_chunk(_index, chunk)
+            return chunk
+
+        async def _prepare_indexed(_index: int, _indices: np.ndarray) -> tuple[int, Dataset]:
+            return _index, await run_in_executor(executor, _prepare, _index, _indices)
+
+        if order is None:
+            order = await run_in_executor(None, DatasetProcessor.shuffle, dataset)
+        # Chunks are yielded as soon as they are labeled, so a slow chunk does not hold back the others
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        tasks = [
+            asyncio.ensure_future(_prepare_indexed(index, chunk))
+            for index, chunk in enumerate(np.array_split(order, splits))
+            if include is None or index in include
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Runs on the event loop when the consumer stops early, so jobs that have not started are dropped and
+            # running ones are left to finish in the background instead of blocking the loop
+            executor.shutdown(wait=False, cancel_futures=True)
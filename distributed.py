@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import pickle
+import socket
+import threading
+import time
+import uuid
+from os.path import join
+from typing import AsyncIterator, Iterable, Protocol
+
+from data.models import Dataset
+from exceptions import DistributedTrainingError
+from logs import Logger
+from ml.models import Regressor
+from profiling import run_in_executor
+
+logger = Logger(__name__)
+
+TASK_EXTENSION: str = ".task"
+RESULT_EXTENSION: str = ".result"
+LEASE_SEPARATOR: str = "@"
+
+
+class Broker(Protocol):
+    def publish(self, task_id: str, payload: bytes) -> None:
+        ...
+
+    def claim(self, worker_id: str) -> tuple[str, bytes] | None:
+        ...
+
+    def renew(self, task_id: str, worker_id: str) -> bool:
+        ...
+
+    def complete(self, task_id: str, worker_id: str, result: bytes) -> None:
+        ...
+
+    def collect(self, task_ids: Iterable[str]) -> dict[str, bytes]:
+        ...
+
+    def requeue_expired(self, lease_seconds: float) -> list[str]:
+        ...
+
+    def list_unclaimed(self, task_ids: Iterable[str]) -> set[str]:
+        ...
+
+    def cancel(self, task_ids: Iterable[str]) -> None:
+        ...
+
+
+class FileBroker:
+    def __init__(self, directory: str) -> None:
+        # Hosts sharing the directory (e.g. over NFS) act as workers, renames are the only synchronisation
+        self.directory = directory
+        self._pending = join(directory, "pending")
+        self._claimed = join(directory, "claimed")
+        self._results = join(directory, "results")
+        for path in (self._pending, self._claimed, self._results):
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        # Written next to the target and renamed, so a reader never sees a partially written file
+        temporary_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _get_claimed_path(self, task_id: str, worker_id: str) -> str:
+        return join(self._claimed, f"{task_id}{LEASE_SEPARATOR}{worker_id}")
+
+    def publish(self, task_id: str, payload: bytes) -> None:
+        self._write(join(self._pending, f"{task_id}{TASK_EXTENSION}"), payload)
+
+    def claim(self, worker_id: str) -> tuple[str, bytes] | None:
+        for filename in sorted(os.listdir(self._pending)):
+            if not filename.endswith(TASK_EXTENSION):
+                continue
+            task_id = filename[:-len(TASK_EXTENSION)]
+            claimed_path = self._get_claimed_path(task_id, worker_id)
+            try:
+                # The lease starts now, renaming keeps the modification time of the published task
+                os.utime(join(self._pending, filename))
+                os.rename(join(self._pending, filename), claimed_path)
+            except FileNotFoundError:
+                # Another worker claimed the task first
+                continue
+            with open(claimed_path, "rb") as file:
+                return task_id, file.read()
+        return None
+
+    def renew(self, task_id: str, worker_id: str) -> bool:
+        try:
+            os.utime(self._get_claimed_path(task_id, worker_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def complete(self, task_id: str, worker_id: str, result: bytes) -> None:
+        self._write(join(self._results, f"{task_id}{RESULT_EXTENSION}"), result)
+        self._remove(self._get_claimed_path(task_id, worker_id))
+        # A task requeued after its lease expired does not need to be fitted again
+        self._remove(join(self._pending, f"{task_id}{TASK_EXTENSION}"))
+
+    def collect(self, task_ids: Iterable[str]) -> dict[str, bytes]:
+        results = {}
+        for task_id in task_ids:
+            path = join(self._results, f"{task_id}{RESULT_EXTENSION}")
+            try:
+                with open(path, "rb") as file:
+                    results[task_id] = file.read()
+            except FileNotFoundError:
+                continue
+            self._remove(path)
+        return results
+
+    def requeue_expired(self, lease_seconds: float) -> list[str]:
+        requeued = []
+        expiry = time.time() - lease_seconds
+        for filename in os.listdir(self._claimed):
+            path = join(self._claimed, filename)
+            try:
+                if os.path.getmtime(path) >= expiry:
+                    continue
+                task_id = filename.rsplit(LEASE_SEPARATOR, 1)[0]
+                os.rename(path, join(self._pending, f"{task_id}{TASK_EXTENSION}"))
+            except FileNotFoundError:
+                # Completed or renewed by its worker in the meantime
+                continue
+            requeued.append(task_id)
+        return requeued
+
+    def list_unclaimed(self, task_ids: Iterable[str]) -> set[str]:
+        return {task_id for task_id in task_ids if os.path.exists(join(self._pending, f"{task_id}{TASK_EXTENSION}"))}
+
+    def cancel(self, task_ids: Iterable[str]) -> None:
+        task_ids = set(task_ids)
+        for filename in os.listdir(self._claimed):
+            if filename.rsplit(LEASE_SEPARATOR, 1)[0] in task_ids:
+                self._remove(join(self._claimed, filename))
+        for task_id in task_ids:
+            self._remove(join(self._pending, f"{task_id}{TASK_EXTENSION}"))
+            self._remove(join(self._results, f"{task_id}{RESULT_EXTENSION}"))
+
+
+def fit_task(payload: bytes) -> bytes:
+    task = pickle.loads(payload)
+    regressor: Regressor = task["regressor"]
+    try:
+        regressor.fit(task["dataset"])
+    except Exception as error:
+        # Fitting errors are deterministic, so they are reported instead of letting the task be reassigned
+        return pickle.dumps({"error": f"{type(error).__name__}: {error}"}, protocol=pickle.HIGHEST_PROTOCOL)
+    return pickle.dumps({"regressor": regressor}, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def run_worker(
+        broker: Broker,
+        worker_id: str | None = None,
+        lease_seconds: float = 60.0,
+        poll_seconds: float = 1.0,
+        max_tasks: int | None = None
+) -> int:
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    n_tasks = 0
+    while max_tasks is None or n_tasks < max_tasks:
+        task = broker.claim(worker_id)
+        if task is None:
+            time.sleep(poll_seconds)
+            continue
+        task_id, payload = task
+        logger.info(f"Worker {worker_id} fitting task {task_id}")
+
+        finished = threading.Event()
+
+        def _renew_lease() -> None:
+            # Renewed well within the lease, so only a worker that is gone loses its task
+            while not finished.wait(lease_seconds / 3):
+                if not broker.renew(task_id, worker_id):
+                    return
+
+        heartbeat = threading.Thread(target=_renew_lease, daemon=True)
+        heartbeat.start()
+        try:
+            result = fit_task(payload)
+        finally:
+            finished.set()
+            heartbeat.join()
+        broker.complete(task_id, worker_id, result)
+        n_tasks += 1
+    return n_tasks
+
+
+class DistributedTrainingCoordinator:
+    def __init__(
+            self,
+            broker: Broker,
+            lease_seconds: float = 60.0,
+            poll_seconds: float = 0.5,
+            max_attempts: int = 3,
+            claim_timeout_seconds: float = 300.0
+    ) -> None:
+        self.broker = broker
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.claim_timeout_seconds = claim_timeout_seconds
+
+    def _publish(self, tasks: dict[str, int], regressors: list[Regressor], datasets: list[Dataset]) -> None:
+        for task_id, index in tasks.items():
+            payload = {"regressor": regressors[index], "dataset": datasets[index]}
+            self.broker.publish(task_id, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+
+    async def fit_members(
+            self, regressors: list[Regressor], datasets: list[Dataset]
+    ) -> AsyncIterator[tuple[int, Regressor]]:
+        job_id = uuid.uuid4().hex[:12]
+        tasks = {f"{job_id}-{index}": index for index in range(len(regressors))}
+        attempts = dict.fromkeys(tasks, 1)
+        pending = set(tasks)
+        await run_in_executor(None, self._publish, tasks, regressors, datasets)
+        idle_since = time.monotonic()
+
+        try:
+            while pending:
+                # Expired leases only reclaim tasks a worker has taken, so without a live worker nothing would ever
+                # end the job; queued tasks behind busy workers do not count as long as any task is leased
+                if len(await run_in_executor(None, self.broker.list_unclaimed, list(pending))) < len(pending):
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since > self.claim_timeout_seconds:
+                    raise DistributedTrainingError(
+                        f"No worker has claimed a member for {self.claim_timeout_seconds} seconds"
+                    )
+
+                # Chunks of workers that stopped renewing their lease are handed to the remaining workers
+                for task_id in await run_in_executor(None, self.broker.requeue_expired, self.lease_seconds):
+                    if task_id not in pending:
+                        continue
+                    attempts[task_id] += 1
+                    logger.info(f"Reassigning member {tasks[task_id]} after its worker was lost")
+                    if attempts[task_id] > self.max_attempts:
+                        raise DistributedTrainingError(
+                            f"Member {tasks[task_id]} was not fitted after {self.max_attempts} attempts"
+                        )
+
+                results = await run_in_executor(None, self.broker.collect, list(pending))
+                for task_id, result in results.items():
+                    pending.discard(task_id)
+                    result = pickle.loads(result)
+                    if "error" in result:
+                        raise DistributedTrainingError(f"Member {tasks[task_id]} failed: {result['error']}")
+                    yield tasks[task_id], result["regressor"]
+
+                if pending and not results:
+                    await asyncio.sleep(self.poll_seconds)
+        finally:
+            # Also drops tasks that are still queued or fitted by a worker after a failure
+            await run_in_executor(None, self.broker.cancel, list(tasks))
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Fit ensemble members published by a training coordinator")
+    parser.add_argument("broker_directory", help="Broker directory shared with the service (TRAINING_BROKER_DIRECTORY)")
+    parser.add_argument("--worker-id", default=None, help="Worker name, <hostname>-<pid> by default")
+    parser.add_argument("--lease-seconds", type=float, default=60.0)
+    parser.add_argument("--poll-seconds", type=float, default=1.0)
+    parser.add_argument("--max-tasks", type=int, default=None)
+    args = parser.parse_args(arguments)
+
+    run_worker(FileBroker(args.broker_directory), args.worker_id, args.lease_seconds, args.poll_seconds, args.max_tasks)
+
+
+if __name__ == "__main__":
+    main()
@@ -36,3 +36,136 @@ class InferenceSampleHasUnexpectedShapeError(Exception):
         self.inference_sample_shape = inference_sample_shape
         self.message = message.format(inference_sample_shape, expected_sample_shape)
         super().__init__(self.message)
+
+
+class UnknownRegressorBackendError(Exception):
+    def __init__(
+            self,
+            backend: str,
+            available_backends: list[str],
+            message="Unknown regressor backend '{}'. Available backends: {}"
+    ):
+        self.backend = backend
+        self.message = message.format(backend, ", ".join(available_backends))
+        super().__init__(self.message)
+
+
+class MemoryBudgetExceededError(Exception):
+    def __init__(
+            self,
+            stage: str,
+            rss_bytes: int,
+            budget_bytes: int,
+            message="Training memory budget of {} bytes exceeded during stage '{}' ({} bytes resident)"
+    ):
+        self.stage = stage
+        self.rss_bytes = rss_bytes
+        self.budget_bytes = budget_bytes
+        self.message = message.format(budget_bytes, stage, rss_bytes)
+        super().__init__(self.message)
+
+
+class InvalidModelNameError(Exception):
+    def __init__(self, name: str, message="Invalid model name '{}'. Use letters, digits, '_' and '-' only"):
+        self.name = name
+        self.message = message.format(name)
+        super().__init__(self.message)
+
+
+class UnknownModelError(Exception):
+    def __init__(self, name: str, message="Model '{}' does not exist"):
+        self.name = name
+        self.message = message.format(name)
+        super().__init__(self.message)
+
+
+class PredictionTooLargeError(Exception):
+    def __init__(self, n_samples: int, max_samples: int, message="Request has {} samples. At most {} are allowed"):
+        self.n_samples = n_samples
+        self.max_samples = max_samples
+        self.message = message.format(n_samples, max_samples)
+        super().__init__(self.message)
+
+
+class PredictionBodyTooLargeError(Exception):
+    def __init__(self, n_bytes: int, max_bytes: int, message="Request body has {} bytes. At most {} are allowed"):
+        self.n_bytes = n_bytes
+        self.max_bytes = max_bytes
+        self.message = message.format(n_bytes, max_bytes)
+        super().__init__(self.message)
+
+
+class PredictionOverloadedError(Exception):
+    def __init__(self, retry_after_seconds: int, message="Too many samples are being predicted. Retry later"):
+        self.retry_after_seconds = retry_after_seconds
+        self.message = message
+        super().__init__(self.message)
+
+
+class PredictionDeadlineExceededError(Exception):
+    def __init__(
+            self,
+            deadline_seconds: float,
+            retry_after_seconds: int,
+            message="Prediction did not finish within {} seconds"
+    ):
+        self.deadline_seconds = deadline_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.message = message.format(deadline_seconds)
+        super().__init__(self.message)
+
+
+class StreamingIngestionError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class StreamingIngestionTooLargeError(Exception):
+    def __init__(self, max_bytes: int, message="Request body exceeds the limit of {} bytes"):
+        self.max_bytes = max_bytes
+        self.message = message.format(max_bytes)
+        super().__init__(self.message)
+
+
+class AnytimePredictionNotSupportedError(Exception):
+    def __init__(self, message="Prediction with a latency budget is only supported by forest-based regressors"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class DistributedTrainingError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class UnsupportedNNeighborsError(Exception):
+    def __init__(
+            self,
+            n_neighbors: int,
+            available: list[int],
+            message="Model was not labeled with n_neighbors={}. Available: {}"
+    ):
+        self.n_neighbors = n_neighbors
+        self.available = available
+        self.message = message.format(n_neighbors, available)
+        super().__init__(self.message)
+
+
+class InvalidFeatureMatrixError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class PredictionShardError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+        super().__init__(self.message)
+
+
+class PredictionShardUnavailableError(PredictionShardError):
+    def __init__(self, index: int, reason: str, message="Shard {} is not available: {}"):
+        self.index = index
+        super().__init__(message.format(index, reason))
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from typing import AsyncIterator
+
+import numpy as np
+import orjson
+
+from data.models import Dataset, round_features
+from exceptions import InvalidFeatureMatrixError, StreamingIngestionError, StreamingIngestionTooLargeError
+
+NDJSON_MEDIA_TYPE: str = "application/x-ndjson"
+RECORDS_MEDIA_TYPE: str = "application/octet-stream"
+RECORD_DTYPE = np.dtype("<f8")
+INITIAL_ROWS: int = 4096
+MAX_PREALLOCATED_BYTES: int = 64 * 2 ** 20
+
+
+class FeatureBuffer:
+    def __init__(self, n_features: int | None = None, capacity: int = INITIAL_ROWS) -> None:
+        self.n_features = n_features
+        self.n_rows = 0
+        self._capacity = capacity
+        self._buffer: np.ndarray | None = None
+
+    @property
+    def features(self) -> np.ndarray:
+        if self._buffer is None:
+            return np.empty((0, self.n_features or 0))
+        return self._buffer[:self.n_rows]
+
+    def append(self, rows: np.ndarray) -> None:
+        if rows.ndim != 2:
+            raise StreamingIngestionError(f"Row {self.n_rows} is not a flat list of numbers")
+        if self.n_features is None:
+            self.n_features = rows.shape[1]
+        if rows.shape[1] != self.n_features:
+            raise StreamingIngestionError(
+                f"Row {self.n_rows} has {rows.shape[1]} features. Expected {self.n_features}"
+            )
+        self.reserve(self.n_rows + rows.shape[0])
+        self._buffer[self.n_rows:self.n_rows + rows.shape[0]] = rows
+        self.n_rows += rows.shape[0]
+
+    def reserve(self, n_rows: int) -> None:
+        if self._buffer is not None and n_rows <= self._buffer.shape[0]:
+            return
+        capacity = max(self._capacity, n_rows)
+        if self._buffer is not None:
+            # Grown geometrically, so the copies add up to a constant number of passes over the data
+            capacity = max(capacity, 2 * self._buffer.shape[0])
+        buffer = np.empty((capacity, self.n_features), dtype=np.float64)
+        if self._buffer is not None:
+            buffer[:self.n_rows] = self._buffer[:self.n_rows]
+        self._buffer = buffer
+
+    def to_dataset(self) -> Dataset:
+        if self.n_rows == 0:
+            raise StreamingIngestionError("Request body does not contain any samples")
+        # Unused capacity is released in place, so the dataset holds a single copy of the rows
+        self._buffer.resize((self.n_rows, self.n_features), refcheck=False)
+        return Dataset.from_features(self._buffer)
+
+
+def _parse_ndjson_lines(lines: list[bytes], first_row: int) -> np.ndarray:
+    rows = []
+    for offset, line in enumerate(lines):
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as error:
+            raise StreamingIngestionError(f"Row {first_row + offset} is not valid JSON: {error}")
+        # Each line is either a Sample object or a bare list of features
+        rows.append(record["features"] if isinstance(record, dict) and "features" in record else record)
+    try:
+        return np.array(rows, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise StreamingIngestionError(f"Rows {first_row}-{first_row + len(lines) - 1} have inconsistent features")
+
+
+async def read_ndjson(stream: AsyncIterator[bytes], buffer: FeatureBuffer) -> None:
+    tail = b""
+    async for chunk in stream:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        lines = [line for line in lines if line.strip()]
+        if lines:
+            buffer.append(round_features(_parse_ndjson_lines(lines, buffer.n_rows)))
+    if tail.strip():
+        buffer.append(round_features(_parse_ndjson_lines([tail], buffer.n_rows)))
+
+
+async def read_records(
+        stream: AsyncIterator[bytes], buffer: FeatureBuffer, content_length: int | None = None
+) -> None:
+    record_size = RECORD_DTYPE.itemsize * buffer.n_features
+    if content_length is not None:
+        if content_length % record_size:
+            raise StreamingIngestionError(f"Body length {content_length} is not a multiple of the record size")
+        # The number of rows is known up front, so smaller bodies are allocated once. Content-Length comes from the
+        # client, so larger ones start from a bounded buffer that grows as rows actually arrive
+        buffer.reserve(min(content_length // record_size, max(INITIAL_ROWS, MAX_PREALLOCATED_BYTES // record_size)))
+
+    tail = b""
+    async for chunk in stream:
+        data = tail + chunk
+        complete = len(data) - len(data) % record_size
+        tail = data[complete:]
+        if complete:
+            rows = np.frombuffer(data, dtype=RECORD_DTYPE, count=complete // RECORD_DTYPE.itemsize)
+            buffer.append(round_features(rows.reshape(-1, buffer.n_features)))
+    if tail:
+        raise StreamingIngestionError("Request body ends with an incomplete record")
+
+
+async def _limit_stream(stream: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    n_bytes = 0
+    async for chunk in stream:
+        n_bytes += len(chunk)
+        if n_bytes > max_bytes:
+            raise StreamingIngestionTooLargeError(max_bytes)
+        yield chunk
+
+
+async def ingest(
+        stream: AsyncIterator[bytes],
+        media_type: str,
+        n_features: int | None = None,
+        content_length: int | None = None,
+        max_bytes: int | None = None
+) -> Dataset:
+    if max_bytes is not None:
+        if content_length is not None and content_length > max_bytes:
+            raise StreamingIngestionTooLargeError(max_bytes)
+        # Chunked uploads carry no Content-Length, so the limit is also enforced on the bytes that arrive
+        stream = _limit_stream(stream, max_bytes)
+
+    if media_type == NDJSON_MEDIA_TYPE:
+        buffer = FeatureBuffer(n_features)
+        await read_ndjson(stream, buffer)
+    elif media_type == RECORDS_MEDIA_TYPE:
+        if not n_features or n_features <= 0:
+            raise StreamingIngestionError("Binary records require a positive X-Feature-Width header")
+        buffer = FeatureBuffer(n_features)
+        await read_records(stream, buffer, content_length)
+    else:
+        raise StreamingIngestionError(
+            f"Unsupported media type '{media_type}'. Supported: {NDJSON_MEDIA_TYPE}, {RECORDS_MEDIA_TYPE}"
+        )
+    return buffer.to_dataset()
+
+
+def read_feature_matrix(body: bytes) -> np.ndarray:
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as error:
+        raise InvalidFeatureMatrixError(f"Request body is not valid JSON: {error}")
+    if not isinstance(payload, dict) or not ("features" in payload or "features_base64" in payload):
+        raise InvalidFeatureMatrixError("Request body must contain 'features' or 'features_base64'")
+
+    if "features_base64" in payload:
+        n_features = payload.get("n_features")
+        if not isinstance(n_features, int) or n_features <= 0:
+            raise InvalidFeatureMatrixError("'features_base64' requires a positive integer 'n_features'")
+        try:
+            buffer = base64.b64decode(payload["features_base64"], validate=True)
+        except (binascii.Error, TypeError, ValueError) as error:
+            raise InvalidFeatureMatrixError(f"'features_base64' is not valid base64: {error}")
+        if len(buffer) % (RECORD_DTYPE.itemsize * n_features):
+            raise InvalidFeatureMatrixError(f"Buffer length {len(buffer)} is not a multiple of the row size")
+        features = np.frombuffer(buffer, dtype=RECORD_DTYPE).reshape(-1, n_features)
+    else:
+        try:
+            # Rows are decoded into one array, no per-sample object is created or validated
+            features = np.array(payload["features"], dtype=np.float64)
+        except (TypeError, ValueError):
+            raise InvalidFeatureMatrixError("Rows of 'features' have inconsistent widths or non-numeric values")
+        if features.size == 0:
+            features = features.reshape(0, 0)
+        if features.ndim != 2:
+            raise InvalidFeatureMatrixError("'features' must be a list of rows")
+    # Raw buffers can carry NaN or infinity, which the regressors reject
+    if not np.isfinite(features).all():
+        raise InvalidFeatureMatrixError("Features must be finite numbers")
+    return round_features(features)
@@ -1,44 +1,207 @@
-from fastapi import BackgroundTasks, FastAPI, HTTPException, status
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+import os
+import re
+
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Request, status
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import ValidationError
+from starlette.datastructures import Headers
 
 import services
 from data.models import Dataset, Sample
 from exceptions import (
+    AnytimePredictionNotSupportedError,
     InferenceSampleHasUnexpectedShapeError,
-    ModelNotFittedError
+    InvalidFeatureMatrixError,
+    InvalidModelNameError,
+    ModelNotFittedError,
+    PredictionBodyTooLargeError,
+    PredictionDeadlineExceededError,
+    PredictionOverloadedError,
+    PredictionTooLargeError,
+    StreamingIngestionError,
+    StreamingIngestionTooLargeError,
+    UnknownModelError,
+    UnknownRegressorBackendError,
+    UnsupportedNNeighborsError
 )
+from ingestion import ingest, read_feature_matrix
+from ml.models import get_regressor_backend
+from profiling import ProfilingSession, get_profile_path, list_profiles, profile_coroutine
+from responses import EVENT_STREAM_MEDIA_TYPE, encode_anytime_predictions, encode_predictions, negotiate_media_type
+
+GZIP_MINIMUM_SIZE: int = 16 * 1024
+GZIP_COMPRESS_LEVEL: int = 1
+PREDICTION_PATH_PATTERN = re.compile(r"/predict(/matrix)?|/models/[^/]+/predict")
+
+
+def _to_admission_http_exception(
+        error: (
+            PredictionTooLargeError | PredictionBodyTooLargeError | PredictionOverloadedError
+            | PredictionDeadlineExceededError
+        )
+) -> HTTPException:
+    if isinstance(error, (PredictionTooLargeError, PredictionBodyTooLargeError)):
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(error)
+        )
+    return HTTPException(
+        status_code=(
+            status.HTTP_429_TOO_MANY_REQUESTS if isinstance(error, PredictionOverloadedError)
+            else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after_seconds)}
+    )
+
+
+class PredictionAdmissionMiddleware:
+    # An ASGI middleware instead of a dependency, FastAPI reads and decodes the body before dependencies run
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] == "http" and scope["method"] == "POST"
+            and PREDICTION_PATH_PATTERN.fullmatch(scope["path"])
+        ):
+            content_length = Headers(scope=scope).get("content-length")
+            try:
+                services.admission_controller.precheck(
+                    int(content_length) if content_length and content_length.isdigit() else None
+                )
+            except (PredictionBodyTooLargeError, PredictionOverloadedError) as error:
+                exception = _to_admission_http_exception(error)
+                response = JSONResponse(
+                    status_code=exception.status_code, content={"detail": exception.detail}, headers=exception.headers
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
 
 app = FastAPI()
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
+app.add_middleware(PredictionAdmissionMiddleware)
+
+
+@app.on_event("startup")
+async def load_saved_model() -> None:
+    # Loading runs in the background, so /status is served while the model is still being read
+    services.start_model_loading()
+
+
+@app.on_event("shutdown")
+async def stop_prediction_shards() -> None:
+    services.stop_prediction_shards()
 
 
 @app.post("/train")
-async def train_model(dataset: Dataset, background_tasks: BackgroundTasks) -> JSONResponse:
+async def train_model(
+        dataset: Dataset, background_tasks: BackgroundTasks, backend: str | None = None, profile: bool = False
+) -> JSONResponse:
+    content = {
+        "detail": "Job has been submitted"
+    }
     try:
-        background_tasks.add_task(services.train_model, dataset)
-    except ValidationError as error:
+        if backend is not None:
+            get_regressor_backend(backend)
+        if profile:
+            session = ProfilingSession("train")
+            background_tasks.add_task(profile_coroutine, session, services.train_model, dataset, backend)
+            content["profile_id"] = session.profile_id
+        else:
+            background_tasks.add_task(services.train_model, dataset, backend)
+    except (ValidationError, UnknownRegressorBackendError) as error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(error),
+        )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=content
+    )
+
+
+@app.post("/train/stream")
+async def train_model_from_stream(
+        request: Request,
+        background_tasks: BackgroundTasks,
+        backend: str | None = None,
+        content_type: str | None = Header(default=None),
+        x_feature_width: int | None = Header(default=None)
+) -> JSONResponse:
+    try:
+        if backend is not None:
+            get_regressor_backend(backend)
+        content_length = request.headers.get("content-length")
+        # Rows are parsed while the body is still arriving, so the raw upload is never held in memory as a whole
+        dataset = await ingest(
+            request.stream(),
+            media_type=(content_type or "").split(";")[0].strip(),
+            n_features=x_feature_width,
+            content_length=int(content_length) if content_length else None,
+            max_bytes=int(services.TRAIN_STREAM_MAX_MB * 2 ** 20) if services.TRAIN_STREAM_MAX_MB is not None else None
+        )
+    except StreamingIngestionTooLargeError as error:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(error),
+        )
+    except (StreamingIngestionError, UnknownRegressorBackendError) as error:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=str(error),
         )
+    background_tasks.add_task(services.train_model, dataset, backend)
     return JSONResponse(
         status_code=status.HTTP_202_ACCEPTED,
         content={
-            "detail": "Job has been submitted"
+            "detail": "Job has been submitted",
+            "samples": len(dataset)
         }
     )
 
 
 @app.post("/predict")
-async def get_model_prediction(samples: list[Sample]):
-    representativeness = []
+async def get_model_prediction(
+        samples: list[Sample],
+        accept: str | None = Header(default=None),
+        profile: bool = False,
+        deadline_ms: float | None = None,
+        tree_fraction: float | None = None,
+        k: int | None = None
+) -> Response:
+    media_type = negotiate_media_type(accept)
+    if tree_fraction is not None and not 0 < tree_fraction <= 1:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="tree_fraction must be in (0, 1]"
+        )
+    anytime = deadline_ms is not None or tree_fraction is not None
+    if anytime:
+        predict = services.get_model_anytime_predictions
+        arguments = (samples, deadline_ms / 1000 if deadline_ms is not None else None, tree_fraction, k)
+    else:
+        predict, arguments = services.get_model_predictions, (samples, k)
+
+    session = ProfilingSession("predict") if profile else None
     try:
-        for sample in samples:
-            representativeness.append(await services.get_model_prediction(sample))
-    except ValidationError as error:
+        if session is not None:
+            representativeness = await services.admission_controller.run(
+                len(samples), profile_coroutine, session, predict, *arguments
+            )
+        else:
+            representativeness = await services.admission_controller.run(len(samples), predict, *arguments)
+    except (PredictionTooLargeError, PredictionOverloadedError, PredictionDeadlineExceededError) as error:
+        raise _to_admission_http_exception(error)
+    except (ValidationError, AnytimePredictionNotSupportedError, UnsupportedNNeighborsError) as error:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=(
+                status.HTTP_400_BAD_REQUEST if isinstance(error, ValidationError)
+                else status.HTTP_422_UNPROCESSABLE_ENTITY
+            ),
             detail=str(error),
         )
     except (ModelNotFittedError, InferenceSampleHasUnexpectedShapeError) as error:
@@ -46,9 +209,44 @@ async def get_model_prediction(samples: list[Sample]):
             status_code=status.HTTP_202_ACCEPTED,
             detail=str(error)
         )
-    return jsonable_encoder({
-            "representativeness": representativeness
-    })
+    if anytime:
+        response = encode_anytime_predictions(representativeness, media_type)
+    else:
+        response = encode_predictions(representativeness, media_type)
+    if session is not None:
+        response.headers["X-Profile-Id"] = session.profile_id
+    return response
+
+
+@app.post("/predict/matrix")
+async def get_model_matrix_prediction(
+        request: Request, accept: str | None = Header(default=None), k: int | None = None
+) -> Response:
+    media_type = negotiate_media_type(accept)
+    try:
+        features = read_feature_matrix(await request.body())
+    except InvalidFeatureMatrixError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
+    try:
+        representativeness = await services.admission_controller.run(
+            features.shape[0], services.get_model_matrix_predictions, features, k
+        )
+    except (PredictionTooLargeError, PredictionOverloadedError, PredictionDeadlineExceededError) as error:
+        raise _to_admission_http_exception(error)
+    except UnsupportedNNeighborsError as error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(error)
+        )
+    except (ModelNotFittedError, InferenceSampleHasUnexpectedShapeError) as error:
+        raise HTTPException(
+            status_code=status.HTTP_202_ACCEPTED,
+            detail=str(error)
+        )
+    return encode_predictions(representativeness, media_type)
 
 
 @app.get("/status")
@@ -58,3 +256,120 @@ async def get_model_status():
         status_code=status.HTTP_200_OK,
         content=model_status
     )
+
+
+@app.get("/status/stream")
+async def stream_model_status():
+    return StreamingResponse(
+        services.stream_progress(),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        # GZipMiddleware buffers streamed bodies until enough data piles up, an encoding set here makes it skip events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Content-Encoding": "identity"}
+    )
+
+
+@app.get("/models")
+async def get_models():
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=await services.get_models_metrics()
+    )
+
+
+@app.post("/models/{name}/train")
+async def train_named_model(
+        name: str, dataset: Dataset, background_tasks: BackgroundTasks, backend: str | None = None
+) -> JSONResponse:
+    try:
+        if backend is not None:
+            get_regressor_backend(backend)
+        services.model_registry.get_or_create(name)
+    except (InvalidModelNameError, UnknownRegressorBackendError) as error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(error),
+        )
+    background_tasks.add_task(services.train_named_model, name, dataset, backend)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "detail": "Job has been submitted"
+        }
+    )
+
+
+@app.post("/models/{name}/predict")
+async def get_named_model_prediction(
+        name: str, samples: list[Sample], accept: str | None = Header(default=None), k: int | None = None
+) -> Response:
+    media_type = negotiate_media_type(accept)
+    try:
+        representativeness = await services.admission_controller.run(
+            len(samples), services.get_named_model_predictions, name, samples, k
+        )
+    except (PredictionTooLargeError, PredictionOverloadedError, PredictionDeadlineExceededError) as error:
+        raise _to_admission_http_exception(error)
+    except (InvalidModelNameError, UnknownModelError) as error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(error)
+        )
+    except UnsupportedNNeighborsError as error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(error)
+        )
+    except (ModelNotFittedError, InferenceSampleHasUnexpectedShapeError) as error:
+        raise HTTPException(
+            status_code=status.HTTP_202_ACCEPTED,
+            detail=str(error)
+        )
+    return encode_predictions(representativeness, media_type)
+
+
+@app.get("/models/{name}/status")
+async def get_named_model_status(name: str):
+    try:
+        model_status: dict[str, str] = await services.get_named_model_status(name)
+    except (InvalidModelNameError, UnknownModelError) as error:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(error)
+        )
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=model_status
+    )
+
+
+@app.get("/admin/admission")
+async def get_admission_metrics():
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=await services.get_admission_metrics()
+    )
+
+
+@app.get("/admin/profiles")
+async def get_profiles():
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "profiles": list_profiles()
+        }
+    )
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "pstats") -> FileResponse:
+    path = get_profile_path(profile_id, format)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile {profile_id} in {format} format does not exist"
+        )
+    return FileResponse(
+        path,
+        media_type="text/plain" if format == "collapsed" else "application/octet-stream",
+        filename=os.path.basename(path)
+    )
@@ -4,10 +4,20 @@ from .experiment_tracking import (
     ensure_fitted,
     track_experiment
 )
+from .checkpointing import TrainingCheckpoint
+from .progress import ProgressBroadcaster, ProgressSubscription, get_progress_broadcaster
+from .memory_tracking import MemoryTracker, StageMemoryUsage, get_rss_bytes
 
 __all__ = [
     TrainingStatus,
     ExperimentTracker,
     ensure_fitted,
-    track_experiment
+    track_experiment,
+    MemoryTracker,
+    StageMemoryUsage,
+    get_rss_bytes,
+    TrainingCheckpoint,
+    ProgressBroadcaster,
+    ProgressSubscription,
+    get_progress_broadcaster
 ]
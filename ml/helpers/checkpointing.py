@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from os.path import join
+from typing import Any
+
+import numpy as np
+
+from data.models import Dataset
+from logs import Logger
+
+logger = Logger(__name__)
+
+
+class TrainingCheckpoint:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    @classmethod
+    def for_job(cls, root: str, dataset: Dataset, **parameters: Any) -> TrainingCheckpoint:
+        # The same dataset submitted with the same settings maps to the same directory, which is what makes it resumable
+        # Hashed through the buffer protocol, tobytes would copy the whole feature matrix
+        digest = hashlib.sha256(np.ascontiguousarray(dataset.get_feature_representation()).data)
+        weights = dataset.get_weight_representation()
+        if weights is not None:
+            digest.update(weights.tobytes())
+        digest.update(json.dumps(parameters, sort_keys=True, default=str).encode())
+        return cls(join(root, digest.hexdigest()[:16]))
+
+    def _get_path(self, name: str) -> str:
+        return join(self.directory, name)
+
+    def _write(self, name: str, value: Any) -> None:
+        import joblib
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Written next to the target and renamed, so an interrupted write never leaves a checkpoint that looks complete
+        temporary_path = f"{self._get_path(name)}.tmp"
+        joblib.dump(value, temporary_path, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self._get_path(name))
+
+    def _read(self, name: str) -> Any | None:
+        import joblib
+
+        path = self._get_path(name)
+        if not os.path.isfile(path):
+            return None
+        try:
+            return joblib.load(path)
+        except Exception as error:
+            logger.error(f"Ignoring unreadable checkpoint {path}: {error}")
+            return None
+
+    def load_order(self) -> np.ndarray | None:
+        return self._read("order.pkl")
+
+    def save_order(self, order: np.ndarray) -> None:
+        self._write("order.pkl", order)
+
+    def has_chunk(self, index: int) -> bool:
+        return os.path.isfile(self._get_path(f"chunk_{index}.pkl"))
+
+    def load_chunk(self, index: int) -> Dataset | None:
+        return self._read(f"chunk_{index}.pkl")
+
+    def save_chunk(self, index: int, chunk: Dataset) -> None:
+        self._write(f"chunk_{index}.pkl", chunk)
+
+    def has_member(self, index: int) -> bool:
+        return os.path.isfile(self._get_path(f"member_{index}.pkl"))
+
+    def load_member(self, index: int) -> Any | None:
+        return self._read(f"member_{index}.pkl")
+
+    def save_member(self, index: int, regressor: Any) -> None:
+        self._write(f"member_{index}.pkl", regressor)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
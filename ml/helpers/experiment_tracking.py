@@ -2,16 +2,22 @@ from enum import Enum
 from datetime import datetime
 from exceptions import (
     ModelNotFittedError,
-    EnsembleModelFitWithoutComponentRegressorsRegisteredError,
-    InferenceSampleHasUnexpectedShapeError
+    EnsembleModelFitWithoutComponentRegressorsRegisteredError
 )
 from functools import wraps
 from typing import Callable
 
+from logs import Logger
+
+from .progress import get_progress_broadcaster
+
+logger = Logger(__name__)
+
 
 class TrainingStatus(Enum):
     NOT_STARTED = "Training has not started yet"
     AWAIT = "Awaiting data to be preprocessed"
+    LOADING = "Loading saved model"
     DURING_TRAINING = "Training in progress"
     ERROR = "An error has occurred during training"
     FINISHED = "Training has finished"
@@ -22,46 +28,55 @@ class ExperimentTracker:
     def get_current_datetime_representation() -> str:
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    @staticmethod
+    def publish(regressor, event_type: str, **payload) -> None:
+        get_progress_broadcaster().publish(event_type, model=getattr(regressor, "name", None), **payload)
+
     @staticmethod
     def handle_training_started(regressor) -> None:
         regressor.status = TrainingStatus.DURING_TRAINING
         regressor.start_training_time = ExperimentTracker.get_current_datetime_representation()
+        ExperimentTracker.publish(regressor, "training", status=regressor.status.value)
 
     @staticmethod
     def handle_training_finished(regressor) -> None:
         regressor.status = TrainingStatus.FINISHED
         regressor.stop_training_time = ExperimentTracker.get_current_datetime_representation()
+        ExperimentTracker.publish(regressor, "training", status=regressor.status.value)
 
     @staticmethod
     def handle_training_failed(regressor) -> None:
         regressor.status = TrainingStatus.ERROR
         regressor.error_training_time = ExperimentTracker.get_current_datetime_representation()
+        ExperimentTracker.publish(regressor, "training", status=regressor.status.value)
+
+    @staticmethod
+    def handle_stage_started(regressor, stage: str) -> None:
+        ExperimentTracker.publish(regressor, "stage", stage=stage, state="started")
+
+    @staticmethod
+    def handle_stage_finished(regressor, stage: str) -> None:
+        ExperimentTracker.publish(regressor, "stage", stage=stage, state="finished")
+
+    @staticmethod
+    def handle_stage_failed(regressor, stage: str, error: BaseException) -> None:
+        ExperimentTracker.publish(regressor, "stage", stage=stage, state="failed", error=str(error))
+
+    @staticmethod
+    def handle_member_status(regressor, index: int, status: TrainingStatus) -> None:
+        ExperimentTracker.publish(regressor, "member", member=index, status=status.value)
 
 
 def ensure_fitted(func: Callable) -> Callable:
     @wraps(func)
-    def wrapper(self, *args, **kwargs):
+    def wrapper(self, samples, *args, **kwargs):
         if hasattr(self, "_regressors"):
-            regressors = self.get_regressors()
-            if len(regressors) > 0 and self.status == TrainingStatus.FINISHED:
-                expected_sample_shape = (regressors[0].model.estimators_[0].max_features_,)
-                inference_sample_shape = (len(args[0].features),)
-                if expected_sample_shape != inference_sample_shape:
-                    raise InferenceSampleHasUnexpectedShapeError(
-                        expected_sample_shape=expected_sample_shape,
-                        inference_sample_shape=inference_sample_shape
-                    )
-            elif len(regressors) == 0 or self.status != TrainingStatus.FINISHED:
+            if len(self.get_regressors()) == 0 or self.status != TrainingStatus.FINISHED:
                 raise ModelNotFittedError
-        else:
-            expected_sample_shape = (self.model.estimators_[0].max_features_,)
-            inference_sample_shape = (len(args[0].features),)
-            if expected_sample_shape != inference_sample_shape:
-                raise InferenceSampleHasUnexpectedShapeError(
-                    expected_sample_shape=expected_sample_shape,
-                    inference_sample_shape=inference_sample_shape
-                )
-        return func(self, *args, **kwargs)
+        if self.schema is None:
+            raise ModelNotFittedError
+        self.schema.check_inference_shape(samples)
+        return func(self, samples, *args, **kwargs)
     return wrapper
 
 
@@ -75,8 +90,10 @@ def track_experiment(func: Callable) -> Callable:
         else:
             try:
                 await func(self, *args, **kwargs)
-            except Exception:
+            except Exception as error:
+                logger.error(f"Training has failed: {error}")
                 ExperimentTracker.handle_training_failed(self)
+                return
         ExperimentTracker.handle_training_finished(self)
 
     return wrapper
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator
+
+from pydantic import BaseModel
+
+from exceptions import MemoryBudgetExceededError
+
+SAMPLING_INTERVAL: float = 0.05
+
+# Tracing is process-wide, so it is shared by every tracker and stopped only after the last one stops
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users: int = 0
+_tracemalloc_started: bool = False
+
+
+def _acquire_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            # Tracing started by someone else is left to them
+            tracemalloc.start()
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+def get_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Without procfs only the peak RSS is available; ru_maxrss is in kilobytes on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class StageMemoryUsage(BaseModel):
+    rss_delta_bytes: int = 0
+    peak_rss_bytes: int = 0
+    peak_traced_bytes: int = 0
+
+
+class _ActiveStage:
+    def __init__(self, rss: int, traced: int) -> None:
+        self.rss_start = rss
+        self.traced_start = traced
+        self.peak_rss = rss
+        self.peak_traced = traced
+
+
+class MemoryTracker:
+    def __init__(self, budget_bytes: int | None = None, sampling_interval: float = SAMPLING_INTERVAL) -> None:
+        self.budget_bytes = budget_bytes
+        self._sampling_interval = sampling_interval
+        self._stages: dict[str, StageMemoryUsage] = {}
+        self._active_stages: dict[str, _ActiveStage] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._watchdog: threading.Thread | None = None
+        self._tracing = False
+        self._exceeded_rss: int | None = None
+
+    def start(self) -> None:
+        if not self._tracing:
+            _acquire_tracemalloc()
+            self._tracing = True
+        self._stopped.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="memory-tracker", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+        if self._tracing:
+            _release_tracemalloc()
+            self._tracing = False
+
+    @contextmanager
+    def track_stage(self, name: str) -> Iterator[None]:
+        # Checked on entry only, a stage that has completed keeps its result; an excess it caused, recorded by the
+        # watchdog, stops the next stage
+        self.check_budget(name)
+        stage = _ActiveStage(get_rss_bytes(), tracemalloc.get_traced_memory()[0])
+        with self._lock:
+            self._active_stages[name] = stage
+        try:
+            yield
+        finally:
+            self._sample()
+            rss = get_rss_bytes()
+            with self._lock:
+                self._active_stages.pop(name)
+                self._stages[name] = StageMemoryUsage(
+                    rss_delta_bytes=rss - stage.rss_start,
+                    peak_rss_bytes=max(stage.peak_rss, rss),
+                    peak_traced_bytes=stage.peak_traced - stage.traced_start
+                )
+
+    def check_budget(self, stage: str) -> None:
+        if self.budget_bytes is None:
+            return
+        rss = max(get_rss_bytes(), self._exceeded_rss or 0)
+        if rss > self.budget_bytes:
+            raise MemoryBudgetExceededError(stage=stage, rss_bytes=rss, budget_bytes=self.budget_bytes)
+
+    def get_report(self) -> dict:
+        with self._lock:
+            stages = {name: usage.dict() for name, usage in self._stages.items()}
+        return {
+            "budget_bytes": self.budget_bytes,
+            "stages": stages
+        }
+
+    def _sample(self) -> None:
+        rss = get_rss_bytes()
+        with self._lock:
+            # The traced peak is reset on every sample, so each sample reports the peak of the elapsed interval
+            traced = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+            tracemalloc.reset_peak()
+            for stage in self._active_stages.values():
+                stage.peak_rss = max(stage.peak_rss, rss)
+                stage.peak_traced = max(stage.peak_traced, traced)
+        if self.budget_bytes is not None and rss > self.budget_bytes and self._exceeded_rss is None:
+            self._exceeded_rss = rss
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self._sampling_interval):
+            self._sample()
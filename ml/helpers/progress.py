@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any
+
+SUBSCRIBER_BUFFER_SIZE: int = 256
+
+
+class ProgressSubscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, buffer_size: int) -> None:
+        self._loop = loop
+        self._events: deque[dict] = deque(maxlen=buffer_size)
+        self._available = asyncio.Event()
+        self.dropped = 0
+
+    def _push(self, event: dict) -> None:
+        # A slow client loses its oldest events instead of holding memory for the others
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+        self._available.set()
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        if not self._events:
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        event = self._events.popleft()
+        if self.dropped:
+            event, self.dropped = {**event, "dropped": self.dropped}, 0
+        return event
+
+
+class ProgressBroadcaster:
+    def __init__(self, buffer_size: int = SUBSCRIBER_BUFFER_SIZE) -> None:
+        self._buffer_size = buffer_size
+        self._subscriptions: set[ProgressSubscription] = set()
+        self._lock = threading.Lock()
+        self.sequence = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self) -> ProgressSubscription:
+        subscription = ProgressSubscription(asyncio.get_running_loop(), self._buffer_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ProgressSubscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event_type: str, **payload: Any) -> None:
+        # Called from the event loop as well as from executor threads fitting ensemble members
+        with self._lock:
+            self.sequence += 1
+            event = {
+                "id": self.sequence,
+                "event": event_type,
+                "time": datetime.now().isoformat(timespec="milliseconds"),
+                **payload
+            }
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            try:
+                subscription._loop.call_soon_threadsafe(subscription._push, event)
+            except RuntimeError:
+                # The loop of a subscriber that did not unsubscribe has been closed
+                self.unsubscribe(subscription)
+
+
+_progress_broadcaster: ProgressBroadcaster | None = None
+
+
+def get_progress_broadcaster() -> ProgressBroadcaster:
+    global _progress_broadcaster
+    if _progress_broadcaster is None:
+        _progress_broadcaster = ProgressBroadcaster()
+    return _progress_broadcaster
@@ -1,16 +1,56 @@
+from __future__ import annotations
+
 from .regressors import (
     Regressor,
+    SklearnBasedRegressor,
+    ForestBasedRegressor,
     RandomForestBasedRegressor,
+    ExtraTreesBasedRegressor,
+    HistGradientBoostingBasedRegressor,
+    NearestNeighborsBasedRegressor,
     EnsembleRandomForestBasedRegressor,
+    AnytimePrediction,
     TrainingStatus
 )
+from .backends import REGRESSOR_BACKENDS, get_regressor_backend
+from .compaction import CompactForest, CompactionReport
+from .registry import ModelMetrics, ModelRegistry
+from .schema import ModelSchema
+
+_ensemble_random_forest_based_regressor: EnsembleRandomForestBasedRegressor | None = None
+
+
+def get_ensemble_regressor() -> EnsembleRandomForestBasedRegressor:
+    global _ensemble_random_forest_based_regressor
+    if _ensemble_random_forest_based_regressor is None:
+        _ensemble_random_forest_based_regressor = EnsembleRandomForestBasedRegressor()
+    return _ensemble_random_forest_based_regressor
+
+
+def __getattr__(name: str):
+    # Kept for backwards compatibility, the global ensemble is created on first access
+    if name == "ensemble_random_forest_based_regressor":
+        return get_ensemble_regressor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-ensemble_random_forest_based_regressor = EnsembleRandomForestBasedRegressor()
 
 __all__ = [
     Regressor,
+    SklearnBasedRegressor,
+    ForestBasedRegressor,
     RandomForestBasedRegressor,
+    ExtraTreesBasedRegressor,
+    HistGradientBoostingBasedRegressor,
+    NearestNeighborsBasedRegressor,
     EnsembleRandomForestBasedRegressor,
+    AnytimePrediction,
     TrainingStatus,
-    ensemble_random_forest_based_regressor
+    REGRESSOR_BACKENDS,
+    get_regressor_backend,
+    ModelSchema,
+    CompactForest,
+    CompactionReport,
+    ModelMetrics,
+    ModelRegistry,
+    get_ensemble_regressor
 ]
@@ -0,0 +1,22 @@
+from exceptions import UnknownRegressorBackendError
+
+from .regressors import (
+    ExtraTreesBasedRegressor,
+    HistGradientBoostingBasedRegressor,
+    NearestNeighborsBasedRegressor,
+    RandomForestBasedRegressor,
+    Regressor
+)
+
+REGRESSOR_BACKENDS: dict[str, type[Regressor]] = {
+    "random_forest": RandomForestBasedRegressor,
+    "extra_trees": ExtraTreesBasedRegressor,
+    "hist_gradient_boosting": HistGradientBoostingBasedRegressor,
+    "nearest_neighbors": NearestNeighborsBasedRegressor,
+}
+
+
+def get_regressor_backend(name: str) -> type[Regressor]:
+    if name not in REGRESSOR_BACKENDS:
+        raise UnknownRegressorBackendError(backend=name, available_backends=list(REGRESSOR_BACKENDS))
+    return REGRESSOR_BACKENDS[name]
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import BaseEnsemble
+
+PREDICTION_BATCH_SIZE: int = 4096
+
+
+class CompactionReport(BaseModel):
+    tolerance: float
+    nodes_before: int
+    nodes_after: int
+    bytes_before: int
+    bytes_after: int
+    max_abs_drift: float
+    mean_abs_drift: float
+
+
+class CompactForest:
+    def __init__(
+            self,
+            feature: np.ndarray,
+            threshold: np.ndarray,
+            children_left: np.ndarray,
+            children_right: np.ndarray,
+            value: np.ndarray,
+            roots: np.ndarray,
+            max_depth: int,
+            n_features_in: int
+    ) -> None:
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features_in
+
+    @property
+    def node_count(self) -> int:
+        return self.feature.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            array.nbytes for array in
+            (self.feature, self.threshold, self.children_left, self.children_right, self.value, self.roots)
+        )
+
+    @classmethod
+    def from_forest(cls, forest: BaseEnsemble, tolerance: float = 0.0) -> CompactForest:
+        trees = [_compact_tree(estimator.tree_, tolerance) for estimator in forest.estimators_]
+
+        offsets = np.cumsum([0] + [tree["feature"].shape[0] for tree in trees[:-1]]).astype(np.int32)
+        return cls(
+            feature=np.concatenate([tree["feature"] for tree in trees]),
+            threshold=np.concatenate([tree["threshold"] for tree in trees]),
+            children_left=np.concatenate([
+                _shift(tree["children_left"], offset) for tree, offset in zip(trees, offsets)
+            ]),
+            children_right=np.concatenate([
+                _shift(tree["children_right"], offset) for tree, offset in zip(trees, offsets)
+            ]),
+            value=np.concatenate([tree["value"] for tree in trees]),
+            roots=offsets,
+            max_depth=max(tree["max_depth"] for tree in trees),
+            n_features_in=forest.n_features_in_
+        )
+
+    def _get_leaf_values(self, batch: np.ndarray, roots: np.ndarray) -> np.ndarray:
+        n_features = batch.shape[1]
+        flat_batch = batch.ravel()
+        # One (row, tree) cursor per entry; only cursors that have not reached a leaf are advanced
+        nodes = np.tile(roots, batch.shape[0])
+        row_offsets = np.repeat(np.arange(batch.shape[0]) * n_features, roots.shape[0])
+        active = np.flatnonzero(self.feature[nodes] >= 0)
+        while active.size:
+            current = nodes[active]
+            go_left = flat_batch[row_offsets[active] + self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.children_left[current], self.children_right[current])
+            nodes[active] = following
+            active = active[self.feature[following] >= 0]
+        return self.value[nodes].reshape(batch.shape[0], roots.shape[0], -1)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        features = np.asarray(features, dtype=np.float32)
+        n_samples = features.shape[0]
+        predictions = np.empty((n_samples, self.value.shape[1]), dtype=np.float64)
+
+        for start in range(0, n_samples, PREDICTION_BATCH_SIZE):
+            batch = features[start:start + PREDICTION_BATCH_SIZE]
+            predictions[start:start + batch.shape[0]] = (
+                self._get_leaf_values(batch, self.roots).mean(axis=1, dtype=np.float64)
+            )
+
+        return predictions[:, 0] if predictions.shape[1] == 1 else predictions
+
+    def predict_trees(self, features: np.ndarray, trees: np.ndarray, output: int = 0) -> np.ndarray:
+        features = np.asarray(features, dtype=np.float32)
+        roots = self.roots[trees]
+        return np.concatenate([
+            self._get_leaf_values(features[start:start + PREDICTION_BATCH_SIZE], roots)[:, :, output]
+            for start in range(0, features.shape[0], PREDICTION_BATCH_SIZE)
+        ]).astype(np.float64)
+
+
+def _compact_tree(tree, tolerance: float) -> dict[str, np.ndarray | int]:
+    children_left, children_right = tree.children_left, tree.children_right
+    values = tree.value[:, :, 0]
+    is_leaf = children_left == -1
+
+    levels = _get_levels(children_left, children_right)
+
+    # Nodes are stored in depth-first order, so sweeping levels bottom-up sees children before parents
+    subtree_min, subtree_max = values.copy(), values.copy()
+    for level in reversed(levels):
+        internal = level[~is_leaf[level]]
+        left, right = children_left[internal], children_right[internal]
+        subtree_min[internal] = np.minimum(subtree_min[left], subtree_min[right])
+        subtree_max[internal] = np.maximum(subtree_max[left], subtree_max[right])
+
+    # An internal node already holds the weighted mean of its subtree, so a collapsed node keeps its own value
+    effective_leaf = is_leaf | np.all(subtree_max - subtree_min <= tolerance, axis=1)
+
+    reachable, frontier = [], np.array([0])
+    while frontier.size:
+        reachable.append(frontier)
+        internal = frontier[~effective_leaf[frontier]]
+        frontier = np.concatenate([children_left[internal], children_right[internal]])
+    max_depth = len(reachable) - 1
+    reachable = np.concatenate(reachable)
+
+    new_index = np.full(tree.node_count, -1, dtype=np.int32)
+    new_index[reachable] = np.arange(reachable.shape[0], dtype=np.int32)
+    leaf = effective_leaf[reachable]
+
+    return {
+        "feature": np.where(leaf, -1, tree.feature[reachable]).astype(np.int32),
+        "threshold": np.where(leaf, 0, tree.threshold[reachable]).astype(np.float32),
+        "children_left": np.where(leaf, -1, new_index[children_left[reachable]]).astype(np.int32),
+        "children_right": np.where(leaf, -1, new_index[children_right[reachable]]).astype(np.int32),
+        "value": values[reachable].astype(np.float32),
+        "max_depth": max_depth
+    }
+
+
+def _shift(children: np.ndarray, offset: int) -> np.ndarray:
+    return np.where(children == -1, -1, children + offset).astype(np.int32)
+
+
+def _get_levels(children_left: np.ndarray, children_right: np.ndarray) -> list[np.ndarray]:
+    levels, frontier = [], np.array([0])
+    while frontier.size:
+        levels.append(frontier)
+        internal = frontier[children_left[frontier] != -1]
+        frontier = np.concatenate([children_left[internal], children_right[internal]])
+    return levels
+
+
+def get_forest_nbytes(forest: BaseEnsemble) -> int:
+    nbytes = 0
+    for estimator in forest.estimators_:
+        state = estimator.tree_.__getstate__()
+        nbytes += state["nodes"].nbytes + state["values"].nbytes
+    return nbytes
+
+
+def compact_forest(
+        forest: BaseEnsemble, reference_features: np.ndarray, tolerance: float = 0.0
+) -> tuple[CompactForest, CompactionReport]:
+    compacted = CompactForest.from_forest(forest, tolerance)
+    drift = np.abs(forest.predict(reference_features) - compacted.predict(reference_features))
+
+    report = CompactionReport(
+        tolerance=tolerance,
+        nodes_before=sum(estimator.tree_.node_count for estimator in forest.estimators_),
+        nodes_after=compacted.node_count,
+        bytes_before=get_forest_nbytes(forest),
+        bytes_after=compacted.nbytes,
+        max_abs_drift=float(drift.max()) if drift.size else 0.0,
+        mean_abs_drift=float(drift.mean()) if drift.size else 0.0
+    )
+    return compacted, report
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from os.path import join
+
+from exceptions import InvalidModelNameError, UnknownModelError
+from logs import Logger
+from ml.helpers import TrainingStatus
+from profiling import run_in_executor
+
+from .regressors import EnsembleRandomForestBasedRegressor
+
+logger = Logger(__name__)
+
+MODEL_NAME_PATTERN = re.compile(r"[\w-]+")
+SNAPSHOT_EXTENSION: str = ".pkl"
+
+
+class ModelMetrics:
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.hits: int = 0
+        self.reloads: int = 0
+        self.evictions: int = 0
+        self.reload_seconds: list[float] = []
+
+    def record_hit(self) -> None:
+        self.requests += 1
+        self.hits += 1
+
+    def record_reload(self, seconds: float) -> None:
+        self.requests += 1
+        self.reloads += 1
+        self.reload_seconds.append(seconds)
+
+    def summarize(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "reloads": self.reloads,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / self.requests, 4) if self.requests else None,
+            "mean_reload_ms": (
+                round(sum(self.reload_seconds) / len(self.reload_seconds) * 1000, 3) if self.reload_seconds else None
+            ),
+            "max_reload_ms": round(max(self.reload_seconds) * 1000, 3) if self.reload_seconds else None,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, directory: str, budget_bytes: int | None = None) -> None:
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        # Least recently used models come first
+        self._resident: OrderedDict[str, EnsembleRandomForestBasedRegressor] = OrderedDict()
+        self._nbytes: dict[str, int] = {}
+        self._metrics: dict[str, ModelMetrics] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._evicted_statuses: dict[str, dict] = {}
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._nbytes.get(name, 0) for name in self._resident)
+
+    def get_snapshot_path(self, name: str) -> str:
+        return join(self.directory, f"{name}{SNAPSHOT_EXTENSION}")
+
+    def has_snapshot(self, name: str) -> bool:
+        return os.path.isfile(self.get_snapshot_path(name))
+
+    def list_models(self) -> list[str]:
+        snapshots = set()
+        if os.path.isdir(self.directory):
+            snapshots = {
+                filename[:-len(SNAPSHOT_EXTENSION)]
+                for filename in os.listdir(self.directory) if filename.endswith(SNAPSHOT_EXTENSION)
+            }
+        return sorted(snapshots | set(self._resident))
+
+    def get_or_create(self, name: str) -> EnsembleRandomForestBasedRegressor:
+        _validate_name(name)
+        if name not in self._resident:
+            self._resident[name] = EnsembleRandomForestBasedRegressor()
+            self._resident[name].name = name
+            self._nbytes.pop(name, None)
+            self._evicted_statuses.pop(name, None)
+        self._resident.move_to_end(name)
+        return self._resident[name]
+
+    async def get(self, name: str) -> EnsembleRandomForestBasedRegressor:
+        _validate_name(name)
+        metrics = self._metrics.setdefault(name, ModelMetrics())
+        if name in self._resident:
+            self._resident.move_to_end(name)
+            metrics.record_hit()
+            return self._resident[name]
+
+        async with self._locks.setdefault(name, asyncio.Lock()):
+            # Concurrent requests for an evicted model wait for a single reload
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                metrics.record_hit()
+                return self._resident[name]
+            if not self.has_snapshot(name):
+                raise UnknownModelError(name)
+
+            start = time.perf_counter()
+            path = self.get_snapshot_path(name)
+            state = await run_in_executor(None, EnsembleRandomForestBasedRegressor.read_state, path)
+            ensemble = EnsembleRandomForestBasedRegressor()
+            ensemble.name = name
+            ensemble.restore(state)
+            metrics.record_reload(time.perf_counter() - start)
+
+            self._resident[name] = ensemble
+            self._nbytes[name] = os.path.getsize(path)
+            self._evicted_statuses.pop(name, None)
+            logger.info(f"Reloaded model '{name}' in {metrics.reload_seconds[-1] * 1000:.1f} ms")
+            self._evict(keep=name)
+            return ensemble
+
+    def get_status(self, name: str) -> dict:
+        _validate_name(name)
+        if name in self._resident:
+            return self._resident[name].get_verbose_status()
+        if name in self._evicted_statuses:
+            return self._evicted_statuses[name]
+        if self.has_snapshot(name):
+            return {"status": TrainingStatus.FINISHED.value}
+        raise UnknownModelError(name)
+
+    async def commit(self, name: str) -> None:
+        ensemble = self._resident.get(name)
+        if ensemble is None or ensemble.status != TrainingStatus.FINISHED:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.get_snapshot_path(name)
+        await run_in_executor(None, ensemble.save, path)
+        # The snapshot size stands in for the resident size of the model, both are dominated by the tree arrays
+        self._nbytes[name] = os.path.getsize(path)
+        self._evict(keep=name)
+
+    def get_metrics(self) -> dict:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "resident_bytes": self.resident_bytes,
+            "models": {
+                name: {
+                    "resident": name in self._resident,
+                    "nbytes": self._nbytes.get(name),
+                    **self._metrics.setdefault(name, ModelMetrics()).summarize()
+                }
+                for name in self.list_models()
+            }
+        }
+
+    def _evict(self, keep: str) -> None:
+        if self.budget_bytes is None:
+            return
+        for name in list(self._resident):
+            if self.resident_bytes <= self.budget_bytes:
+                return
+            # Only finished models have an up-to-date snapshot to be reloaded from
+            if name == keep or name not in self._nbytes or self._resident[name].status != TrainingStatus.FINISHED:
+                continue
+            self._evicted_statuses[name] = self._resident.pop(name).get_verbose_status()
+            self._metrics.setdefault(name, ModelMetrics()).evictions += 1
+            logger.info(f"Evicted model '{name}', {self.resident_bytes} of {self.budget_bytes} bytes resident")
+
+
+def _validate_name(name: str) -> None:
+    if not MODEL_NAME_PATTERN.fullmatch(name):
+        raise InvalidModelNameError(name)
@@ -1,24 +1,88 @@
 from __future__ import annotations
 
 import asyncio
+import math
+import os
+import pickle
+import time
 from abc import ABC, abstractmethod
 from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator
 
 import numpy as np
-from sklearn.base import BaseEstimator
-from sklearn.ensemble import BaseEnsemble, RandomForestRegressor
+from pydantic import BaseModel
 
+from data.extractors import NearestNeighborsBasedRepresentativenessExtractor, ProjectionReport
 from data.models import Dataset, Sample
-from ml.helpers import TrainingStatus, ensure_fitted, track_experiment
+from logs import Logger
+from exceptions import AnytimePredictionNotSupportedError, PredictionShardError, PredictionShardUnavailableError
+from ml.helpers import (
+    ExperimentTracker,
+    MemoryTracker,
+    TrainingCheckpoint,
+    TrainingStatus,
+    ensure_fitted,
+    track_experiment
+)
+from profiling import run_in_executor
+
+from .compaction import CompactForest, CompactionReport, compact_forest
+from .schema import ModelSchema
+from .sharding import ShardPool
+
+if TYPE_CHECKING:
+    from sklearn.base import BaseEstimator
+    from sklearn.ensemble import (
+        BaseEnsemble,
+        ExtraTreesRegressor,
+        HistGradientBoostingRegressor,
+        RandomForestRegressor
+    )
+    from sklearn.neighbors import NearestNeighbors
+
+    from distributed import DistributedTrainingCoordinator
+
+logger = Logger(__name__)
+
+COMPACTION_REFERENCE_SIZE: int = 10_000
+ESTIMATORS_STEP: int = 10
+OOB_IMPROVEMENT_TOLERANCE: float = 0.01
+PREDICTION_THREADS: int | None = int(os.environ["PREDICTION_THREADS"]) if os.environ.get("PREDICTION_THREADS") else None
+
+_prediction_executor: ThreadPoolExecutor | None = None
+
+
+def _get_prediction_executor() -> ThreadPoolExecutor:
+    # Shared by all requests, so concurrent predictions queue for a bounded set of threads instead of spawning their own
+    global _prediction_executor
+    if _prediction_executor is None:
+        _prediction_executor = ThreadPoolExecutor(max_workers=PREDICTION_THREADS, thread_name_prefix="predict")
+    return _prediction_executor
+
+
+def _get_target_n_neighbors(targets: np.ndarray) -> list[int] | None:
+    # Labels hold one column per k in N_NEIGHBORS order, which is what /predict?k= selects from
+    n_neighbors = NearestNeighborsBasedRepresentativenessExtractor.parse_n_neighbors()
+    return n_neighbors if len(n_neighbors) == (1 if targets.ndim == 1 else targets.shape[1]) else None
+
+
+def _to_feature_matrix(samples: Sample | list[Sample], n_features: int) -> np.ndarray:
+    if isinstance(samples, Sample):
+        samples = [samples]
+    return np.array([sample.features for sample in samples], dtype=np.float64).reshape(len(samples), n_features)
 
 
 class Regressor(ABC):
+    requires_labels: bool = True
+
     @abstractmethod
     def __init__(self) -> None:
         self._status: TrainingStatus = TrainingStatus.NOT_STARTED
         self._start_training_time: str | None = None
         self._stop_training_time: str | None = None
         self._error_training_time: str | None = None
+        self._schema: ModelSchema | None = None
+        self.memory_tracker: MemoryTracker | None = None
 
     @property
     @abstractmethod
@@ -47,6 +111,9 @@ class Regressor(ABC):
             TrainingStatus.AWAIT: {
                 "status": self._status.value,
             },
+            TrainingStatus.LOADING: {
+                "status": self._status.value,
+            },
             TrainingStatus.DURING_TRAINING: {
                 "status": self._status.value,
                 "start_time": self.start_training_time,
@@ -63,7 +130,14 @@ class Regressor(ABC):
             }
         }
 
-        return verbose_statuses[self._status]
+        verbose_status = verbose_statuses[self._status]
+        if self.memory_tracker is not None:
+            verbose_status = {**verbose_status, "memory": self.memory_tracker.get_report()}
+        return verbose_status
+
+    @property
+    def schema(self) -> ModelSchema | None:
+        return self._schema
 
     @property
     def start_training_time(self) -> str:
@@ -93,19 +167,35 @@ class Regressor(ABC):
     def fit(self, dataset: Dataset) -> None:
         ...
 
+    @abstractmethod
+    def _predict(self, features: np.ndarray) -> np.ndarray:
+        ...
+
     @ensure_fitted
     @abstractmethod
     def predict(self, sample: Sample) -> float:
         ...
 
+    @ensure_fitted
+    @abstractmethod
+    def predict_batch(self, samples: list[Sample]) -> np.ndarray:
+        ...
+
+
+class SklearnBasedRegressor(Regressor):
+    supports_multi_output: bool = True
 
-class RandomForestBasedRegressor(Regressor):
     def __init__(self) -> None:
         super().__init__()
-        self._model: RandomForestRegressor = RandomForestRegressor()
+        self._model: BaseEstimator | CompactForest = self._create_model()
+
+    @staticmethod
+    @abstractmethod
+    def _create_model() -> BaseEstimator:
+        ...
 
     @property
-    def model(self) -> RandomForestRegressor:
+    def model(self) -> BaseEstimator | CompactForest:
         return self._model
 
     @property
@@ -126,18 +216,214 @@ class RandomForestBasedRegressor(Regressor):
     def fit(self, dataset: Dataset) -> None:
         features = dataset.get_feature_representation()
         targets = dataset.get_target_representation()
-        self._model.fit(X=features, y=targets)
+        self._model = self._create_model()
+        if targets.ndim == 2 and not self.supports_multi_output:
+            from sklearn.multioutput import MultiOutputRegressor
+
+            self._model = MultiOutputRegressor(self._model)
+        self._model.fit(X=features, y=targets, sample_weight=dataset.get_weight_representation())
+        self._schema = ModelSchema.from_features(features, n_neighbors=_get_target_n_neighbors(targets))
+
+    def _predict(self, features: np.ndarray) -> np.ndarray:
+        if features.shape[0] == 0:
+            return np.empty(0)
+        return self._model.predict(features)
 
     @ensure_fitted
     def predict(self, sample: Sample) -> float:
-        features = np.array(sample.features).reshape(1, -1)
-        return self._model.predict(features)[0]
+        return self._predict(_to_feature_matrix(sample, self.schema.n_features_in))[0]
+
+    @ensure_fitted
+    def predict_batch(self, samples: list[Sample]) -> np.ndarray:
+        return self._predict(_to_feature_matrix(samples, self.schema.n_features_in))
+
+
+class ForestBasedRegressor(SklearnBasedRegressor):
+    def __init__(self, compaction_tolerance: float | None = None, adaptive_estimators: bool = False) -> None:
+        super().__init__()
+        self._compaction_tolerance: float | None = compaction_tolerance
+        self._compaction_report: CompactionReport | None = None
+        self._adaptive_estimators: bool = adaptive_estimators
+        self._n_estimators: int | None = None
+        self._max_estimators: int = self._model.n_estimators
+        self._oob_errors: list[float] = []
+
+    @property
+    def compaction_report(self) -> CompactionReport | None:
+        return self._compaction_report
+
+    @property
+    def n_estimators(self) -> int | None:
+        return self._n_estimators
+
+    @property
+    def max_estimators(self) -> int:
+        return self._max_estimators
+
+    @property
+    def oob_errors(self) -> list[float]:
+        return self._oob_errors
+
+    def fit(self, dataset: Dataset) -> None:
+        if self._adaptive_estimators:
+            self._fit_incrementally(dataset)
+        else:
+            super().fit(dataset)
+            self._oob_errors = []
+        self._n_estimators = len(self._model.estimators_)
+        self._compaction_report = None
+
+        if self._compaction_tolerance is not None:
+            self.compact(dataset.get_feature_representation(), self._compaction_tolerance)
+
+    def _fit_incrementally(self, dataset: Dataset) -> None:
+        # The same helpers sklearn uses to reproduce the bootstrap sample of each tree for oob_score
+        from sklearn.ensemble._forest import _generate_unsampled_indices, _get_n_samples_bootstrap
+
+        features = dataset.get_feature_representation()
+        targets = dataset.get_target_representation()
+        weights = dataset.get_weight_representation()
+        # Multi-k labels are scored by the mean squared error over all of their columns
+        target_columns = targets.reshape(len(targets), -1)
+        # Out-of-bag estimates require bootstrapping, which extra trees do not use by default
+        self._model = self._create_model()
+        self._model.set_params(warm_start=True, bootstrap=True)
+        self._oob_errors = []
+
+        n_samples = features.shape[0]
+        n_samples_bootstrap = _get_n_samples_bootstrap(n_samples, self._model.max_samples)
+        # Out-of-bag sums are accumulated per added tree; oob_score=True would re-predict with every tree on each step
+        oob_sums, oob_counts = np.zeros(target_columns.shape), np.zeros(n_samples)
+
+        n_fitted = 0
+        while n_fitted < self._max_estimators:
+            self._model.set_params(n_estimators=min(n_fitted + ESTIMATORS_STEP, self._max_estimators))
+            self._model.fit(X=features, y=targets, sample_weight=weights)
+
+            for estimator in self._model.estimators_[n_fitted:]:
+                unsampled = _generate_unsampled_indices(estimator.random_state, n_samples, n_samples_bootstrap)
+                if len(unsampled) == 0:
+                    continue
+                oob_sums[unsampled] += estimator.predict(features[unsampled].astype(np.float32)).reshape(
+                    len(unsampled), -1
+                )
+                oob_counts[unsampled] += 1
+
+            n_fitted = len(self._model.estimators_)
+            has_prediction = oob_counts > 0
+            # On tiny chunks every row can still be in-bag for all trees, there is no error to compare yet
+            if not has_prediction.any():
+                continue
+            oob_predictions = oob_sums[has_prediction] / oob_counts[has_prediction, np.newaxis]
+            oob_error = float(np.average(
+                np.mean((oob_predictions - target_columns[has_prediction]) ** 2, axis=1),
+                weights=weights[has_prediction] if weights is not None else None
+            ))
+            improved = not self._oob_errors or oob_error < self._oob_errors[-1] * (1 - OOB_IMPROVEMENT_TOLERANCE)
+            self._oob_errors.append(oob_error)
+            if not improved:
+                break
+
+        self._schema = ModelSchema.from_features(features, n_neighbors=_get_target_n_neighbors(targets))
+
+    def _predict_trees(self, features: np.ndarray, trees: np.ndarray, output: int = 0) -> np.ndarray:
+        if isinstance(self._model, CompactForest):
+            return self._model.predict_trees(features, trees, output)
+        features = features.astype(np.float32)
+        return np.column_stack([
+            self._model.estimators_[tree].predict(features).reshape(features.shape[0], -1)[:, output]
+            for tree in trees
+        ])
+
+    def compact(self, reference_features: np.ndarray, tolerance: float = 0.0) -> CompactionReport:
+        if isinstance(self._model, CompactForest):
+            return self._compaction_report
+
+        reference_features = reference_features[:COMPACTION_REFERENCE_SIZE]
+        self._model, self._compaction_report = compact_forest(self._model, reference_features, tolerance)
+        logger.info(
+            f"Compacted forest from {self._compaction_report.bytes_before} to "
+            f"{self._compaction_report.bytes_after} bytes, "
+            f"max prediction drift {self._compaction_report.max_abs_drift:.2e}"
+        )
+        return self._compaction_report
+
+
+class RandomForestBasedRegressor(ForestBasedRegressor):
+    @staticmethod
+    def _create_model() -> RandomForestRegressor:
+        from sklearn.ensemble import RandomForestRegressor
+
+        return RandomForestRegressor()
+
+
+class ExtraTreesBasedRegressor(ForestBasedRegressor):
+    @staticmethod
+    def _create_model() -> ExtraTreesRegressor:
+        from sklearn.ensemble import ExtraTreesRegressor
+
+        return ExtraTreesRegressor()
+
+
+class HistGradientBoostingBasedRegressor(SklearnBasedRegressor):
+    supports_multi_output: bool = False
+
+    @staticmethod
+    def _create_model() -> HistGradientBoostingRegressor:
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        return HistGradientBoostingRegressor()
+
+
+class NearestNeighborsBasedRegressor(SklearnBasedRegressor):
+    requires_labels: bool = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._n_neighbors: list[int] | None = None
+
+    @staticmethod
+    def _create_model() -> NearestNeighbors:
+        from sklearn.neighbors import NearestNeighbors
+
+        return NearestNeighbors()
+
+    def fit(self, dataset: Dataset) -> None:
+        features = dataset.get_feature_representation()
+        self._n_neighbors = NearestNeighborsBasedRepresentativenessExtractor.get_n_neighbors_list(len(features))
+        self._model = self._create_model().fit(features)
+        self._schema = ModelSchema.from_features(features, n_neighbors=self._n_neighbors)
+
+    def _predict(self, features: np.ndarray) -> np.ndarray:
+        # A labeled sample is its own nearest neighbor, so an unseen one is compared with n_neighbors - 1 samples
+        if features.shape[0] == 0 or self._n_neighbors == [1]:
+            return np.full(features.shape[0], np.nan)
+        distances, _ = self._model.kneighbors(features, n_neighbors=max(self._n_neighbors) - 1)
+        representativeness = NearestNeighborsBasedRepresentativenessExtractor._calculate_representativeness(
+            NearestNeighborsBasedRepresentativenessExtractor._get_mean_distances(distances, self._n_neighbors)
+        )
+        return representativeness[:, 0] if len(self._n_neighbors) == 1 else representativeness
+
+
+class AnytimePrediction(BaseModel):
+    representativeness: list[float]
+    variance: list[float]
+    trees_used: int
+    trees_total: int
+    elapsed_ms: float
 
 
 class EnsembleRandomForestBasedRegressor(Regressor):
     def __init__(self):
         super().__init__()
         self._regressors: list[Regressor] = []
+        self.name: str | None = None
+        self.sizing_report: dict | None = None
+        self.projection_report: ProjectionReport | None = None
+        self.checkpoint: TrainingCheckpoint | None = None
+        self.shards: ShardPool | None = None
+        self._member_statuses: dict[int, TrainingStatus] = {}
+        self._resumed_members: set[int] = set()
 
     @property
     def model(self) -> list[Regressor]:
@@ -155,11 +441,49 @@ class EnsembleRandomForestBasedRegressor(Regressor):
                 regressor.status = status
 
     def reset_status(self) -> None:
+        self.stop_shards()
         self.status = TrainingStatus.NOT_STARTED
         self.start_training_time = None
         self.stop_training_time = None
         self.error_training_time = None
         self._regressors = []
+        self._schema = None
+        self.memory_tracker = None
+        self.sizing_report = None
+        self.projection_report = None
+        self.checkpoint = None
+        self._member_statuses = {}
+        self._resumed_members = set()
+
+    def get_verbose_status(self) -> dict[str, str]:
+        verbose_status = super().get_verbose_status()
+        if self.sizing_report is not None and self._status == TrainingStatus.FINISHED:
+            verbose_status = {**verbose_status, "ensemble_sizing": self.sizing_report}
+        if self.projection_report is not None:
+            verbose_status = {**verbose_status, "projection": self.projection_report.dict()}
+        if self.checkpoint is not None:
+            verbose_status = {**verbose_status, "members": self.get_member_statuses()}
+        if self.shards is not None:
+            verbose_status = {**verbose_status, "prediction_shards": self.shards.n_shards}
+        return verbose_status
+
+    def get_member_statuses(self) -> list[dict]:
+        return [
+            {
+                "status": self._member_statuses.get(index, TrainingStatus.NOT_STARTED).value,
+                "resumed": index in self._resumed_members
+            }
+            for index in range(len(self._regressors))
+        ]
+
+    def restore_member(self, index: int, regressor: Regressor) -> None:
+        self._regressors[index] = regressor
+        self._resumed_members.add(index)
+        self._set_member_status(index, TrainingStatus.FINISHED)
+
+    def _set_member_status(self, index: int, status: TrainingStatus) -> None:
+        self._member_statuses[index] = status
+        ExperimentTracker.handle_member_status(self, index, status)
 
     def register_regressor(self, regressor: Regressor):
         self._regressors.append(regressor)
@@ -172,26 +496,242 @@ class EnsembleRandomForestBasedRegressor(Regressor):
             return []
         return self._regressors
 
+    def start_shards(self, n_shards: int) -> None:
+        # Members are hosted by long-lived processes, so predictions of different members no longer share the GIL
+        self.stop_shards()
+        self.shards = ShardPool(self.get_regressors(), n_shards)
+
+    def stop_shards(self) -> None:
+        shards, self.shards = self.shards, None
+        if shards is not None:
+            shards.close()
+
+    def save(self, path: str) -> None:
+        state = {
+            "regressors": self._regressors,
+            "schema": self._schema,
+            "start_training_time": self.start_training_time,
+            "stop_training_time": self.stop_training_time,
+            "sizing_report": self.sizing_report
+        }
+        # joblib stores arrays as raw buffers, so a saved model can be memory-mapped instead of copied on load
+        import joblib
+
+        # Written next to the target and renamed, so a concurrent load never sees a partially written model
+        temporary_path = f"{path}.tmp"
+        joblib.dump(state, temporary_path, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def read_state(path: str, mmap_mode: str | None = None) -> dict:
+        import joblib
+
+        # Models written with plain pickle before joblib was used are read as well
+        return joblib.load(path, mmap_mode=mmap_mode)
+
+    def restore(self, state: dict) -> None:
+        self._regressors = state["regressors"]
+        self._schema = state["schema"]
+        self.start_training_time = state["start_training_time"]
+        self.stop_training_time = state["stop_training_time"]
+        self.sizing_report = state.get("sizing_report")
+        self.error_training_time = None
+        self.status = TrainingStatus.FINISHED
+
     @track_experiment
     async def fit(self, datasets: list[Dataset]) -> None:
         with ThreadPoolExecutor() as executor:
-            loop = asyncio.get_event_loop()
             tasks = [
-                loop.run_in_executor(executor, regressor.fit, dataset_chunk)
-                for regressor, dataset_chunk in zip(self.get_regressors(), datasets)
+                run_in_executor(executor, self._fit_regressor, index, regressor, dataset_chunk)
+                for index, (regressor, dataset_chunk) in enumerate(zip(self.get_regressors(), datasets))
             ]
 
             await asyncio.gather(*tasks)
 
+        self._schema = ModelSchema.from_schemas([regressor.schema for regressor in self.get_regressors()])
+
+    @track_experiment
+    async def fit_pipelined(
+            self, chunks: AsyncIterator[tuple[int, Dataset]], max_concurrency: int | None = None
+    ) -> None:
+        regressors = self.get_regressors()
+        # Each member starts fitting as soon as its chunk arrives instead of waiting for the whole dataset
+        executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        tasks = []
+        try:
+            try:
+                async for index, dataset_chunk in chunks:
+                    tasks.append(
+                        run_in_executor(executor, self._fit_regressor, index, regressors[index], dataset_chunk)
+                    )
+            except BaseException:
+                # Members already started still finish and checkpoint themselves when the chunk stream fails
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+            # Every started member is allowed to finish and checkpoint itself before the first failure is raised
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            # Waiting for the workers here would block the event loop, they are all done unless the task was cancelled
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+        self._schema = ModelSchema.from_schemas([regressor.schema for regressor in regressors])
+
+    @track_experiment
+    async def fit_distributed(self, datasets: list[Dataset], coordinator: DistributedTrainingCoordinator) -> None:
+        regressors = self.get_regressors()
+        for index in range(len(regressors)):
+            self._set_member_status(index, TrainingStatus.DURING_TRAINING)
+
+        # Members are fitted by remote workers and replaced by their fitted copies as they arrive
+        async for index, regressor in coordinator.fit_members(regressors, datasets):
+            regressors[index] = regressor
+            if self.checkpoint is not None:
+                await run_in_executor(None, self.checkpoint.save_member, index, regressor)
+            self._set_member_status(index, TrainingStatus.FINISHED)
+
+        self._schema = ModelSchema.from_schemas([regressor.schema for regressor in regressors])
+
+    def _fit_regressor(self, index: int, regressor: Regressor, dataset: Dataset) -> None:
+        self._set_member_status(index, TrainingStatus.DURING_TRAINING)
+        try:
+            if self.memory_tracker is None:
+                regressor.fit(dataset)
+            else:
+                with self.memory_tracker.track_stage(f"fit_member_{index}"):
+                    regressor.fit(dataset)
+            if self.checkpoint is not None:
+                self.checkpoint.save_member(index, regressor)
+        except Exception:
+            self._set_member_status(index, TrainingStatus.ERROR)
+            raise
+        self._set_member_status(index, TrainingStatus.FINISHED)
+
+    async def _predict(self, features: np.ndarray) -> np.ndarray:
+        if features.shape[0] == 0:
+            return np.empty(0)
+        shards = self.shards
+        if shards is not None:
+            try:
+                return self._aggregate(await shards.predict(features))
+            except PredictionShardUnavailableError as error:
+                logger.error(f"Prediction shards have failed, predicting in process: {error}")
+                # Shards replaced while the request was in flight are left running
+                if self.shards is shards:
+                    self.stop_shards()
+            except PredictionShardError as error:
+                # Shards stay up, only this request is predicted in process
+                logger.error(f"Prediction shard has failed on a request, predicting it in process: {error}")
+
+        executor = _get_prediction_executor()
+        tasks = [
+            run_in_executor(executor, regressor._predict, features)
+            for regressor in self.get_regressors()
+        ]
+
+        predictions = await asyncio.gather(*tasks)
+
+        return self._aggregate(predictions)
+
+    @staticmethod
+    def _aggregate(predictions: list[np.ndarray]) -> np.ndarray:
+        return np.round(np.mean(predictions, axis=0), 5)
+
+    def _select_output(self, predictions: np.ndarray, n_neighbors: int | None) -> np.ndarray:
+        index = self.schema.get_output_index(n_neighbors)
+        return predictions[:, index] if predictions.ndim == 2 else predictions
+
     @ensure_fitted
-    async def predict(self, sample: Sample) -> float:
-        with ThreadPoolExecutor() as executor:
-            loop = asyncio.get_event_loop()
-            tasks = [
-                loop.run_in_executor(executor, regressor.predict, sample)
-                for regressor in self.get_regressors()
-            ]
+    def predict_features(self, features: np.ndarray, n_neighbors: int | None = None) -> np.ndarray:
+        # Synchronous counterpart of predict_batch for offline scoring, where parallelism comes from worker processes
+        if features.shape[0] == 0:
+            return self._select_output(np.empty(0), n_neighbors)
+        return self._select_output(
+            self._aggregate([regressor._predict(features) for regressor in self.get_regressors()]), n_neighbors
+        )
+
+    def _predict_anytime(
+            self,
+            features: np.ndarray,
+            deadline_seconds: float | None,
+            tree_fraction: float | None,
+            output: int = 0
+    ) -> AnytimePrediction:
+        start = time.perf_counter()
+        members = self.get_regressors()
+        if not all(isinstance(member, ForestBasedRegressor) for member in members):
+            raise AnytimePredictionNotSupportedError()
+
+        n_trees = [member.n_estimators for member in members]
+        if features.shape[0] == 0:
+            return AnytimePrediction(
+                representativeness=[], variance=[], trees_used=0, trees_total=sum(n_trees), elapsed_ms=0
+            )
+        budget = sum(n_trees) if tree_fraction is None else max(len(members), math.ceil(tree_fraction * sum(n_trees)))
+        sums = [np.zeros(features.shape[0]) for _ in members]
+        counts = [0 for _ in members]
+        tree_predictions = []
+
+        # Round-robin over members, so any prefix of the order spreads its trees evenly across the ensemble
+        for tree in range(max(n_trees)):
+            for index, member in enumerate(members):
+                if tree >= n_trees[index] or sum(counts) >= budget:
+                    continue
+                prediction = member._predict_trees(features, np.array([tree]), output)[:, 0]
+                sums[index] += prediction
+                counts[index] += 1
+                tree_predictions.append(prediction)
+            # At least one tree per member is always evaluated, so every member contributes to the estimate
+            if sum(counts) >= budget or (
+                    deadline_seconds is not None and time.perf_counter() - start >= deadline_seconds
+            ):
+                break
+
+        member_means = [member_sum / count for member_sum, count in zip(sums, counts)]
+        trees_used = sum(counts)
+        # Squared standard error of the mean over the evaluated trees
+        if trees_used > 1:
+            variance = np.var(tree_predictions, axis=0, ddof=1) / trees_used
+        else:
+            variance = np.full(features.shape[0], np.nan)
+        return AnytimePrediction(
+            representativeness=self._aggregate(member_means).tolist(),
+            variance=variance.tolist(),
+            trees_used=trees_used,
+            trees_total=sum(n_trees),
+            elapsed_ms=round((time.perf_counter() - start) * 1000, 3)
+        )
+
+    @ensure_fitted
+    async def predict_anytime(
+            self,
+            samples: list[Sample],
+            deadline_seconds: float | None = None,
+            tree_fraction: float | None = None,
+            n_neighbors: int | None = None
+    ) -> AnytimePrediction:
+        features = _to_feature_matrix(samples, self.schema.n_features_in)
+        return await run_in_executor(
+            _get_prediction_executor(), self._predict_anytime, features, deadline_seconds, tree_fraction,
+            self.schema.get_output_index(n_neighbors)
+        )
 
-            predictions = await asyncio.gather(*tasks)
+    @ensure_fitted
+    async def predict_matrix(self, features: np.ndarray, n_neighbors: int | None = None) -> np.ndarray:
+        # Rows are already rounded and the width is checked once for the whole matrix
+        if features.shape[0] == 0:
+            return self._select_output(np.empty(0), n_neighbors)
+        return self._select_output(await self._predict(features), n_neighbors)
 
-        return round(np.mean(predictions), 5)
+    @ensure_fitted
+    async def predict(self, sample: Sample, n_neighbors: int | None = None) -> float:
+        predictions = await self._predict(_to_feature_matrix(sample, self.schema.n_features_in))
+        return self._select_output(predictions, n_neighbors)[0]
+
+    @ensure_fitted
+    async def predict_batch(self, samples: list[Sample], n_neighbors: int | None = None) -> np.ndarray:
+        predictions = await self._predict(_to_feature_matrix(samples, self.schema.n_features_in))
+        return self._select_output(predictions, n_neighbors)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+import numpy as np
+from pydantic import BaseModel
+
+from data.models import Sample
+from exceptions import InferenceSampleHasUnexpectedShapeError, UnsupportedNNeighborsError
+
+
+class ModelSchema(BaseModel):
+    n_features_in: int
+    dtype: str
+    version: str
+    n_neighbors: list[int] | None = None
+
+    class Config:
+        allow_mutation = False
+
+    @classmethod
+    def from_features(cls, features: np.ndarray, n_neighbors: list[int] | None = None) -> ModelSchema:
+        return cls(
+            n_features_in=features.shape[1], dtype=str(features.dtype), version=uuid4().hex, n_neighbors=n_neighbors
+        )
+
+    @classmethod
+    def from_schemas(cls, schemas: list[ModelSchema]) -> ModelSchema:
+        if len({schema.n_features_in for schema in schemas}) != 1:
+            raise ValueError("Component regressors have been fitted on different feature widths")
+        return cls(
+            n_features_in=schemas[0].n_features_in,
+            dtype=schemas[0].dtype,
+            version=uuid4().hex,
+            n_neighbors=schemas[0].n_neighbors
+        )
+
+    def get_output_index(self, n_neighbors: int | None) -> int:
+        # Models labeled with several k values predict one column per k, the first one being the default
+        if n_neighbors is None:
+            return 0
+        # Schemas saved before labels were keyed by k do not have the field at all
+        available = self.__dict__.get("n_neighbors") or []
+        if n_neighbors not in available:
+            raise UnsupportedNNeighborsError(n_neighbors=n_neighbors, available=available)
+        return available.index(n_neighbors)
+
+    def check_inference_shape(self, samples: Sample | list[Sample] | np.ndarray) -> None:
+        if isinstance(samples, np.ndarray):
+            # An empty matrix has no row whose width could mismatch
+            if samples.ndim == 2 and samples.shape[0] == 0:
+                return
+            widths = np.array([samples.shape[-1] if samples.ndim in (1, 2) else -1])
+        elif isinstance(samples, Sample):
+            widths = np.array([len(samples.features)])
+        else:
+            widths = np.fromiter((len(sample.features) for sample in samples), dtype=np.intp, count=len(samples))
+
+        mismatched = widths != self.n_features_in
+        if mismatched.any():
+            raise InferenceSampleHasUnexpectedShapeError(
+                expected_sample_shape=(self.n_features_in,),
+                inference_sample_shape=(int(widths[np.argmax(mismatched)]),)
+            )
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from exceptions import PredictionShardError, PredictionShardUnavailableError
+from logs import Logger
+from profiling import run_in_executor
+
+if TYPE_CHECKING:
+    from .regressors import Regressor
+
+logger = Logger(__name__)
+
+SHUTDOWN_TIMEOUT_SECONDS: float = 5.0
+
+
+def _serve_shard(connection: Connection, payload: bytes) -> None:
+    # Members are unpickled once and stay loaded for the lifetime of the process
+    members: list[Regressor] = pickle.loads(payload)
+    connection.send(len(members))
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+
+        name, shape, dtype = message
+        memory = SharedMemory(name=name)
+        features = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        try:
+            result = [member._predict(features) for member in members]
+        except Exception as error:
+            result = PredictionShardError(f"{type(error).__name__}: {error}")
+        # The view has to be released before the segment can be closed
+        del features
+        memory.close()
+        connection.send(result)
+
+
+class ShardPool:
+    def __init__(self, members: list[Regressor], n_shards: int) -> None:
+        # Processes are spawned, forking a server with running threads and an event loop is not safe
+        context = multiprocessing.get_context("spawn")
+        # Contiguous groups keep the order of members, so the gathered mean equals the in-process one
+        groups = [group for group in np.array_split(np.arange(len(members)), n_shards) if len(group)]
+
+        self._connections: list[Connection] = []
+        self._processes: list[multiprocessing.Process] = []
+        for group in groups:
+            connection, child_connection = context.Pipe()
+            payload = pickle.dumps([members[index] for index in group], protocol=pickle.HIGHEST_PROTOCOL)
+            process = context.Process(target=_serve_shard, args=(child_connection, payload), daemon=True)
+            process.start()
+            child_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+        # A single thread per shard, so requests to one shard are serialised without a lock
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shard-{index}") for index in range(len(groups))
+        ]
+        self._ready = [False] * len(groups)
+
+    @property
+    def n_shards(self) -> int:
+        return len(self._processes)
+
+    def _call(self, index: int, message: tuple) -> list[np.ndarray]:
+        connection = self._connections[index]
+        try:
+            if not self._ready[index]:
+                # Waits for the members to be loaded, the first request pays for the startup of the shard
+                connection.recv()
+                self._ready[index] = True
+            connection.send(message)
+            result = connection.recv()
+        except (EOFError, OSError) as error:
+            raise PredictionShardUnavailableError(index, str(error)) from error
+        # A member that failed on this request leaves the shard able to serve the next one
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def predict(self, features: np.ndarray) -> list[np.ndarray]:
+        features = np.ascontiguousarray(features, dtype=np.float64)
+        # Features are copied once into shared memory instead of being pickled for every shard
+        memory = SharedMemory(create=True, size=max(features.nbytes, 1))
+        try:
+            shared_features = np.ndarray(features.shape, dtype=features.dtype, buffer=memory.buf)
+            shared_features[:] = features
+            del shared_features
+            message = (memory.name, features.shape, features.dtype.str)
+            # Every shard has to be done with the segment before it is unlinked, even when one of them has failed
+            results = await asyncio.gather(*[
+                run_in_executor(executor, self._call, index, message)
+                for index, executor in enumerate(self._executors)
+            ], return_exceptions=True)
+        finally:
+            memory.close()
+            memory.unlink()
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # A lost shard is reported before a member error, so the pool is torn down whenever it is broken
+            raise next((error for error in errors if isinstance(error, PredictionShardUnavailableError)), errors[0])
+        return [prediction for predictions in results for prediction in predictions]
+
+    def close(self) -> None:
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=SHUTDOWN_TIMEOUT_SECONDS)
+            if process.is_alive():
+                logger.error(f"Shard process {process.pid} did not stop, terminating it")
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        for executor in self._executors:
+            executor.shutdown(wait=False)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import Executor
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from os.path import dirname, join
+from typing import Any, Callable
+
+PROFILES_DIRECTORY: str = os.environ.get("PROFILES_DIRECTORY", join(dirname(__file__), "profiles"))
+SAMPLING_INTERVAL: float = float(os.environ.get("PROFILING_SAMPLING_INTERVAL", 0.005))
+PROFILE_FORMATS: dict[str, str] = {"pstats": ".pstats", "collapsed": ".collapsed"}
+PROFILE_ID_PATTERN = re.compile(r"^[\w-]+$")
+
+_active_session: ContextVar[ProfilingSession | None] = ContextVar("active_profiling_session", default=None)
+
+
+class ProfilingSession:
+    def __init__(self, name: str, sampling_interval: float = SAMPLING_INTERVAL) -> None:
+        self.profile_id = f"{name}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._sampling_interval = sampling_interval
+        self._lock = threading.Lock()
+        self._profiles: list[cProfile.Profile] = []
+        self._threads: Counter[int] = Counter()
+        self._stacks: Counter[str] = Counter()
+        self._stopped = threading.Event()
+        self._sampler: threading.Thread | None = None
+        self._profile: cProfile.Profile | None = None
+        self._token = None
+
+    def __enter__(self) -> ProfilingSession:
+        self._token = _active_session.set(self)
+        self._sampler = threading.Thread(target=self._sample, name=f"sampler-{self.profile_id}", daemon=True)
+        self._sampler.start()
+        # The event loop thread is profiled as a whole, so coroutines of concurrent requests show up as well
+        self._register_thread()
+        self._profile = self._start_profile()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop_profile(self._profile)
+        self._unregister_thread()
+        self._stopped.set()
+        self._sampler.join()
+        _active_session.reset(self._token)
+
+    def wrap(self, func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            self._register_thread()
+            profile = self._start_profile()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._stop_profile(profile)
+                self._unregister_thread()
+        return wrapper
+
+    def save(self, directory: str | None = None) -> dict[str, str]:
+        directory = directory or PROFILES_DIRECTORY
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            profile_format: join(directory, f"{self.profile_id}{extension}")
+            for profile_format, extension in PROFILE_FORMATS.items()
+        }
+
+        with self._lock:
+            profiles, stacks = list(self._profiles), Counter(self._stacks)
+
+        if profiles:
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(paths["pstats"])
+        else:
+            paths.pop("pstats")
+
+        with open(paths["collapsed"], "w") as file:
+            file.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+        return paths
+
+    def _start_profile(self) -> cProfile.Profile | None:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another deterministic profiler is already active (Python 3.12+ allows one per process),
+            # the sampling profiler still covers this thread
+            return None
+        return profile
+
+    def _stop_profile(self, profile: cProfile.Profile | None) -> None:
+        if profile is None:
+            return
+        profile.disable()
+        with self._lock:
+            self._profiles.append(profile)
+
+    def _register_thread(self) -> None:
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def _unregister_thread(self) -> None:
+        with self._lock:
+            self._threads[threading.get_ident()] -= 1
+            if self._threads[threading.get_ident()] <= 0:
+                del self._threads[threading.get_ident()]
+
+    def _sample(self) -> None:
+        thread_names = {}
+        while not self._stopped.wait(self._sampling_interval):
+            with self._lock:
+                thread_identifiers = set(self._threads)
+            frames = sys._current_frames()
+            for thread_identifier in thread_identifiers:
+                frame = frames.get(thread_identifier)
+                if frame is None:
+                    continue
+                if thread_identifier not in thread_names:
+                    thread_names[thread_identifier] = _get_thread_name(thread_identifier)
+                stack = _collapse_stack(frame, thread_names[thread_identifier])
+                with self._lock:
+                    self._stacks[stack] += 1
+
+
+def _get_thread_name(thread_identifier: int) -> str:
+    for thread in threading.enumerate():
+        if thread.ident == thread_identifier:
+            return re.sub(r"_\d+$", "", thread.name)
+    return "thread"
+
+
+def _collapse_stack(frame, thread_name: str) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join([thread_name] + frames[::-1])
+
+
+def run_in_executor(executor: Executor | None, func: Callable, *args) -> asyncio.Future:
+    session = _active_session.get()
+    if session is not None:
+        func = session.wrap(func)
+    return asyncio.get_event_loop().run_in_executor(executor, func, *args)
+
+
+async def profile_coroutine(session: ProfilingSession, func: Callable, *args) -> Any:
+    with session:
+        try:
+            return await func(*args)
+        finally:
+            session.save()
+
+
+def list_profiles(directory: str | None = None) -> dict[str, list[str]]:
+    directory = directory or PROFILES_DIRECTORY
+    if not os.path.isdir(directory):
+        return {}
+
+    profiles: dict[str, list[str]] = {}
+    for filename in sorted(os.listdir(directory)):
+        for profile_format, extension in PROFILE_FORMATS.items():
+            if filename.endswith(extension):
+                profiles.setdefault(filename[:-len(extension)], []).append(profile_format)
+    return profiles
+
+
+def get_profile_path(profile_id: str, profile_format: str, directory: str | None = None) -> str | None:
+    directory = directory or PROFILES_DIRECTORY
+    if profile_format not in PROFILE_FORMATS or not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = join(directory, f"{profile_id}{PROFILE_FORMATS[profile_format]}")
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,99 @@
+import io
+
+import numpy as np
+import orjson
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+
+from ml.models import AnytimePrediction
+
+JSON_MEDIA_TYPE: str = "application/json"
+NPY_MEDIA_TYPE: str = "application/x-npy"
+ARROW_MEDIA_TYPE: str = "application/vnd.apache.arrow.stream"
+EVENT_STREAM_MEDIA_TYPE: str = "text/event-stream"
+SUPPORTED_MEDIA_TYPES: tuple[str, ...] = (JSON_MEDIA_TYPE, NPY_MEDIA_TYPE, ARROW_MEDIA_TYPE)
+
+
+def negotiate_media_type(accept: str | None) -> str:
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    accepted = []
+    for position, media_range in enumerate(accept.split(",")):
+        media_type, *parameters = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for parameter in parameters:
+            if parameter.startswith("q="):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    # A malformed weight makes the range unacceptable instead of failing the whole request
+                    quality = 0.0
+        if quality > 0:
+            accepted.append((-quality, position, media_type))
+
+    for _, _, media_type in sorted(accepted):
+        if media_type in ("*/*", "application/*"):
+            return JSON_MEDIA_TYPE
+        if media_type in SUPPORTED_MEDIA_TYPES:
+            return media_type
+
+    raise HTTPException(
+        status_code=status.HTTP_406_NOT_ACCEPTABLE,
+        detail=f"Supported media types: {', '.join(SUPPORTED_MEDIA_TYPES)}"
+    )
+
+
+def _encode_json(predictions: np.ndarray) -> bytes:
+    return orjson.dumps({"representativeness": predictions}, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _encode_npy(predictions: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, predictions, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _encode_arrow(predictions: np.ndarray) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"{ARROW_MEDIA_TYPE} responses require pyarrow to be installed"
+        )
+
+    table = pa.table({"representativeness": predictions})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+ENCODERS = {
+    JSON_MEDIA_TYPE: _encode_json,
+    NPY_MEDIA_TYPE: _encode_npy,
+    ARROW_MEDIA_TYPE: _encode_arrow,
+}
+
+
+def encode_predictions(predictions: np.ndarray, media_type: str) -> Response:
+    return Response(
+        content=ENCODERS[media_type](np.ascontiguousarray(predictions, dtype=np.float64)),
+        media_type=media_type
+    )
+
+
+def encode_anytime_predictions(prediction: AnytimePrediction, media_type: str) -> Response:
+    headers = {"X-Trees-Used": str(prediction.trees_used), "X-Trees-Total": str(prediction.trees_total)}
+    if media_type == JSON_MEDIA_TYPE:
+        return Response(content=orjson.dumps(prediction.dict()), media_type=media_type, headers=headers)
+    # Binary formats carry the predictions only, the tree counts are reported in headers
+    response = encode_predictions(np.array(prediction.representativeness), media_type)
+    response.headers.update(headers)
+    return response
+
+
+def encode_event(event: dict) -> bytes:
+    # Server-sent event framing, the payload is a single line of JSON
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: ".encode() + orjson.dumps(event) + b"\n\n"
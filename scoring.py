@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import IO, Iterator
+
+import numpy as np
+import orjson
+
+from data.models import round_features
+from ml.models import EnsembleRandomForestBasedRegressor
+
+CHUNK_SIZE: int = 10_000
+INPUT_FORMATS: tuple[str, ...] = ("npy", "parquet", "ndjson")
+
+_ensemble: EnsembleRandomForestBasedRegressor | None = None
+
+
+def _load_worker_ensemble(path: str) -> None:
+    global _ensemble
+    # Arrays of compacted forests are mapped from the model file, so workers share its pages instead of copying them
+    _ensemble = EnsembleRandomForestBasedRegressor()
+    _ensemble.restore(EnsembleRandomForestBasedRegressor.read_state(path, mmap_mode="r"))
+
+
+def _parse_ndjson(lines: list[bytes]) -> np.ndarray:
+    records = [orjson.loads(line) for line in lines]
+    # Each line is either a Sample object or a bare list of features
+    rows = [record["features"] if isinstance(record, dict) else record for record in records]
+    return np.array(rows, dtype=np.float64)
+
+
+def score_chunk(chunk: np.ndarray | list[bytes], n_neighbors: int | None = None) -> np.ndarray:
+    features = _parse_ndjson(chunk) if isinstance(chunk, list) else chunk
+    return _ensemble.predict_features(round_features(features), n_neighbors)
+
+
+def _read_npy(path: str, chunk_size: int) -> Iterator[np.ndarray]:
+    features = np.load(path, mmap_mode="r")
+    for start in range(0, features.shape[0], chunk_size):
+        yield np.asarray(features[start:start + chunk_size])
+
+
+def _read_parquet(path: str, chunk_size: int) -> Iterator[np.ndarray]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet input requires pyarrow to be installed (poetry install -E arrow)")
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        if "features" in batch.schema.names:
+            yield np.array(batch.column("features").to_pylist())
+        else:
+            yield np.column_stack([column.to_numpy(zero_copy_only=False) for column in batch.columns])
+
+
+def _read_ndjson(path: str, chunk_size: int) -> Iterator[list[bytes]]:
+    # Lines are parsed in the workers, the reader only splits the file
+    with open(path, "rb") as file:
+        lines = []
+        for line in file:
+            if line.strip():
+                lines.append(line)
+            if len(lines) == chunk_size:
+                yield lines
+                lines = []
+        if lines:
+            yield lines
+
+
+def read_chunks(path: str, input_format: str, chunk_size: int) -> Iterator[np.ndarray | list[bytes]]:
+    readers = {"npy": _read_npy, "parquet": _read_parquet, "ndjson": _read_ndjson}
+    return readers[input_format](path, chunk_size)
+
+
+def get_input_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    input_format = {"jsonl": "ndjson"}.get(extension, extension)
+    if input_format not in INPUT_FORMATS:
+        raise SystemExit(f"Unsupported input format '{extension}'. Supported formats: {', '.join(INPUT_FORMATS)}")
+    return input_format
+
+
+def write_predictions(file: IO[bytes], predictions: np.ndarray, as_ndjson: bool) -> None:
+    if as_ndjson:
+        file.write(b"".join(orjson.dumps({"representativeness": value}) + b"\n" for value in predictions.tolist()))
+    else:
+        file.write("".join(f"{value!r}\n" for value in predictions.tolist()).encode())
+
+
+def score(
+        model_path: str,
+        input_path: str,
+        output: IO[bytes],
+        workers: int | None = None,
+        chunk_size: int = CHUNK_SIZE,
+        as_ndjson: bool = False,
+        n_neighbors: int | None = None
+) -> dict:
+    input_format = get_input_format(input_path)
+    n_rows, start = 0, time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_worker_ensemble, initargs=(model_path,)) as pool:
+        max_pending = 2 * (workers or os.cpu_count() or 1)
+        pending: deque[Future] = deque()
+
+        def _write_oldest() -> int:
+            predictions = pending.popleft().result()
+            write_predictions(output, predictions, as_ndjson)
+            return len(predictions)
+
+        # Only a bounded number of chunks is in flight, and predictions are written in input order as they complete
+        for chunk in read_chunks(input_path, input_format, chunk_size):
+            pending.append(pool.submit(score_chunk, chunk, n_neighbors))
+            if len(pending) >= max_pending:
+                n_rows += _write_oldest()
+        while pending:
+            n_rows += _write_oldest()
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": n_rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(n_rows / seconds, 1) if seconds else None
+    }
+
+
+def main(arguments: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Score a file of feature vectors with a saved ensemble model")
+    parser.add_argument("model", help="Model file written by the service (MODEL_PATH or a named model snapshot)")
+    parser.add_argument("input", help="Feature vectors in .npy, .parquet or .ndjson format")
+    parser.add_argument("--output", help="Predictions file, one value per line (stdout by default)")
+    parser.add_argument("--ndjson", action="store_true", help="Write {\"representativeness\": value} lines")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--k", type=int, default=None, help="Neighborhood scale of models labeled with several k")
+    args = parser.parse_args(arguments)
+
+    if args.output is None:
+        report = score(args.model, args.input, sys.stdout.buffer, args.workers, args.chunk_size, args.ndjson, args.k)
+    else:
+        with open(args.output, "wb") as output:
+            report = score(args.model, args.input, output, args.workers, args.chunk_size, args.ndjson, args.k)
+    print(orjson.dumps(report).decode(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
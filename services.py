@@ -1,41 +1,493 @@
+import asyncio
+import math
 import os
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator
 
+import numpy as np
+
+from admission import AdmissionController
 from data.models import Dataset, Sample
 from data.processors import DatasetProcessor
-from data.extractors import NearestNeighborsBasedRepresentativenessExtractor
+from data.extractors import (
+    CoresetBasedRepresentativenessExtractor,
+    NearestNeighborsBasedRepresentativenessExtractor,
+    ProjectedRepresentativenessExtractor,
+    RepresentativenessExtractor
+)
+from distributed import DistributedTrainingCoordinator, FileBroker
+from exceptions import MemoryBudgetExceededError
+from logs import Logger
 
-from ml.models import RandomForestBasedRegressor, ensemble_random_forest_based_regressor
+from ml.helpers import ExperimentTracker, MemoryTracker, TrainingCheckpoint, get_progress_broadcaster
+from ml.models import (
+    AnytimePrediction,
+    ForestBasedRegressor,
+    EnsembleRandomForestBasedRegressor,
+    ModelRegistry,
+    Regressor,
+    TrainingStatus,
+    get_ensemble_regressor,
+    get_regressor_backend
+)
+from profiling import run_in_executor
+from responses import encode_event
 
 from dotenv import load_dotenv
 from os.path import join, dirname
 
 load_dotenv(join(dirname(__file__), ".env"))
-NUMBER_OF_ENSEMBLE_MODELS: int = int(os.environ.get("NUMBER_OF_ENSEMBLE_MODELS", 5))
+ADAPTIVE_ENSEMBLE: bool = os.environ.get("NUMBER_OF_ENSEMBLE_MODELS", "").lower() == "auto"
+NUMBER_OF_ENSEMBLE_MODELS: int = 5 if ADAPTIVE_ENSEMBLE else int(os.environ.get("NUMBER_OF_ENSEMBLE_MODELS", 5))
+DEDUPLICATE_SAMPLES: bool = os.environ.get("DEDUPLICATE_SAMPLES", "false").lower() in ("1", "true", "yes")
+SAMPLES_PER_ENSEMBLE_MODEL: int = int(os.environ.get("SAMPLES_PER_ENSEMBLE_MODEL", 2000))
+MODEL_COMPACTION_TOLERANCE: float | None = (
+    float(os.environ["MODEL_COMPACTION_TOLERANCE"]) if os.environ.get("MODEL_COMPACTION_TOLERANCE") else None
+)
+PIPELINED_TRAINING: bool = os.environ.get("PIPELINED_TRAINING", "false").lower() in ("1", "true", "yes")
+LABELING_CONCURRENCY: int | None = (
+    int(os.environ["LABELING_CONCURRENCY"]) if os.environ.get("LABELING_CONCURRENCY") else None
+)
+FITTING_CONCURRENCY: int | None = (
+    int(os.environ["FITTING_CONCURRENCY"]) if os.environ.get("FITTING_CONCURRENCY") else None
+)
+LABELING_CORESET_SIZE: int | None = (
+    int(os.environ["LABELING_CORESET_SIZE"]) if os.environ.get("LABELING_CORESET_SIZE") else None
+)
+LABELING_CORESET_STRATEGY: str = os.environ.get("LABELING_CORESET_STRATEGY", "random")
+LABELING_CORESET_MIN_RANK_CORRELATION: float = float(os.environ.get("LABELING_CORESET_MIN_RANK_CORRELATION", 0.8))
+LABELING_PROJECTION_COMPONENTS: int | None = (
+    int(os.environ["LABELING_PROJECTION_COMPONENTS"]) if os.environ.get("LABELING_PROJECTION_COMPONENTS") else None
+)
+LABELING_PROJECTION_METHOD: str = os.environ.get("LABELING_PROJECTION_METHOD", "random")
+REGRESSOR_BACKEND: str = os.environ.get("REGRESSOR_BACKEND", "random_forest")
+TRACK_TRAINING_MEMORY: bool = os.environ.get("TRACK_TRAINING_MEMORY", "false").lower() in ("1", "true", "yes")
+TRAINING_MEMORY_BUDGET_MB: float | None = (
+    float(os.environ["TRAINING_MEMORY_BUDGET_MB"]) if os.environ.get("TRAINING_MEMORY_BUDGET_MB") else None
+)
+TRAINING_CHECKPOINT_DIRECTORY: str | None = os.environ.get("TRAINING_CHECKPOINT_DIRECTORY") or None
+TRAINING_BROKER_DIRECTORY: str | None = os.environ.get("TRAINING_BROKER_DIRECTORY") or None
+TRAINING_LEASE_SECONDS: float = float(os.environ.get("TRAINING_LEASE_SECONDS", 60))
+TRAINING_MAX_ATTEMPTS: int = int(os.environ.get("TRAINING_MAX_ATTEMPTS", 3))
+TRAINING_CLAIM_TIMEOUT_SECONDS: float = float(os.environ.get("TRAINING_CLAIM_TIMEOUT_SECONDS", 300))
+STATUS_STREAM_HEARTBEAT_SECONDS: float = float(os.environ.get("STATUS_STREAM_HEARTBEAT_SECONDS", 15))
+MODEL_PATH: str | None = os.environ.get("MODEL_PATH") or None
+MODELS_DIRECTORY: str = os.environ.get("MODELS_DIRECTORY", join(dirname(__file__), "models"))
+MODELS_MEMORY_BUDGET_MB: float | None = (
+    float(os.environ["MODELS_MEMORY_BUDGET_MB"]) if os.environ.get("MODELS_MEMORY_BUDGET_MB") else None
+)
+PREDICT_MAX_IN_FLIGHT_SAMPLES: int | None = (
+    int(os.environ["PREDICT_MAX_IN_FLIGHT_SAMPLES"]) if os.environ.get("PREDICT_MAX_IN_FLIGHT_SAMPLES") else None
+)
+PREDICT_MAX_SAMPLES_PER_REQUEST: int | None = (
+    int(os.environ["PREDICT_MAX_SAMPLES_PER_REQUEST"]) if os.environ.get("PREDICT_MAX_SAMPLES_PER_REQUEST") else None
+)
+PREDICT_DEADLINE_SECONDS: float | None = (
+    float(os.environ["PREDICT_DEADLINE_SECONDS"]) if os.environ.get("PREDICT_DEADLINE_SECONDS") else None
+)
+PREDICT_RETRY_AFTER_SECONDS: int = int(os.environ.get("PREDICT_RETRY_AFTER_SECONDS", 1))
+PREDICT_MAX_REQUEST_MB: float | None = (
+    float(os.environ["PREDICT_MAX_REQUEST_MB"]) if os.environ.get("PREDICT_MAX_REQUEST_MB") else None
+)
+TRAIN_STREAM_MAX_MB: float | None = (
+    float(os.environ["TRAIN_STREAM_MAX_MB"]) if os.environ.get("TRAIN_STREAM_MAX_MB") else None
+)
+PREDICTION_SHARDS: int | None = int(os.environ["PREDICTION_SHARDS"]) if os.environ.get("PREDICTION_SHARDS") else None
 
+logger = Logger(__name__)
 
-async def prepare_dataset(dataset: Dataset) -> list[Dataset]:
-    supervised_dataset_chunked: list[Dataset] = await DatasetProcessor.to_supervised(
-        dataset=dataset,
-        splits=NUMBER_OF_ENSEMBLE_MODELS,
-        extractor=NearestNeighborsBasedRepresentativenessExtractor()
+_model_loading_task: asyncio.Task | None = None
+
+model_registry = ModelRegistry(
+    directory=MODELS_DIRECTORY,
+    budget_bytes=int(MODELS_MEMORY_BUDGET_MB * 2 ** 20) if MODELS_MEMORY_BUDGET_MB is not None else None
+)
+
+admission_controller = AdmissionController(
+    max_in_flight_samples=PREDICT_MAX_IN_FLIGHT_SAMPLES,
+    max_samples_per_request=PREDICT_MAX_SAMPLES_PER_REQUEST,
+    deadline_seconds=PREDICT_DEADLINE_SECONDS,
+    retry_after_seconds=PREDICT_RETRY_AFTER_SECONDS,
+    max_request_bytes=int(PREDICT_MAX_REQUEST_MB * 2 ** 20) if PREDICT_MAX_REQUEST_MB is not None else None
+)
+
+
+@contextmanager
+def _track_stage(memory_tracker: MemoryTracker | None, name: str, regressor: Regressor | None = None) -> Iterator[None]:
+    ExperimentTracker.handle_stage_started(regressor, name)
+    try:
+        if memory_tracker is None:
+            yield
+        else:
+            with memory_tracker.track_stage(name):
+                yield
+    except BaseException as error:
+        # Also covers cancellation, so subscribers never see a stage that runs forever
+        ExperimentTracker.handle_stage_failed(regressor, name, error)
+        raise
+    ExperimentTracker.handle_stage_finished(regressor, name)
+
+
+def get_available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_number_of_ensemble_models(n_samples: int) -> int:
+    if not ADAPTIVE_ENSEMBLE:
+        return NUMBER_OF_ENSEMBLE_MODELS
+    number_of_models = max(1, math.ceil(n_samples / SAMPLES_PER_ENSEMBLE_MODEL))
+    cores = get_available_cores()
+    # Members are fitted in parallel, rounding up to whole waves of cores keeps none of them idle in the last wave
+    if number_of_models > cores:
+        number_of_models = math.ceil(number_of_models / cores) * cores
+    return number_of_models
+
+
+def create_sizing_report(n_samples: int, regressors: list[Regressor]) -> dict:
+    forests = [regressor for regressor in regressors if isinstance(regressor, ForestBasedRegressor)]
+    trained_estimators = sum(forest.n_estimators for forest in forests)
+    max_estimators = sum(forest.max_estimators for forest in forests)
+    return {
+        "n_samples": n_samples,
+        "available_cores": get_available_cores(),
+        "number_of_models": len(regressors),
+        "estimators": [forest.n_estimators for forest in forests],
+        "max_estimators": forests[0].max_estimators if forests else None,
+        "estimators_saved_fraction": round(1 - trained_estimators / max_estimators, 4) if max_estimators else None
+    }
+
+
+def create_extractor() -> RepresentativenessExtractor:
+    if LABELING_CORESET_SIZE is None:
+        extractor = NearestNeighborsBasedRepresentativenessExtractor()
+    else:
+        extractor = CoresetBasedRepresentativenessExtractor(
+            coreset_size=LABELING_CORESET_SIZE,
+            strategy=LABELING_CORESET_STRATEGY,
+            min_rank_correlation=LABELING_CORESET_MIN_RANK_CORRELATION
+        )
+    if LABELING_PROJECTION_COMPONENTS is None:
+        return extractor
+    return ProjectedRepresentativenessExtractor(
+        extractor, n_components=LABELING_PROJECTION_COMPONENTS, method=LABELING_PROJECTION_METHOD
     )
 
+
+async def prepare_dataset(
+        dataset: Dataset,
+        requires_labels: bool = True,
+        memory_tracker: MemoryTracker | None = None,
+        splits: int | None = None,
+        regressor: Regressor | None = None,
+        extractor: RepresentativenessExtractor | None = None
+) -> list[Dataset]:
+    if DEDUPLICATE_SAMPLES and requires_labels:
+        with _track_stage(memory_tracker, "deduplication", regressor):
+            dataset = await run_in_executor(None, DatasetProcessor.deduplicate, dataset)
+
+    with _track_stage(memory_tracker, "split", regressor):
+        dataset_chunked: list[Dataset] = await DatasetProcessor.split(
+            dataset=dataset, splits=splits or NUMBER_OF_ENSEMBLE_MODELS
+        )
+
+    if not requires_labels:
+        return dataset_chunked
+
+    with _track_stage(memory_tracker, "labeling", regressor):
+        supervised_dataset_chunked: list[Dataset] = await DatasetProcessor.label(
+            chunks=dataset_chunked,
+            extractor=extractor or create_extractor()
+        )
+
     return supervised_dataset_chunked
 
 
-async def train_model(dataset: Dataset) -> None:
+async def fit_pipelined(
+        ensemble_random_forest_based_regressor: EnsembleRandomForestBasedRegressor,
+        dataset: Dataset,
+        requires_labels: bool = True,
+        memory_tracker: MemoryTracker | None = None,
+        checkpoint: TrainingCheckpoint | None = None,
+        extractor: RepresentativenessExtractor | None = None
+) -> None:
+    if DEDUPLICATE_SAMPLES and requires_labels:
+        with _track_stage(memory_tracker, "deduplication", ensemble_random_forest_based_regressor):
+            dataset = await run_in_executor(None, DatasetProcessor.deduplicate, dataset)
+
+    splits = len(ensemble_random_forest_based_regressor.get_regressors())
+    order, pending_members = None, None
+    if checkpoint is not None:
+        order, pending_members = await run_in_executor(
+            None, restore_checkpoint, ensemble_random_forest_based_regressor, dataset, checkpoint
+        )
+
+    chunks = DatasetProcessor.stream_supervised(
+        dataset=dataset,
+        splits=splits,
+        extractor=(extractor or create_extractor()) if requires_labels else None,
+        max_concurrency=LABELING_CONCURRENCY,
+        order=order,
+        include=pending_members,
+        cache=checkpoint
+    )
+    # Split, labeling and fit overlap across chunks, so they are reported as a single stage
+    with _track_stage(memory_tracker, "pipeline", ensemble_random_forest_based_regressor):
+        await ensemble_random_forest_based_regressor.fit_pipelined(chunks, max_concurrency=FITTING_CONCURRENCY)
+
+    if checkpoint is not None and ensemble_random_forest_based_regressor.status == TrainingStatus.FINISHED:
+        await run_in_executor(None, checkpoint.clear)
+
+
+def restore_checkpoint(
+        ensemble_random_forest_based_regressor: EnsembleRandomForestBasedRegressor,
+        dataset: Dataset,
+        checkpoint: TrainingCheckpoint
+) -> tuple[np.ndarray, set[int]]:
+    # The split is stored first, so chunks labeled before and after a restart never overlap
+    order = checkpoint.load_order()
+    if order is None or len(order) != len(dataset):
+        order = np.random.permutation(len(dataset))
+        checkpoint.save_order(order)
+
+    pending_members = set()
+    for index in range(len(ensemble_random_forest_based_regressor.get_regressors())):
+        member = checkpoint.load_member(index)
+        if member is None:
+            pending_members.add(index)
+        else:
+            ensemble_random_forest_based_regressor.restore_member(index, member)
+
+    n_restored = len(ensemble_random_forest_based_regressor.get_regressors()) - len(pending_members)
+    if n_restored:
+        logger.info(f"Resuming training from {checkpoint.directory} with {n_restored} members already fitted")
+    return order, pending_members
+
+
+def create_checkpoint(dataset: Dataset, splits: int, backend: str | None, job_name: str) -> TrainingCheckpoint | None:
+    if TRAINING_CHECKPOINT_DIRECTORY is None:
+        return None
+    return TrainingCheckpoint.for_job(
+        TRAINING_CHECKPOINT_DIRECTORY,
+        dataset,
+        job_name=job_name,
+        splits=splits,
+        backend=backend or REGRESSOR_BACKEND,
+        n_neighbors=os.environ.get("N_NEIGHBORS", 5),
+        deduplicate=DEDUPLICATE_SAMPLES,
+        coreset_size=LABELING_CORESET_SIZE,
+        coreset_strategy=LABELING_CORESET_STRATEGY,
+        coreset_min_rank_correlation=LABELING_CORESET_MIN_RANK_CORRELATION,
+        projection_components=LABELING_PROJECTION_COMPONENTS,
+        projection_method=LABELING_PROJECTION_METHOD,
+        adaptive_ensemble=ADAPTIVE_ENSEMBLE,
+        compaction_tolerance=MODEL_COMPACTION_TOLERANCE
+    )
+
+
+def create_coordinator() -> DistributedTrainingCoordinator | None:
+    if TRAINING_BROKER_DIRECTORY is None:
+        return None
+    return DistributedTrainingCoordinator(
+        FileBroker(TRAINING_BROKER_DIRECTORY),
+        lease_seconds=TRAINING_LEASE_SECONDS,
+        max_attempts=TRAINING_MAX_ATTEMPTS,
+        claim_timeout_seconds=TRAINING_CLAIM_TIMEOUT_SECONDS
+    )
+
+
+def create_memory_tracker() -> MemoryTracker | None:
+    if not TRACK_TRAINING_MEMORY and TRAINING_MEMORY_BUDGET_MB is None:
+        return None
+    budget_bytes = int(TRAINING_MEMORY_BUDGET_MB * 2 ** 20) if TRAINING_MEMORY_BUDGET_MB is not None else None
+    return MemoryTracker(budget_bytes=budget_bytes)
+
+
+def create_regressor(backend: str | None = None) -> Regressor:
+    regressor_class = get_regressor_backend(backend or REGRESSOR_BACKEND)
+    if issubclass(regressor_class, ForestBasedRegressor):
+        return regressor_class(compaction_tolerance=MODEL_COMPACTION_TOLERANCE, adaptive_estimators=ADAPTIVE_ENSEMBLE)
+    return regressor_class()
+
+
+async def train_model(dataset: Dataset, backend: str | None = None) -> None:
+    ensemble_random_forest_based_regressor = get_ensemble_regressor()
+    await fit_ensemble(ensemble_random_forest_based_regressor, dataset, backend)
+
+    if MODEL_PATH is not None and ensemble_random_forest_based_regressor.status == TrainingStatus.FINISHED:
+        await save_model(MODEL_PATH)
+    await start_prediction_shards(ensemble_random_forest_based_regressor)
+
+
+async def start_prediction_shards(ensemble_random_forest_based_regressor: EnsembleRandomForestBasedRegressor) -> None:
+    if PREDICTION_SHARDS is None or ensemble_random_forest_based_regressor.status != TrainingStatus.FINISHED:
+        return
+    # Spawning the processes and pickling the members does not block requests served in the meantime
+    await run_in_executor(None, ensemble_random_forest_based_regressor.start_shards, PREDICTION_SHARDS)
+    logger.info(f"Serving predictions from {PREDICTION_SHARDS} shard processes")
+
+
+def stop_prediction_shards() -> None:
+    get_ensemble_regressor().stop_shards()
+
+
+async def fit_ensemble(
+        ensemble_random_forest_based_regressor: EnsembleRandomForestBasedRegressor,
+        dataset: Dataset,
+        backend: str | None = None,
+        job_name: str = "default"
+) -> None:
     ensemble_random_forest_based_regressor.reset_status()
-    supervised_dataset_chunked = await prepare_dataset(dataset)
+    memory_tracker = create_memory_tracker()
+    ensemble_random_forest_based_regressor.memory_tracker = memory_tracker
+    splits = get_number_of_ensemble_models(len(dataset))
+    regressors = [create_regressor(backend) for _ in range(splits)]
+    checkpoint = create_checkpoint(dataset, splits, backend, job_name)
+    ensemble_random_forest_based_regressor.checkpoint = checkpoint
+    coordinator = create_coordinator()
+    extractor = create_extractor()
+
+    if memory_tracker is not None:
+        memory_tracker.start()
+    try:
+        # Checkpointing works on chunks as they complete, so it goes through the pipelined path unless members are
+        # fitted by remote workers, which always receive fully labeled chunks
+        if coordinator is None and (PIPELINED_TRAINING or checkpoint is not None):
+            for regressor in regressors:
+                ensemble_random_forest_based_regressor.register_regressor(regressor)
+
+            await fit_pipelined(
+                ensemble_random_forest_based_regressor, dataset,
+                requires_labels=regressors[0].requires_labels, memory_tracker=memory_tracker, checkpoint=checkpoint,
+                extractor=extractor
+            )
+        else:
+            supervised_dataset_chunked = await prepare_dataset(
+                dataset, requires_labels=regressors[0].requires_labels, memory_tracker=memory_tracker, splits=splits,
+                regressor=ensemble_random_forest_based_regressor, extractor=extractor
+            )
+
+            for regressor in regressors:
+                ensemble_random_forest_based_regressor.register_regressor(regressor)
+
+            with _track_stage(memory_tracker, "fit", ensemble_random_forest_based_regressor):
+                if coordinator is None:
+                    await ensemble_random_forest_based_regressor.fit(supervised_dataset_chunked)
+                else:
+                    await ensemble_random_forest_based_regressor.fit_distributed(
+                        supervised_dataset_chunked, coordinator
+                    )
+        if isinstance(extractor, ProjectedRepresentativenessExtractor):
+            ensemble_random_forest_based_regressor.projection_report = extractor.get_report()
+        if ADAPTIVE_ENSEMBLE and ensemble_random_forest_based_regressor.status == TrainingStatus.FINISHED:
+            ensemble_random_forest_based_regressor.sizing_report = create_sizing_report(
+                len(dataset), ensemble_random_forest_based_regressor.get_regressors()
+            )
+    except MemoryBudgetExceededError as error:
+        logger.error(str(error))
+        ExperimentTracker.handle_training_failed(ensemble_random_forest_based_regressor)
+    finally:
+        if memory_tracker is not None:
+            memory_tracker.stop()
+
+
+async def save_model(path: str) -> None:
+    await run_in_executor(None, get_ensemble_regressor().save, path)
+    logger.info(f"Saved model to {path}")
+
+
+async def load_model(path: str) -> None:
+    ensemble_random_forest_based_regressor = get_ensemble_regressor()
+    ensemble_random_forest_based_regressor.status = TrainingStatus.LOADING
+    try:
+        state = await run_in_executor(None, EnsembleRandomForestBasedRegressor.read_state, path)
+    except Exception as error:
+        logger.error(f"Loading model from {path} has failed: {error}")
+        if ensemble_random_forest_based_regressor.status == TrainingStatus.LOADING:
+            ensemble_random_forest_based_regressor.reset_status()
+        return
+
+    # Training submitted while the model was loading takes precedence over the saved model
+    if ensemble_random_forest_based_regressor.status == TrainingStatus.LOADING:
+        ensemble_random_forest_based_regressor.restore(state)
+        logger.info(f"Loaded model from {path}")
+        await start_prediction_shards(ensemble_random_forest_based_regressor)
+
 
-    for _ in range(NUMBER_OF_ENSEMBLE_MODELS):
-        ensemble_random_forest_based_regressor.register_regressor(RandomForestBasedRegressor())
+def start_model_loading() -> asyncio.Task | None:
+    global _model_loading_task
+    if MODEL_PATH is None or not os.path.isfile(MODEL_PATH):
+        return None
+    _model_loading_task = asyncio.create_task(load_model(MODEL_PATH))
+    return _model_loading_task
 
-    await ensemble_random_forest_based_regressor.fit(supervised_dataset_chunked)
 
+async def get_model_predictions(samples: list[Sample], n_neighbors: int | None = None) -> np.ndarray:
+    return await get_ensemble_regressor().predict_batch(samples, n_neighbors)
 
-async def get_model_prediction(sample: Sample) -> float:
-    return await ensemble_random_forest_based_regressor.predict(sample)
+
+async def get_model_matrix_predictions(features: np.ndarray, n_neighbors: int | None = None) -> np.ndarray:
+    return await get_ensemble_regressor().predict_matrix(features, n_neighbors)
+
+
+async def get_model_anytime_predictions(
+        samples: list[Sample],
+        deadline_seconds: float | None = None,
+        tree_fraction: float | None = None,
+        n_neighbors: int | None = None
+) -> AnytimePrediction:
+    return await get_ensemble_regressor().predict_anytime(samples, deadline_seconds, tree_fraction, n_neighbors)
+
+
+_status_snapshot: tuple[tuple, dict[str, str]] | None = None
 
 
 async def get_model_status() -> dict[str, str]:
-    return ensemble_random_forest_based_regressor.get_verbose_status()
+    global _status_snapshot
+    ensemble_random_forest_based_regressor = get_ensemble_regressor()
+    # Every progress event bumps the sequence, so polling clients are served from the cache between transitions
+    key = (
+        get_progress_broadcaster().sequence,
+        id(ensemble_random_forest_based_regressor),
+        ensemble_random_forest_based_regressor.status
+    )
+    if _status_snapshot is None or _status_snapshot[0] != key:
+        _status_snapshot = (key, ensemble_random_forest_based_regressor.get_verbose_status())
+    return _status_snapshot[1]
+
+
+async def stream_progress(heartbeat_seconds: float = STATUS_STREAM_HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+    broadcaster = get_progress_broadcaster()
+    subscription = broadcaster.subscribe()
+    try:
+        # A new client starts from the current snapshot and then only receives transitions
+        yield encode_event({"id": broadcaster.sequence, "event": "status", **await get_model_status()})
+        while True:
+            event = await subscription.get(timeout=heartbeat_seconds)
+            # Comment lines keep idle connections open through proxies
+            yield b": heartbeat\n\n" if event is None else encode_event(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+async def train_named_model(name: str, dataset: Dataset, backend: str | None = None) -> None:
+    await fit_ensemble(model_registry.get_or_create(name), dataset, backend, job_name=name)
+    await model_registry.commit(name)
+
+
+async def get_named_model_predictions(name: str, samples: list[Sample], n_neighbors: int | None = None) -> np.ndarray:
+    ensemble = await model_registry.get(name)
+    return await ensemble.predict_batch(samples, n_neighbors)
+
+
+async def get_named_model_status(name: str) -> dict[str, str]:
+    return model_registry.get_status(name)
+
+
+async def get_models_metrics() -> dict:
+    return model_registry.get_metrics()
+
+
+async def get_admission_metrics() -> dict:
+    return admission_controller.get_metrics()
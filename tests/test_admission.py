@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController
+from exceptions import PredictionDeadlineExceededError, PredictionOverloadedError, PredictionTooLargeError
+
+
+async def _sleep_and_return(seconds: float, value: int) -> int:
+    await asyncio.sleep(seconds)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_admission_controller_rejects_requests_over_in_flight_budget() -> None:
+    controller = AdmissionController(max_in_flight_samples=10, retry_after_seconds=2)
+
+    running = asyncio.ensure_future(controller.run(8, _sleep_and_return, 0.05, 1))
+    await asyncio.sleep(0.01)
+    with pytest.raises(PredictionOverloadedError) as error:
+        await controller.run(5, _sleep_and_return, 0, 2)
+    assert error.value.retry_after_seconds == 2
+    assert await controller.run(2, _sleep_and_return, 0, 3) == 3
+    assert await running == 1
+
+    metrics = controller.get_metrics()
+    assert metrics["admitted_requests"] == 2
+    assert metrics["admitted_samples"] == 10
+    assert metrics["rejected_overloaded"] == 1
+    assert metrics["peak_in_flight_samples"] == 10
+    assert metrics["in_flight_samples"] == metrics["in_flight_requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_controller_rejects_too_large_requests() -> None:
+    controller = AdmissionController(max_in_flight_samples=100, max_samples_per_request=10)
+
+    with pytest.raises(PredictionTooLargeError):
+        await controller.run(11, _sleep_and_return, 0, 1)
+    assert controller.get_metrics()["rejected_too_large"] == 1
+    assert controller.get_metrics()["admitted_requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_controller_enforces_deadline() -> None:
+    controller = AdmissionController(deadline_seconds=0.01)
+
+    with pytest.raises(PredictionDeadlineExceededError):
+        await controller.run(1, _sleep_and_return, 0.05, 1)
+    assert controller.get_metrics()["deadline_exceeded"] == 1
+    await asyncio.sleep(0.1)
+
+
+@pytest.mark.asyncio
+async def test_admission_controller_keeps_timed_out_work_charged_until_it_finishes() -> None:
+    controller = AdmissionController(max_in_flight_samples=10, deadline_seconds=0.01)
+
+    with pytest.raises(PredictionDeadlineExceededError):
+        await controller.run(8, _sleep_and_return, 0.1, 1)
+    assert controller.get_metrics()["in_flight_samples"] == 8
+    with pytest.raises(PredictionOverloadedError):
+        await controller.run(5, _sleep_and_return, 0, 2)
+
+    await asyncio.sleep(0.15)
+    metrics = controller.get_metrics()
+    assert metrics["in_flight_samples"] == metrics["in_flight_requests"] == 0
+    assert await controller.run(5, _sleep_and_return, 0, 3) == 3
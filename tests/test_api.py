@@ -1,10 +1,24 @@
+import asyncio
+import base64
+import io
+import os
 import random
+import subprocess
+import sys
+import time
+from os.path import dirname
 
+import numpy as np
+import orjson
 import pytest
 from fastapi.testclient import TestClient
 
+import profiling
+import services
+from admission import AdmissionController
 from data.models import Dataset, Sample
 from main import app
+from ml.models import EnsembleRandomForestBasedRegressor, ModelRegistry, get_ensemble_regressor
 
 
 @pytest.fixture(scope="function")
@@ -111,3 +125,258 @@ def test_train_model_endpoint_with_post_and_incorrect_dataset_structure(client)
         }
     })
     assert response.status_code == 422
+
+
+@pytest.mark.parametrize("weight", [0, -1])
+def test_train_model_endpoint_rejects_non_positive_weights(client, correct_dataset_small, weight: int) -> None:
+    weights = [1] * len(correct_dataset_small.samples)
+    weights[0] = weight
+    response = client.post("/train", json={**correct_dataset_small.dict(), "weights": weights})
+    assert response.status_code == 422
+    assert "Dataset weights must be positive" in response.text
+
+
+def test_train_model_endpoint_with_regressor_backend(
+        client, correct_dataset_small, correct_shape_samples
+) -> None:
+    response = client.post("/train", params={"backend": "extra_trees"}, json=correct_dataset_small.dict())
+    assert response.status_code == 202
+    assert client.get("/status").json()["status"] == "Training has finished"
+
+    predict_response = client.post("/predict", json=correct_shape_samples)
+    assert predict_response.status_code == 200
+    assert len(predict_response.json()["representativeness"]) == len(correct_shape_samples)
+
+
+def test_train_model_endpoint_with_unknown_regressor_backend(client, correct_dataset_small) -> None:
+    response = client.post("/train", params={"backend": "unknown"}, json=correct_dataset_small.dict())
+    assert response.status_code == 422
+    assert "Unknown regressor backend 'unknown'" in response.json()["detail"]
+
+
+def test_predict_endpoint_response_encodings(client, correct_dataset_small) -> None:
+    response = client.post("/train", json=correct_dataset_small.dict())
+    assert response.status_code == 202
+
+    samples = [Sample(features=[random.random() for _ in range(10)]).dict() for _ in range(5_000)]
+    json_response = client.post("/predict", json=samples, headers={"Accept-Encoding": "gzip"})
+    assert json_response.status_code == 200
+    assert json_response.headers["content-encoding"] == "gzip"
+    representativeness = json_response.json()["representativeness"]
+    assert len(representativeness) == len(samples)
+
+    npy_response = client.post("/predict", json=samples, headers={"Accept": "application/x-npy"})
+    assert npy_response.status_code == 200
+    assert npy_response.headers["content-type"] == "application/x-npy"
+    assert np.allclose(np.load(io.BytesIO(npy_response.content)), representativeness)
+
+    assert client.post("/predict", json=samples, headers={"Accept": "text/html"}).status_code == 406
+    assert client.post("/predict", json=samples, headers={"Accept": "application/json;q=abc"}).status_code == 406
+
+
+def test_profiled_train_and_predict(
+        client, correct_dataset_small, correct_shape_samples, tmp_path, monkeypatch
+) -> None:
+    monkeypatch.setattr(profiling, "PROFILES_DIRECTORY", str(tmp_path))
+
+    response = client.post("/train", params={"profile": True}, json=correct_dataset_small.dict())
+    assert response.status_code == 202
+    train_profile_id = response.json()["profile_id"]
+
+    predict_response = client.post("/predict", params={"profile": True}, json=correct_shape_samples)
+    assert predict_response.status_code == 200
+    predict_profile_id = predict_response.headers["X-Profile-Id"]
+
+    profiles = client.get("/admin/profiles").json()["profiles"]
+    assert {train_profile_id, predict_profile_id} <= set(profiles)
+
+    collapsed_response = client.get(f"/admin/profiles/{train_profile_id}", params={"format": "collapsed"})
+    assert collapsed_response.status_code == 200
+    assert client.get("/admin/profiles/unknown").status_code == 404
+
+
+def test_importing_main_does_not_import_sklearn() -> None:
+    modules = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print(' '.join(sys.modules))"],
+        capture_output=True, text=True, check=True, cwd=dirname(dirname(os.path.abspath(__file__)))
+    ).stdout.split()
+    assert "main" in modules
+    assert not any(module == "sklearn" or module.startswith("sklearn.") for module in modules)
+
+
+def test_saved_model_is_loaded_on_startup(correct_dataset_small, correct_shape_samples, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(services, "MODEL_PATH", str(tmp_path / "model.pkl"))
+    with TestClient(app) as client:
+        assert client.post("/train", json=correct_dataset_small.dict()).status_code == 202
+        representativeness = client.post("/predict", json=correct_shape_samples).json()["representativeness"]
+
+    get_ensemble_regressor().reset_status()
+    with TestClient(app) as client:
+        deadline = time.perf_counter() + 30
+        while client.get("/status").json()["status"] != "Training has finished" and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        predict_response = client.post("/predict", json=correct_shape_samples)
+    assert predict_response.status_code == 200
+    assert predict_response.json()["representativeness"] == representativeness
+
+
+def test_named_models(client, correct_dataset_small, correct_shape_samples, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(services, "model_registry", ModelRegistry(directory=str(tmp_path)))
+
+    assert client.get("/models/team-a/status").status_code == 404
+    assert client.post("/models/team-a/predict", json=correct_shape_samples).status_code == 404
+    assert client.post("/models/team a/train", json=correct_dataset_small.dict()).status_code == 422
+
+    narrow_dataset = Dataset(samples=[Sample(features=[random.random() for _ in range(5)]) for _ in range(100)])
+    assert client.post("/models/team-a/train", json=correct_dataset_small.dict()).status_code == 202
+    assert client.post("/models/team-b/train", json=narrow_dataset.dict()).status_code == 202
+
+    assert client.get("/models/team-a/status").json()["status"] == "Training has finished"
+    assert client.post("/models/team-a/predict", json=correct_shape_samples).status_code == 200
+    narrow_samples = [Sample(features=[random.random() for _ in range(5)]).dict()]
+    assert client.post("/models/team-b/predict", json=narrow_samples).status_code == 200
+    assert client.post("/models/team-b/predict", json=correct_shape_samples).status_code == 202
+
+    models = client.get("/models").json()["models"]
+    assert set(models) == {"team-a", "team-b"}
+    assert models["team-a"]["hit_rate"] == 1.0
+
+
+def test_adaptive_ensemble_sizing_is_reported(client, correct_dataset_small, monkeypatch) -> None:
+    monkeypatch.setattr(services, "ADAPTIVE_ENSEMBLE", True)
+    monkeypatch.setattr(services, "SAMPLES_PER_ENSEMBLE_MODEL", 50)
+    monkeypatch.setattr(services, "get_available_cores", lambda: 4)
+    assert services.get_number_of_ensemble_models(100) == 2
+    assert services.get_number_of_ensemble_models(250) == 8
+
+    assert client.post("/train", json=correct_dataset_small.dict()).status_code == 202
+    sizing = client.get("/status").json()["ensemble_sizing"]
+    assert sizing["number_of_models"] == 2
+    assert len(sizing["estimators"]) == 2
+    assert 0 <= sizing["estimators_saved_fraction"] < 1
+
+
+def test_predict_endpoint_admission_control(client, correct_shape_samples, monkeypatch) -> None:
+    monkeypatch.setattr(
+        services, "admission_controller", AdmissionController(max_samples_per_request=1, retry_after_seconds=3)
+    )
+    response = client.post("/predict", json=correct_shape_samples)
+    assert response.status_code == 413
+
+    monkeypatch.setattr(
+        services, "admission_controller", AdmissionController(max_in_flight_samples=10, retry_after_seconds=3)
+    )
+    services.admission_controller._admit(9)
+    response = client.post("/predict", json=correct_shape_samples)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+    metrics = client.get("/admin/admission").json()
+    assert metrics["rejected_overloaded"] == 1
+    assert metrics["in_flight_samples"] == 9
+
+
+@pytest.mark.parametrize("path", ["/predict", "/predict/matrix", "/models/team_a/predict"])
+def test_prediction_requests_are_shed_before_the_body_is_parsed(client, monkeypatch, path: str) -> None:
+    monkeypatch.setattr(
+        services, "admission_controller", AdmissionController(max_in_flight_samples=10, max_request_bytes=64)
+    )
+    # Bodies that would fail validation show that the request was rejected before it was parsed
+    response = client.post(path, content=b"x" * 65, headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+
+    services.admission_controller._admit(10)
+    response = client.post(path, content=b"not json", headers={"Content-Type": "application/json"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    metrics = client.get("/admin/admission").json()
+    assert metrics["rejected_too_large"] == 1
+    assert metrics["rejected_overloaded"] == 1
+    assert metrics["admitted_requests"] == 1
+
+
+def test_train_model_from_stream(client, correct_shape_samples) -> None:
+    body = b"\n".join(orjson.dumps([random.random() for _ in range(10)]) for _ in range(100))
+    response = client.post("/train/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 202
+    assert response.json()["samples"] == 100
+    assert client.get("/status").json()["status"] == "Training has finished"
+    assert client.post("/predict", json=correct_shape_samples).status_code == 200
+
+    response = client.post(
+        "/train/stream", content=b"[0.1]\n[0.1, 0.2]", headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 422
+
+
+def test_train_model_from_stream_rejects_bodies_over_the_limit(client, monkeypatch) -> None:
+    monkeypatch.setattr(services, "TRAIN_STREAM_MAX_MB", 1 / 1024)
+    body = np.random.random((100, 2)).astype("<f8").tobytes()
+    response = client.post(
+        "/train/stream", content=body, headers={"Content-Type": "application/octet-stream", "X-Feature-Width": "2"}
+    )
+    assert response.status_code == 413
+
+
+def test_predict_endpoint_with_tree_fraction(client, correct_dataset_small, correct_shape_samples) -> None:
+    assert client.post("/train", json=correct_dataset_small.dict()).status_code == 202
+
+    response = client.post("/predict?tree_fraction=0.2", json=correct_shape_samples)
+    assert response.status_code == 200
+    assert response.json()["trees_used"] == int(response.headers["X-Trees-Used"])
+    assert response.json()["trees_used"] < response.json()["trees_total"]
+    assert len(response.json()["variance"]) == len(correct_shape_samples)
+
+    assert client.post("/predict?tree_fraction=1.5", json=correct_shape_samples).status_code == 422
+
+
+def test_predict_matrix_endpoint(client, correct_dataset_small, correct_shape_samples, monkeypatch) -> None:
+    # Earlier tests leave the global ensemble trained
+    ensemble = EnsembleRandomForestBasedRegressor()
+    monkeypatch.setattr(services, "get_ensemble_regressor", lambda: ensemble)
+    features = [sample["features"] for sample in correct_shape_samples]
+    assert client.post("/predict/matrix", json={"features": features}).status_code == 202
+
+    assert client.post("/train", json=correct_dataset_small.dict()).status_code == 202
+    response = client.post("/predict/matrix", json={"features": features})
+    assert response.status_code == 200
+    assert response.json() == client.post("/predict", json=correct_shape_samples).json()
+
+    assert client.post("/predict/matrix", json={"features": [row[:5] for row in features]}).status_code == 202
+    assert client.post("/predict/matrix", json={"features": [[0.1], [0.1, 0.2]]}).status_code == 400
+    nan_row = base64.b64encode(np.full(10, np.nan).tobytes()).decode()
+    assert client.post("/predict/matrix", json={"features_base64": nan_row, "n_features": 10}).status_code == 400
+    assert client.post("/predict/matrix", json={"features": []}).json() == {"representativeness": []}
+
+
+@pytest.mark.asyncio
+async def test_status_stream_is_not_compressed() -> None:
+    # TestClient waits for the whole body, so the endless stream is read from the ASGI app directly
+    messages = []
+    first_event = asyncio.Event()
+
+    async def receive() -> dict:
+        await asyncio.Event().wait()
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+        if message.get("body"):
+            first_event.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/status/stream", "raw_path": b"/status/stream", "root_path": "", "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip, deflate")], "client": ("testclient", 50000),
+        "server": ("testserver", 80)
+    }
+    request = asyncio.ensure_future(app(scope, receive, send))
+    try:
+        await asyncio.wait_for(first_event.wait(), timeout=5)
+    finally:
+        request.cancel()
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-type"].startswith(b"text/event-stream")
+    assert headers.get(b"content-encoding") != b"gzip"
+    assert b"event: status\n" in messages[1]["body"]
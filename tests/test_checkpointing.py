@@ -0,0 +1,66 @@
+import os
+import random
+
+import pytest
+
+import services
+from data.models import Dataset, Sample
+from ml.helpers import TrainingCheckpoint, TrainingStatus
+from ml.models import EnsembleRandomForestBasedRegressor
+
+
+@pytest.fixture
+def small_dataset() -> Dataset:
+    return Dataset(samples=[Sample(features=[random.random() for _ in range(5)]) for _ in range(100)])
+
+
+def test_training_checkpoint_round_trip(small_dataset: Dataset, tmp_path) -> None:
+    checkpoint = TrainingCheckpoint.for_job(str(tmp_path), small_dataset, splits=2)
+    assert checkpoint.directory == TrainingCheckpoint.for_job(str(tmp_path), small_dataset, splits=2).directory
+    assert checkpoint.directory != TrainingCheckpoint.for_job(str(tmp_path), small_dataset, splits=3).directory
+
+    assert checkpoint.load_chunk(0) is None and not checkpoint.has_chunk(0)
+    checkpoint.save_chunk(0, small_dataset)
+    assert checkpoint.has_chunk(0)
+    assert checkpoint.load_chunk(0).get_feature_representation().tolist() == \
+        small_dataset.get_feature_representation().tolist()
+
+    checkpoint.clear()
+    assert not os.path.exists(checkpoint.directory)
+
+
+@pytest.mark.asyncio
+async def test_failed_training_resumes_from_checkpoint(small_dataset: Dataset, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(services, "TRAINING_CHECKPOINT_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(services, "NUMBER_OF_ENSEMBLE_MODELS", 2)
+    fit_regressor = EnsembleRandomForestBasedRegressor._fit_regressor
+
+    def _fail_fit(dataset) -> None:
+        raise RuntimeError("Simulated member failure")
+
+    def _fail_second_member(self, index, regressor, dataset) -> None:
+        # The member itself fails, so the status bookkeeping of _fit_regressor still runs
+        if index == 1:
+            monkeypatch.setattr(regressor, "fit", _fail_fit)
+        fit_regressor(self, index, regressor, dataset)
+
+    regressor = EnsembleRandomForestBasedRegressor()
+    monkeypatch.setattr(EnsembleRandomForestBasedRegressor, "_fit_regressor", _fail_second_member)
+    await services.fit_ensemble(regressor, small_dataset)
+
+    assert regressor.status == TrainingStatus.ERROR
+    assert [member["status"] for member in regressor.get_verbose_status()["members"]] == [
+        TrainingStatus.FINISHED.value, TrainingStatus.ERROR.value
+    ]
+    assert regressor.checkpoint.has_member(0) and not regressor.checkpoint.has_member(1)
+    assert regressor.checkpoint.has_chunk(1)
+
+    monkeypatch.setattr(EnsembleRandomForestBasedRegressor, "_fit_regressor", fit_regressor)
+    await services.fit_ensemble(regressor, small_dataset)
+
+    assert regressor.status == TrainingStatus.FINISHED
+    assert regressor.get_verbose_status()["members"] == [
+        {"status": TrainingStatus.FINISHED.value, "resumed": True},
+        {"status": TrainingStatus.FINISHED.value, "resumed": False}
+    ]
+    assert not os.path.exists(regressor.checkpoint.directory)
@@ -0,0 +1,77 @@
+from typing import Coroutine
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from data.models import Dataset, Sample
+from ml.models import CompactForest, RandomForestBasedRegressor
+from ml.models.compaction import compact_forest
+
+
+@pytest.fixture
+def forest() -> tuple[RandomForestRegressor, np.ndarray]:
+    rng = np.random.default_rng(0)
+    features = np.round(rng.random((500, 5)), 5)
+    targets = 1 / (1 + features.sum(axis=1))
+    return RandomForestRegressor(n_estimators=10, random_state=0).fit(features, targets), features
+
+
+def test_compact_forest_without_tolerance_matches_forest(forest) -> None:
+    model, features = forest
+    compacted, report = compact_forest(model, features, tolerance=0.0)
+
+    assert isinstance(compacted, CompactForest)
+    assert report.bytes_after < report.bytes_before
+    assert report.nodes_after <= report.nodes_before
+    assert report.max_abs_drift < 1e-5
+
+    queries = np.random.default_rng(1).random((200, 5))
+    assert np.allclose(compacted.predict(queries), model.predict(queries), atol=1e-3)
+
+
+def test_compact_forest_predict_trees_matches_estimators(forest) -> None:
+    model, features = forest
+    compacted, _ = compact_forest(model, features, tolerance=0.0)
+    queries = np.random.default_rng(1).random((50, 5))
+    trees = np.array([7, 2])
+
+    expected = np.column_stack([model.estimators_[tree].predict(queries.astype(np.float32)) for tree in trees])
+    assert compacted.predict_trees(queries, trees).shape == (50, 2)
+    assert np.allclose(compacted.predict_trees(queries, trees), expected, atol=1e-5)
+
+
+def test_compact_forest_collapses_subtrees_within_tolerance(forest) -> None:
+    model, features = forest
+    _, exact_report = compact_forest(model, features, tolerance=0.0)
+    pruned, pruned_report = compact_forest(model, features, tolerance=0.01)
+
+    assert pruned_report.nodes_after < exact_report.nodes_after
+    assert pruned_report.max_abs_drift <= 0.01
+
+    collapsed, _ = compact_forest(model, features, tolerance=1.0)
+    assert collapsed.node_count == len(model.estimators_)
+    assert collapsed.max_depth == 0
+    expected = np.mean([estimator.tree_.value[0, 0, 0] for estimator in model.estimators_])
+    assert np.allclose(collapsed.predict(features[:3]), expected)
+
+
+@pytest.mark.asyncio
+async def test_random_forest_based_regressor_with_compaction(
+        dataset: Coroutine[None, None, Dataset], correct_shape_sample: Sample
+) -> None:
+    _dataset = await dataset
+    for sample in _dataset.samples:
+        sample.representativeness = sample.features[0]
+
+    regressor = RandomForestBasedRegressor(compaction_tolerance=0.0)
+    regressor.fit(_dataset)
+
+    assert isinstance(regressor.model, CompactForest)
+    assert regressor.compaction_report is not None
+    assert regressor.schema.n_features_in == 100
+    prediction = regressor.predict(correct_shape_sample)
+    assert 0 <= prediction <= 1
+
+    regressor.fit(_dataset)
+    assert isinstance(regressor.model, CompactForest)
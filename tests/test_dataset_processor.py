@@ -1,3 +1,6 @@
+import itertools
+import threading
+import time
 from typing import Coroutine
 
 import numpy as np
@@ -5,7 +8,7 @@ import pytest
 from pytest_mock.plugin import MockerFixture
 
 from data.extractors import NearestNeighborsBasedRepresentativenessExtractor
-from data.models import Dataset
+from data.models import Dataset, Sample
 from data.processors import DatasetProcessor
 
 
@@ -53,3 +56,115 @@ async def test_to_supervised(
     assert len(labeled_chunks) == 3
     for chunk in labeled_chunks:
         assert isinstance(chunk, Dataset)
+
+
+@pytest.mark.asyncio
+async def test_split(dataset: Coroutine[None, None, Dataset]) -> None:
+    _dataset: Dataset = await dataset
+    chunks = await DatasetProcessor.split(_dataset, 3)
+
+    assert [len(chunk) for chunk in chunks] == [34, 33, 33]
+    assert all(sample.representativeness is None for chunk in chunks for sample in chunk.samples)
+    assert sorted(map(tuple, np.vstack([chunk.get_feature_representation() for chunk in chunks]))) == \
+        sorted(map(tuple, _dataset.get_feature_representation()))
+
+
+def test_deduplicate() -> None:
+    dataset = Dataset(samples=[Sample(features=features) for features in [[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]]])
+    deduplicated = DatasetProcessor.deduplicate(dataset)
+
+    assert sorted(zip(map(tuple, deduplicated.get_feature_representation()), deduplicated.weights)) == \
+        [((1.0, 2.0), 2), ((3.0, 4.0), 1)]
+    assert DatasetProcessor.deduplicate(deduplicated).weights == deduplicated.weights
+
+
+@pytest.mark.asyncio
+async def test_to_supervised_with_deduplication(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "3")
+    unique_rows = np.random.random((20, 4)).round(5)
+    dataset = Dataset(samples=[Sample(features=row.tolist()) for row in np.repeat(unique_rows, 5, axis=0)])
+
+    labeled_chunks = await DatasetProcessor.to_supervised(
+        dataset, 2, NearestNeighborsBasedRepresentativenessExtractor(), deduplicate=True
+    )
+
+    assert sum(sum(chunk.weights) for chunk in labeled_chunks) == len(dataset)
+    assert sum(len(chunk) for chunk in labeled_chunks) <= len(unique_rows) * 2
+    assert all(not np.any(np.isnan(chunk.get_target_representation())) for chunk in labeled_chunks)
+
+
+@pytest.mark.asyncio
+async def test_stream_supervised(
+        mocker: MockerFixture, dataset: Coroutine[None, None, Dataset]
+) -> None:
+    _dataset: Dataset = await dataset
+    mocked_extractor = mocker.Mock(spec=NearestNeighborsBasedRepresentativenessExtractor)
+    mocked_extractor.extract.side_effect = lambda features, weights: np.ones(features.shape[0])
+
+    chunks = [chunk async for chunk in DatasetProcessor.stream_supervised(_dataset, 3, mocked_extractor, 2)]
+
+    assert sorted(index for index, _ in chunks) == [0, 1, 2]
+    assert sum(len(chunk) for _, chunk in chunks) == len(_dataset)
+    assert all(np.array_equal(chunk.get_target_representation(), np.ones(len(chunk))) for _, chunk in chunks)
+    assert mocked_extractor.extract.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_supervised_does_not_wait_for_labeling_when_stopped_early(mocker: MockerFixture) -> None:
+    dataset = Dataset.from_features(np.random.random((100, 4)).round(5))
+    released = threading.Event()
+    calls = itertools.count()
+
+    def _extract(features: np.ndarray, weights: np.ndarray | None) -> np.ndarray:
+        # Only the first chunk is labeled right away, the others are held until the test releases them
+        if next(calls) > 0:
+            released.wait(timeout=5)
+        return np.ones(features.shape[0])
+
+    mocked_extractor = mocker.Mock(spec=NearestNeighborsBasedRepresentativenessExtractor)
+    mocked_extractor.extract.side_effect = _extract
+
+    chunks = DatasetProcessor.stream_supervised(dataset, 4, mocked_extractor, 2)
+    try:
+        await chunks.__anext__()
+        start = time.perf_counter()
+        await chunks.aclose()
+        assert time.perf_counter() - start < 1
+        # Both workers are held by chunks being labeled, so the last chunk never starts
+        assert mocked_extractor.extract.call_count <= 3
+    finally:
+        released.set()
+
+
+@pytest.mark.asyncio
+async def test_array_backed_dataset_is_split_and_labeled_without_copies(mocker: MockerFixture) -> None:
+    features = np.random.random((100, 4)).round(5)
+    dataset = Dataset.from_features(features.copy())
+    mocked_extractor = mocker.Mock(spec=NearestNeighborsBasedRepresentativenessExtractor)
+    mocked_extractor.extract.side_effect = lambda _features, weights: _features[:, 0]
+
+    labeled_chunks = await DatasetProcessor.to_supervised(dataset, 3, mocked_extractor)
+
+    assert [len(chunk) for chunk in labeled_chunks] == [34, 33, 33]
+    assert all(
+        np.shares_memory(chunk.get_feature_representation(), dataset.get_feature_representation())
+        for chunk in labeled_chunks
+    )
+    assert all(
+        np.array_equal(chunk.get_target_representation(), chunk.get_feature_representation()[:, 0])
+        for chunk in labeled_chunks
+    )
+    assert sorted(map(tuple, np.vstack([chunk.get_feature_representation() for chunk in labeled_chunks]))) == \
+        sorted(map(tuple, features))
+
+
+def test_array_backed_dataset_deduplication_and_take() -> None:
+    dataset = Dataset.from_features(np.array([[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]]))
+    deduplicated = DatasetProcessor.deduplicate(dataset)
+
+    assert deduplicated.is_array_backed
+    assert sorted(zip(map(tuple, deduplicated.get_feature_representation()), deduplicated.weights)) == \
+        [((1.0, 2.0), 2), ((3.0, 4.0), 1)]
+    taken = DatasetProcessor.take(deduplicated, np.array([1, 0]))
+    assert taken.weights == deduplicated.weights[::-1]
+    assert np.array_equal(taken.get_feature_representation(), deduplicated.get_feature_representation()[::-1])
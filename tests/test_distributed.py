@@ -0,0 +1,114 @@
+import asyncio
+import random
+import threading
+import time
+
+import pytest
+
+import services
+from data.models import Dataset, Sample
+from distributed import DistributedTrainingCoordinator, FileBroker, run_worker
+from ml.helpers import TrainingStatus
+from ml.models import EnsembleRandomForestBasedRegressor
+
+
+@pytest.fixture
+def small_dataset() -> Dataset:
+    return Dataset(samples=[Sample(features=[random.random() for _ in range(5)]) for _ in range(100)])
+
+
+def _start_workers(broker: FileBroker, n_workers: int, max_tasks: int) -> list[threading.Thread]:
+    workers = [
+        threading.Thread(
+            target=run_worker,
+            args=(broker, f"worker-{index}"),
+            kwargs={"lease_seconds": 0.3, "poll_seconds": 0.01, "max_tasks": max_tasks},
+            daemon=True
+        )
+        for index in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def test_file_broker_hands_each_task_to_a_single_worker(tmp_path) -> None:
+    broker = FileBroker(str(tmp_path))
+    broker.publish("job-0", b"payload")
+
+    assert broker.claim("first") == ("job-0", b"payload")
+    assert broker.claim("second") is None
+    assert broker.renew("job-0", "first")
+    assert not broker.renew("job-0", "second")
+
+    broker.complete("job-0", "first", b"result")
+    assert broker.collect(["job-0"]) == {"job-0": b"result"}
+    assert broker.collect(["job-0"]) == {}
+
+
+def test_file_broker_requeues_tasks_with_expired_leases(tmp_path) -> None:
+    broker = FileBroker(str(tmp_path))
+    broker.publish("job-0", b"payload")
+    broker.claim("lost")
+
+    assert broker.requeue_expired(lease_seconds=60) == []
+    time.sleep(0.05)
+    assert broker.requeue_expired(lease_seconds=0.01) == ["job-0"]
+    assert not broker.renew("job-0", "lost")
+    assert broker.claim("replacement") == ("job-0", b"payload")
+
+
+@pytest.mark.asyncio
+async def test_distributed_training_assembles_members_fitted_by_workers(small_dataset: Dataset, tmp_path) -> None:
+    broker = FileBroker(str(tmp_path))
+    workers = _start_workers(broker, n_workers=2, max_tasks=1)
+    regressors = [services.create_regressor() for _ in range(2)]
+    datasets = await services.prepare_dataset(small_dataset, splits=2)
+
+    regressor = EnsembleRandomForestBasedRegressor()
+    for member in regressors:
+        regressor.register_regressor(member)
+    await regressor.fit_distributed(datasets, DistributedTrainingCoordinator(broker, poll_seconds=0.01))
+
+    assert regressor.status == TrainingStatus.FINISHED
+    assert all(member.status == TrainingStatus.FINISHED for member in regressor.get_regressors())
+    assert (await regressor.predict_batch(small_dataset.samples[:3])).shape == (3,)
+    for worker in workers:
+        worker.join(timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_distributed_training_reassigns_chunks_of_lost_workers(small_dataset: Dataset, tmp_path) -> None:
+    broker = FileBroker(str(tmp_path))
+    coordinator = DistributedTrainingCoordinator(broker, lease_seconds=0.3, poll_seconds=0.01)
+    datasets = await services.prepare_dataset(small_dataset, splits=2)
+
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in range(2):
+        regressor.register_regressor(services.create_regressor())
+    training = asyncio.ensure_future(regressor.fit_distributed(datasets, coordinator))
+
+    # A worker claims a chunk and disappears without renewing its lease
+    while broker.claim("lost") is None:
+        await asyncio.sleep(0.01)
+    _start_workers(broker, n_workers=1, max_tasks=2)
+    await asyncio.wait_for(training, timeout=30)
+
+    assert regressor.status == TrainingStatus.FINISHED
+    assert [member["status"] for member in regressor.get_member_statuses()] == [TrainingStatus.FINISHED.value] * 2
+
+
+@pytest.mark.asyncio
+async def test_distributed_training_fails_when_no_worker_claims_a_member(small_dataset: Dataset, tmp_path) -> None:
+    broker = FileBroker(str(tmp_path))
+    coordinator = DistributedTrainingCoordinator(broker, poll_seconds=0.01, claim_timeout_seconds=0.2)
+    datasets = await services.prepare_dataset(small_dataset, splits=2)
+
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in range(2):
+        regressor.register_regressor(services.create_regressor())
+    await asyncio.wait_for(regressor.fit_distributed(datasets, coordinator), timeout=30)
+
+    assert regressor.status == TrainingStatus.ERROR
+    # Unclaimed tasks are withdrawn, so a worker started later does not fit them for nothing
+    assert broker.claim("late") is None
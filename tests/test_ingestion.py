@@ -0,0 +1,124 @@
+import base64
+from typing import AsyncIterator
+
+import numpy as np
+import orjson
+import pytest
+
+from data.models import Dataset, Sample
+from exceptions import InvalidFeatureMatrixError, StreamingIngestionError, StreamingIngestionTooLargeError
+from ingestion import (
+    MAX_PREALLOCATED_BYTES,
+    NDJSON_MEDIA_TYPE,
+    RECORDS_MEDIA_TYPE,
+    FeatureBuffer,
+    ingest,
+    read_feature_matrix,
+    read_records
+)
+
+
+async def _stream(body: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+def test_feature_buffer_grows_and_validates_width() -> None:
+    buffer = FeatureBuffer(capacity=2)
+    for _ in range(5):
+        buffer.append(np.ones((3, 4)))
+
+    assert buffer.features.shape == (15, 4)
+    with pytest.raises(StreamingIngestionError):
+        buffer.append(np.ones((1, 5)))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+async def test_ingest_ndjson_matches_validated_samples(chunk_size: int) -> None:
+    rows = np.random.random((50, 4)).tolist()
+    body = b"\n".join(
+        orjson.dumps({"features": row}) if index % 2 else orjson.dumps(row) for index, row in enumerate(rows)
+    )
+
+    dataset = await ingest(_stream(body, chunk_size), NDJSON_MEDIA_TYPE)
+    expected = Dataset(samples=[Sample(features=row) for row in rows])
+    assert np.array_equal(dataset.get_feature_representation(), expected.get_feature_representation())
+
+
+@pytest.mark.asyncio
+async def test_ingest_binary_records() -> None:
+    features = np.random.random((30, 3))
+    body = features.astype("<f8").tobytes()
+
+    dataset = await ingest(_stream(body, 13), RECORDS_MEDIA_TYPE, n_features=3, content_length=len(body))
+    expected = Dataset(samples=[Sample(features=row) for row in features.tolist()])
+    assert np.array_equal(dataset.get_feature_representation(), expected.get_feature_representation())
+    # The dataset is backed by the ingestion buffer itself, no per-row objects are created
+    assert dataset.is_array_backed and not dataset.samples
+    assert dataset.get_feature_representation().base is None
+
+    with pytest.raises(StreamingIngestionError):
+        await ingest(_stream(body[:-1], 13), RECORDS_MEDIA_TYPE, n_features=3)
+
+
+@pytest.mark.asyncio
+async def test_forged_content_length_does_not_preallocate_the_claimed_size() -> None:
+    body = np.random.random((10, 3)).astype("<f8").tobytes()
+    buffer = FeatureBuffer(3)
+
+    await read_records(_stream(body, 13), buffer, content_length=24 * 10 ** 12)
+
+    assert buffer.n_rows == 10
+    assert buffer._buffer.nbytes <= MAX_PREALLOCATED_BYTES
+
+
+@pytest.mark.asyncio
+async def test_ingest_rejects_bodies_over_the_limit() -> None:
+    body = np.random.random((10, 3)).astype("<f8").tobytes()
+
+    with pytest.raises(StreamingIngestionTooLargeError):
+        await ingest(_stream(body, 13), RECORDS_MEDIA_TYPE, n_features=3, content_length=len(body), max_bytes=100)
+    # Without Content-Length the limit is enforced while the body arrives
+    with pytest.raises(StreamingIngestionTooLargeError):
+        await ingest(_stream(body, 13), RECORDS_MEDIA_TYPE, n_features=3, max_bytes=100)
+    assert len(await ingest(_stream(body, 13), RECORDS_MEDIA_TYPE, n_features=3, max_bytes=len(body))) == 10
+
+
+@pytest.mark.asyncio
+async def test_ingest_rejects_inconsistent_widths() -> None:
+    body = b"[0.1, 0.2]\n[0.3, 0.4, 0.5]\n"
+    with pytest.raises(StreamingIngestionError):
+        await ingest(_stream(body, 1 << 16), NDJSON_MEDIA_TYPE)
+    with pytest.raises(StreamingIngestionError):
+        await ingest(_stream(body, 4), NDJSON_MEDIA_TYPE)
+
+
+def test_read_feature_matrix_matches_validated_samples() -> None:
+    rows = np.random.default_rng(0).random((50, 6))
+    expected = np.array([Sample(features=row).features for row in rows.tolist()])
+
+    matrix = read_feature_matrix(orjson.dumps({"features": rows.tolist()}))
+    encoded = read_feature_matrix(orjson.dumps({
+        "features_base64": base64.b64encode(rows.astype("<f8").tobytes()).decode(), "n_features": 6
+    }))
+
+    assert np.array_equal(matrix, expected)
+    assert np.array_equal(encoded, expected)
+    assert read_feature_matrix(b'{"features": []}').shape == (0, 0)
+
+
+@pytest.mark.parametrize("body", [
+    b"not json",
+    b"[[0.1, 0.2]]",
+    b'{"features": [[0.1, 0.2], [0.3]]}',
+    b'{"features": [0.1, 0.2]}',
+    b'{"features_base64": "AAAA", "n_features": 0}',
+    b'{"features_base64": "not base64!", "n_features": 1}',
+    b'{"features_base64": "AAAAAAAA", "n_features": 2}',
+    orjson.dumps({"features_base64": base64.b64encode(np.array([0.1, np.nan]).tobytes()).decode(), "n_features": 2}),
+    orjson.dumps({"features_base64": base64.b64encode(np.array([np.inf, 0.2]).tobytes()).decode(), "n_features": 2})
+])
+def test_read_feature_matrix_rejects_malformed_bodies(body: bytes) -> None:
+    with pytest.raises(InvalidFeatureMatrixError):
+        read_feature_matrix(body)
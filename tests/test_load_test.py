@@ -0,0 +1,56 @@
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.load_test import EndpointStatistics, _drive_at_rate, _wait_for_training
+
+
+def test_endpoint_statistics_summary() -> None:
+    statistics = EndpointStatistics("/predict")
+    for latency in range(1, 101):
+        statistics.record(latency / 1000, 200)
+    statistics.record(0.5, 503)
+    statistics.record(0.5, None)
+
+    summary = statistics.summarize(duration=2.0)
+    assert summary["requests"] == 102
+    assert summary["throughput_rps"] == 51.0
+    assert summary["error_rate"] == round(2 / 102, 5)
+    assert summary["status_codes"] == {"200": 100, "503": 1}
+    assert summary["latency_ms"]["p50"] < summary["latency_ms"]["p95"] <= summary["latency_ms"]["p99"]
+    assert summary["latency_ms"]["max"] == 500.0
+
+
+def test_endpoint_statistics_summary_without_requests() -> None:
+    summary = EndpointStatistics("/status").summarize(duration=1.0)
+    assert summary["requests"] == 0
+    assert summary["error_rate"] is None
+    assert summary["latency_ms"]["p99"] is None
+
+
+@pytest.mark.asyncio
+async def test_drive_at_rate_schedules_requests_on_fixed_clock() -> None:
+    tasks: list[asyncio.Task] = []
+
+    async def request() -> None:
+        await asyncio.sleep(0.2)
+
+    await _drive_at_rate(qps=20, duration=0.225, request_factory=request, tasks=tasks)
+    assert len(tasks) == 5
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_training_ignores_the_previous_run() -> None:
+    statuses = iter([
+        {"status": "Training has finished", "start_time": "2024-01-01 10:00:00"},
+        {"status": "Training in progress", "start_time": "2024-01-01 10:05:00"},
+        {"status": "Training has finished", "start_time": "2024-01-01 10:05:00"}
+    ])
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=next(statuses)))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        status = await _wait_for_training(client, timeout=5, previous_start_time="2024-01-01 10:00:00")
+
+    assert status["start_time"] == "2024-01-01 10:05:00"
@@ -0,0 +1,103 @@
+import random
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import services
+from data.models import Dataset, Sample
+from exceptions import MemoryBudgetExceededError
+from ml.helpers import MemoryTracker, TrainingStatus, get_rss_bytes, memory_tracking
+from ml.models import ensemble_random_forest_based_regressor
+
+
+@pytest.fixture
+def dataset_small() -> Dataset:
+    return Dataset(samples=[Sample(features=[random.random() for _ in range(10)]) for _ in range(100)])
+
+
+def test_get_rss_bytes() -> None:
+    assert get_rss_bytes() > 0
+
+
+def test_memory_tracker_records_stage_allocations() -> None:
+    tracker = MemoryTracker(sampling_interval=0.001)
+    tracker.start()
+    try:
+        with tracker.track_stage("allocate"):
+            array = np.ones(4 * 2 ** 20, dtype=np.uint8)
+            del array
+    finally:
+        tracker.stop()
+
+    report = tracker.get_report()
+    assert report["budget_bytes"] is None
+    assert set(report["stages"]) == {"allocate"}
+    usage = report["stages"]["allocate"]
+    assert usage["peak_traced_bytes"] >= 4 * 2 ** 20
+    assert usage["peak_rss_bytes"] > 0
+
+
+def test_memory_tracker_raises_when_budget_is_exceeded() -> None:
+    tracker = MemoryTracker(budget_bytes=1)
+    with pytest.raises(MemoryBudgetExceededError) as error:
+        with tracker.track_stage("split"):
+            pass
+    assert error.value.stage == "split"
+    assert error.value.budget_bytes == 1
+
+
+def test_memory_tracker_does_not_fail_a_completed_stage(monkeypatch) -> None:
+    rss = [10]
+    monkeypatch.setattr(memory_tracking, "get_rss_bytes", lambda: rss[0])
+    tracker = MemoryTracker(budget_bytes=100)
+
+    with tracker.track_stage("fit"):
+        rss[0] = 200
+    assert "fit" in tracker.get_report()["stages"]
+
+    with pytest.raises(MemoryBudgetExceededError) as error:
+        with tracker.track_stage("next"):
+            pass
+    assert error.value.stage == "next"
+
+
+def test_memory_trackers_share_tracemalloc() -> None:
+    assert not tracemalloc.is_tracing()
+    first, second = MemoryTracker(), MemoryTracker()
+    first.start()
+    second.start()
+
+    first.stop()
+    assert tracemalloc.is_tracing()
+    with second.track_stage("allocate"):
+        array = np.ones(4 * 2 ** 20, dtype=np.uint8)
+        second._sample()
+        del array
+    second.stop()
+
+    assert second.get_report()["stages"]["allocate"]["peak_traced_bytes"] >= 4 * 2 ** 20
+    assert not tracemalloc.is_tracing()
+
+
+@pytest.mark.asyncio
+async def test_train_model_reports_memory_per_stage(monkeypatch, dataset_small) -> None:
+    monkeypatch.setattr(services, "TRACK_TRAINING_MEMORY", True)
+    await services.train_model(dataset_small)
+
+    model_status = await services.get_model_status()
+    assert model_status["status"] == TrainingStatus.FINISHED.value
+    stages = model_status["memory"]["stages"]
+    assert {"split", "labeling", "fit"} <= set(stages)
+    assert {f"fit_member_{index}" for index in range(services.NUMBER_OF_ENSEMBLE_MODELS)} <= set(stages)
+    ensemble_random_forest_based_regressor.reset_status()
+
+
+@pytest.mark.asyncio
+async def test_train_model_aborts_when_memory_budget_is_exceeded(monkeypatch, dataset_small) -> None:
+    monkeypatch.setattr(services, "TRAINING_MEMORY_BUDGET_MB", 1)
+    await services.train_model(dataset_small)
+
+    assert ensemble_random_forest_based_regressor.status == TrainingStatus.ERROR
+    assert ensemble_random_forest_based_regressor.get_regressors() == []
+    ensemble_random_forest_based_regressor.reset_status()
@@ -0,0 +1,57 @@
+import asyncio
+import pstats
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import profiling
+from profiling import ProfilingSession, get_profile_path, list_profiles, profile_coroutine, run_in_executor
+
+
+def _busy_worker_function(seconds: float) -> int:
+    deadline = time.perf_counter() + seconds
+    iterations = 0
+    while time.perf_counter() < deadline:
+        iterations += 1
+    return iterations
+
+
+async def _run_workers() -> list[int]:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        return await asyncio.gather(*[run_in_executor(executor, _busy_worker_function, 0.05) for _ in range(2)])
+
+
+@pytest.mark.asyncio
+async def test_profiling_session_covers_executor_threads(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(profiling, "PROFILES_DIRECTORY", str(tmp_path))
+    session = ProfilingSession("test", sampling_interval=0.001)
+    results = await profile_coroutine(session, _run_workers)
+    assert len(results) == 2
+
+    paths = session.save(str(tmp_path))
+    with open(paths["collapsed"]) as file:
+        stacks = file.read().splitlines()
+    assert any("_busy_worker_function" in stack for stack in stacks)
+    assert all(stack.rsplit(" ", 1)[1].isdigit() for stack in stacks)
+
+    if "pstats" in paths:
+        functions = {function for _, _, function in pstats.Stats(paths["pstats"]).stats}
+        assert "_busy_worker_function" in functions
+
+
+@pytest.mark.asyncio
+async def test_run_in_executor_without_active_session() -> None:
+    assert await run_in_executor(None, sum, [1, 2, 3]) == 6
+
+
+def test_list_and_get_profiles(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(profiling, "PROFILES_DIRECTORY", str(tmp_path))
+    (tmp_path / "train-1.pstats").write_bytes(b"")
+    (tmp_path / "train-1.collapsed").write_text("")
+
+    assert list_profiles() == {"train-1": ["collapsed", "pstats"]}
+    assert get_profile_path("train-1", "collapsed") == str(tmp_path / "train-1.collapsed")
+    assert get_profile_path("train-1", "svg") is None
+    assert get_profile_path("../train-1", "pstats") is None
+    assert get_profile_path("train-2", "pstats") is None
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+
+import pytest
+
+from ml.helpers import ExperimentTracker, ProgressBroadcaster, TrainingStatus
+from ml.models import EnsembleRandomForestBasedRegressor
+
+
+@pytest.mark.asyncio
+async def test_progress_broadcaster_fans_out_each_event_to_all_subscribers() -> None:
+    broadcaster = ProgressBroadcaster()
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+
+    broadcaster.publish("stage", stage="labeling", state="started")
+    await asyncio.sleep(0)
+
+    for subscription in (first, second):
+        event = await subscription.get(timeout=1)
+        assert event["id"] == 1
+        assert event["event"] == "stage"
+        assert event["stage"] == "labeling"
+        assert await subscription.get(timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_progress_broadcaster_drops_oldest_events_of_slow_subscribers() -> None:
+    broadcaster = ProgressBroadcaster(buffer_size=2)
+    subscription = broadcaster.subscribe()
+
+    for index in range(5):
+        broadcaster.publish("member", member=index)
+    await asyncio.sleep(0)
+
+    event = await subscription.get(timeout=1)
+    assert event["member"] == 3
+    assert event["dropped"] == 3
+    assert "dropped" not in await subscription.get(timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_progress_broadcaster_accepts_events_from_other_threads() -> None:
+    broadcaster = ProgressBroadcaster()
+    subscription = broadcaster.subscribe()
+
+    thread = threading.Thread(target=broadcaster.publish, args=("member",), kwargs={"member": 0})
+    thread.start()
+    thread.join()
+
+    event = await subscription.get(timeout=1)
+    assert event["member"] == 0
+
+
+@pytest.mark.asyncio
+async def test_progress_broadcaster_stops_delivering_after_unsubscribe() -> None:
+    broadcaster = ProgressBroadcaster()
+    subscription = broadcaster.subscribe()
+    broadcaster.unsubscribe(subscription)
+
+    broadcaster.publish("training", status=TrainingStatus.FINISHED.value)
+    await asyncio.sleep(0)
+
+    assert broadcaster.subscribers == 0
+    assert broadcaster.sequence == 1
+    assert await subscription.get(timeout=0.01) is None
+
+
+def test_experiment_tracker_publishes_training_transitions() -> None:
+    regressor = EnsembleRandomForestBasedRegressor()
+    regressor.name = "fraud"
+    published = []
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(ExperimentTracker, "publish", lambda *args, **kwargs: published.append((args, kwargs)))
+        ExperimentTracker.handle_training_started(regressor)
+        regressor._set_member_status(0, TrainingStatus.FINISHED)
+        ExperimentTracker.handle_training_finished(regressor)
+
+    assert [args[1] for args, _ in published] == ["training", "member", "training"]
+    assert published[1][1] == {"member": 0, "status": TrainingStatus.FINISHED.value}
+    assert published[2][1] == {"status": TrainingStatus.FINISHED.value}
+
+
+def test_failed_stage_publishes_its_end() -> None:
+    import services
+    from exceptions import MemoryBudgetExceededError
+    from ml.helpers import MemoryTracker
+
+    published = []
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(ExperimentTracker, "publish", lambda *args, **kwargs: published.append(kwargs))
+        with pytest.raises(MemoryBudgetExceededError):
+            with services._track_stage(MemoryTracker(), "labeling"):
+                raise MemoryBudgetExceededError("labeling", 2, 1)
+
+    assert [event["state"] for event in published] == ["started", "failed"]
+    assert published[1]["stage"] == "labeling"
+    assert published[1]["error"]
+
+
+@pytest.mark.asyncio
+async def test_stream_progress_starts_from_status_snapshot() -> None:
+    import services
+    from ml.helpers import get_progress_broadcaster
+
+    stream = services.stream_progress(heartbeat_seconds=0.01)
+    snapshot = await stream.__anext__()
+    assert snapshot.startswith(b"id: ")
+    assert b"event: status\n" in snapshot
+
+    assert await stream.__anext__() == b": heartbeat\n\n"
+
+    get_progress_broadcaster().publish("stage", stage="split", state="started")
+    event = await stream.__anext__()
+    assert b"event: stage\n" in event
+    assert b'"stage":"split"' in event
+
+    await stream.aclose()
+    assert get_progress_broadcaster().subscribers == 0
@@ -0,0 +1,57 @@
+from typing import Coroutine
+
+import pytest
+
+from data.models import Dataset, Sample
+from exceptions import InvalidModelNameError, UnknownModelError
+from ml.helpers import TrainingStatus
+from ml.models import ModelRegistry, RandomForestBasedRegressor
+
+
+async def _train(registry: ModelRegistry, name: str, dataset: Dataset) -> None:
+    ensemble = registry.get_or_create(name)
+    ensemble.register_regressor(RandomForestBasedRegressor())
+    await ensemble.fit([dataset])
+    await registry.commit(name)
+
+
+@pytest.mark.asyncio
+async def test_registry_evicts_least_recently_used_model_and_reloads_it(
+        dataset: Coroutine[None, None, Dataset], correct_shape_sample: Sample, tmp_path
+) -> None:
+    _dataset = await dataset
+    registry = ModelRegistry(directory=str(tmp_path))
+    await _train(registry, "first", _dataset)
+    # A budget of a single model keeps only the most recently used one in memory
+    registry.budget_bytes = registry.resident_bytes
+    await _train(registry, "second", _dataset)
+
+    metrics = registry.get_metrics()
+    assert metrics["resident_bytes"] <= metrics["budget_bytes"]
+    assert not metrics["models"]["first"]["resident"] and metrics["models"]["second"]["resident"]
+    assert metrics["models"]["first"]["evictions"] == 1
+    assert registry.get_status("first")["status"] == TrainingStatus.FINISHED.value
+
+    first = await registry.get("first")
+    assert first.status == TrainingStatus.FINISHED
+    assert (await first.predict_batch([correct_shape_sample])).shape == (1,)
+    await registry.get("first")
+
+    metrics = registry.get_metrics()
+    assert metrics["models"]["first"]["resident"] and not metrics["models"]["second"]["resident"]
+    assert metrics["models"]["first"]["reloads"] == 1
+    assert metrics["models"]["first"]["hit_rate"] == 0.5
+    assert metrics["models"]["first"]["mean_reload_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_registry_rejects_unknown_and_invalid_models(tmp_path) -> None:
+    registry = ModelRegistry(directory=str(tmp_path))
+    with pytest.raises(UnknownModelError):
+        await registry.get("missing")
+    with pytest.raises(UnknownModelError):
+        registry.get_status("missing")
+    with pytest.raises(InvalidModelNameError):
+        registry.get_or_create("../escape")
+    with pytest.raises(InvalidModelNameError):
+        registry.get_or_create("trailing\n")
@@ -1,20 +1,32 @@
-from typing import Coroutine
+import asyncio
+import time
+from typing import AsyncIterator, Coroutine
 
 import numpy as np
 import pytest
 
+from data.extractors import NearestNeighborsBasedRepresentativenessExtractor
 from data.models import Dataset, Sample
+from data.processors import DatasetProcessor
 from exceptions import (
     EnsembleModelFitWithoutComponentRegressorsRegisteredError,
-    InferenceSampleHasUnexpectedShapeError
+    InferenceSampleHasUnexpectedShapeError,
+    ModelNotFittedError,
+    UnknownRegressorBackendError,
+    UnsupportedNNeighborsError
 )
 
 from ml.helpers import ExperimentTracker, TrainingStatus
 from ml.models import (
+    REGRESSOR_BACKENDS,
     EnsembleRandomForestBasedRegressor,
+    HistGradientBoostingBasedRegressor,
+    NearestNeighborsBasedRegressor,
     RandomForestBasedRegressor,
-    Regressor
+    Regressor,
+    get_regressor_backend
 )
+from ml.models.regressors import ESTIMATORS_STEP, OOB_IMPROVEMENT_TOLERANCE
 
 
 @pytest.mark.parametrize("number_of_estimators", [0, 10])
@@ -218,3 +230,273 @@ async def test_predict_ensemble_random_forest_based_regressor_on_labeled_dataset
         assert np.isnan(prediction)
 
     ensemble_regressor.deregister_regressors()
+
+
+@pytest.mark.asyncio
+async def test_random_forest_based_regressor_schema_is_computed_at_fit_time(
+        dataset: Coroutine[None, None, Dataset]
+) -> None:
+    _dataset = await dataset
+    regressor: Regressor = RandomForestBasedRegressor()
+    assert regressor.schema is None
+
+    with pytest.raises(ModelNotFittedError):
+        regressor.predict(Sample(features=[0.5 for _ in range(100)]))
+
+    regressor.fit(_dataset)
+    assert regressor.schema.n_features_in == 100
+    assert regressor.schema.dtype == "float64"
+
+    previous_version = regressor.schema.version
+    regressor.fit(_dataset)
+    assert regressor.schema.version != previous_version
+
+
+@pytest.mark.asyncio
+async def test_predict_batch_ensemble_random_forest_based_regressor(
+        dataset: Coroutine[None, None, Dataset], correct_shape_sample: Sample, incorrect_shape_sample: Sample
+) -> None:
+    _dataset = await dataset
+    for sample in _dataset.samples:
+        sample.representativeness = 1.0
+
+    ensemble_regressor = EnsembleRandomForestBasedRegressor()
+    ensemble_regressor.register_regressor(RandomForestBasedRegressor())
+    ensemble_regressor.register_regressor(RandomForestBasedRegressor())
+    await ensemble_regressor.fit([_dataset, _dataset])
+    assert ensemble_regressor.schema.n_features_in == 100
+
+    predictions = await ensemble_regressor.predict_batch([correct_shape_sample, correct_shape_sample])
+    assert predictions.shape == (2,)
+    assert predictions[0] == await ensemble_regressor.predict(correct_shape_sample)
+    assert (await ensemble_regressor.predict_batch([])).shape == (0,)
+
+    with pytest.raises(InferenceSampleHasUnexpectedShapeError) as error:
+        await ensemble_regressor.predict_batch([correct_shape_sample, incorrect_shape_sample])
+    assert error.value.inference_sample_shape == (50,)
+    assert error.value.expected_sample_shape == (100,)
+
+    ensemble_regressor.reset_status()
+    assert ensemble_regressor.schema is None
+
+
+@pytest.mark.parametrize("backend", list(REGRESSOR_BACKENDS))
+@pytest.mark.asyncio
+async def test_ensemble_with_regressor_backend(
+        backend: str, dataset: Coroutine[None, None, Dataset], correct_shape_sample: Sample,
+        incorrect_shape_sample: Sample
+) -> None:
+    _dataset = await dataset
+    for sample in _dataset.samples:
+        sample.representativeness = sample.features[0]
+
+    ensemble_regressor = EnsembleRandomForestBasedRegressor()
+    ensemble_regressor.register_regressor(get_regressor_backend(backend)())
+    ensemble_regressor.register_regressor(get_regressor_backend(backend)())
+    await ensemble_regressor.fit([_dataset, _dataset])
+
+    assert ensemble_regressor.status == TrainingStatus.FINISHED
+    predictions = await ensemble_regressor.predict_batch([correct_shape_sample, correct_shape_sample])
+    assert predictions.shape == (2,) and not np.any(np.isnan(predictions))
+
+    with pytest.raises(InferenceSampleHasUnexpectedShapeError):
+        await ensemble_regressor.predict(incorrect_shape_sample)
+
+    ensemble_regressor.deregister_regressors()
+
+
+def test_get_unknown_regressor_backend() -> None:
+    with pytest.raises(UnknownRegressorBackendError):
+        get_regressor_backend("unknown")
+
+
+def test_nearest_neighbors_based_regressor_matches_extracted_representativeness(
+        features: np.ndarray, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "3")
+    regressor = NearestNeighborsBasedRegressor()
+    regressor.fit(Dataset(samples=[Sample(features=row.tolist()) for row in features]))
+
+    queries = np.array([[1.5, 2.5, 3.5, 4.5, 5.5], [10, 10, 10, 10, 10]])
+    predictions = regressor.predict_batch([Sample(features=row.tolist()) for row in queries])
+
+    for query, prediction in zip(queries, predictions):
+        expected = NearestNeighborsBasedRepresentativenessExtractor.extract(np.vstack([features, query]))[-1]
+        assert np.isclose(prediction, expected)
+
+
+@pytest.mark.asyncio
+async def test_save_and_restore_ensemble_random_forest_based_regressor(
+        dataset: Coroutine[None, None, Dataset], correct_shape_sample: Sample, tmp_path
+) -> None:
+    _dataset = await dataset
+    ensemble_regressor = EnsembleRandomForestBasedRegressor()
+    ensemble_regressor.register_regressor(RandomForestBasedRegressor())
+    await ensemble_regressor.fit([_dataset])
+    path = str(tmp_path / "model.pkl")
+    ensemble_regressor.save(path)
+
+    restored_regressor = EnsembleRandomForestBasedRegressor()
+    restored_regressor.restore(EnsembleRandomForestBasedRegressor.read_state(path))
+
+    assert restored_regressor.status == TrainingStatus.FINISHED
+    assert restored_regressor.schema == ensemble_regressor.schema
+    np.testing.assert_array_equal(
+        await restored_regressor.predict_batch([correct_shape_sample]),
+        await ensemble_regressor.predict_batch([correct_shape_sample])
+    )
+
+
+@pytest.mark.asyncio
+async def test_fit_random_forest_based_regressor_with_adaptive_estimators(
+        dataset: Coroutine[None, None, Dataset]
+) -> None:
+    _dataset = DatasetProcessor.run_labeling(await dataset, NearestNeighborsBasedRepresentativenessExtractor())
+    regressor = RandomForestBasedRegressor(adaptive_estimators=True)
+    regressor.fit(_dataset)
+
+    assert 0 < regressor.n_estimators <= regressor.max_estimators
+    assert len(regressor.model.estimators_) == regressor.n_estimators
+    assert len(regressor.oob_errors) == -(-regressor.n_estimators // ESTIMATORS_STEP)
+    assert all(np.isfinite(regressor.oob_errors))
+    if regressor.n_estimators < regressor.max_estimators:
+        assert regressor.oob_errors[-1] >= regressor.oob_errors[-2] * (1 - OOB_IMPROVEMENT_TOLERANCE)
+
+
+@pytest.mark.parametrize("weights", [None, [3]])
+def test_fit_random_forest_based_regressor_with_adaptive_estimators_without_oob_rows(weights: list[int] | None) -> None:
+    # A single row is in the bootstrap sample of every tree, so no out-of-bag error is ever available
+    dataset = Dataset(samples=[Sample(features=[0.1, 0.2], representativeness=0.5)], weights=weights)
+    regressor = RandomForestBasedRegressor(adaptive_estimators=True)
+    regressor.fit(dataset)
+
+    assert regressor.n_estimators == regressor.max_estimators
+    assert regressor.oob_errors == []
+
+
+def test_fit_random_forest_based_regressor_with_weights_matches_repeated_samples(features: np.ndarray) -> None:
+    samples = [Sample(features=row.tolist(), representativeness=index / 10) for index, row in enumerate(features)]
+    weights = [1, 4, 1, 2, 1]
+    weighted_dataset = Dataset(samples=samples, weights=weights)
+    repeated_dataset = Dataset(samples=[sample for sample, weight in zip(samples, weights) for _ in range(weight)])
+
+    weighted_regressor, repeated_regressor = HistGradientBoostingBasedRegressor(), HistGradientBoostingBasedRegressor()
+    weighted_regressor.fit(weighted_dataset)
+    repeated_regressor.fit(repeated_dataset)
+
+    assert np.allclose(weighted_regressor.predict_batch(samples), repeated_regressor.predict_batch(samples))
+
+
+@pytest.mark.asyncio
+async def test_fit_pipelined_ensemble_random_forest_based_regressor(
+        dataset: Coroutine[None, None, Dataset], correct_shape_sample: Sample
+) -> None:
+    _dataset = await dataset
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in range(3):
+        regressor.register_regressor(RandomForestBasedRegressor())
+
+    chunks = DatasetProcessor.stream_supervised(_dataset, 3, NearestNeighborsBasedRepresentativenessExtractor())
+    await regressor.fit_pipelined(chunks, max_concurrency=2)
+
+    assert regressor.status == TrainingStatus.FINISHED
+    assert all(member.schema is not None for member in regressor.get_regressors())
+    assert (await regressor.predict_batch([correct_shape_sample])).shape == (1,)
+
+
+@pytest.mark.asyncio
+async def test_fit_pipelined_waits_for_started_members_without_blocking_the_loop(
+        dataset: Coroutine[None, None, Dataset], monkeypatch
+) -> None:
+    _dataset = await dataset
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in range(2):
+        regressor.register_regressor(RandomForestBasedRegressor())
+    fit = RandomForestBasedRegressor.fit
+
+    def _slow_fit(self, dataset: Dataset) -> None:
+        time.sleep(0.5)
+        fit(self, dataset)
+
+    monkeypatch.setattr(RandomForestBasedRegressor, "fit", _slow_fit)
+
+    async def _failing_chunks() -> AsyncIterator[tuple[int, Dataset]]:
+        chunks = await DatasetProcessor.to_supervised(_dataset, 2, NearestNeighborsBasedRepresentativenessExtractor())
+        yield 0, chunks[0]
+        raise RuntimeError("Labeling has failed")
+
+    max_lag = 0.0
+
+    async def _monitor() -> None:
+        nonlocal max_lag
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.perf_counter() - start - 0.01)
+
+    monitoring = asyncio.ensure_future(_monitor())
+    await regressor.fit_pipelined(_failing_chunks())
+    # Lets the monitor observe the last sleep, which a blocked loop would have overrun
+    await asyncio.sleep(0.05)
+    monitoring.cancel()
+    await asyncio.gather(monitoring, return_exceptions=True)
+
+    assert max_lag < 0.25
+    assert regressor.status == TrainingStatus.ERROR
+    assert regressor.get_regressors()[0].schema is not None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compaction_tolerance", [None, 0.0])
+async def test_predict_anytime_ensemble_random_forest_based_regressor(
+        dataset: Coroutine[None, None, Dataset], correct_shape_sample: Sample, compaction_tolerance: float | None
+) -> None:
+    _dataset = await dataset
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in range(2):
+        regressor.register_regressor(RandomForestBasedRegressor(compaction_tolerance=compaction_tolerance))
+    chunks = await DatasetProcessor.to_supervised(_dataset, 2, NearestNeighborsBasedRepresentativenessExtractor())
+    await regressor.fit(chunks)
+    samples = [correct_shape_sample] * 3
+
+    full = await regressor.predict_anytime(samples)
+    assert full.trees_used == full.trees_total == 200
+    assert np.allclose(full.representativeness, await regressor.predict_batch(samples), atol=1e-4)
+
+    partial = await regressor.predict_anytime(samples, tree_fraction=0.1)
+    assert partial.trees_used == 20
+    assert len(partial.representativeness) == len(partial.variance) == 3
+    assert all(variance >= 0 for variance in partial.variance)
+
+    hurried = await regressor.predict_anytime(samples, deadline_seconds=0)
+    assert hurried.trees_used == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("regressor_class", [RandomForestBasedRegressor, HistGradientBoostingBasedRegressor])
+async def test_ensemble_trained_on_several_k_predicts_each_k(
+        dataset: Coroutine[None, None, Dataset],
+        correct_shape_sample: Sample,
+        monkeypatch: pytest.MonkeyPatch,
+        regressor_class: type[Regressor]
+) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "3,7")
+    _dataset = await dataset
+    chunks = await DatasetProcessor.to_supervised(
+        _dataset, splits=2, extractor=NearestNeighborsBasedRepresentativenessExtractor()
+    )
+    assert len(chunks[0].samples[0].representativeness) == 2
+
+    ensemble_regressor = EnsembleRandomForestBasedRegressor()
+    for _ in range(2):
+        ensemble_regressor.register_regressor(regressor_class())
+    await ensemble_regressor.fit(chunks)
+
+    assert ensemble_regressor.status == TrainingStatus.FINISHED
+    assert ensemble_regressor.schema.n_neighbors == [3, 7]
+    default = await ensemble_regressor.predict_batch([correct_shape_sample])
+    assert default.shape == (1,)
+    assert np.array_equal(default, await ensemble_regressor.predict_batch([correct_shape_sample], n_neighbors=3))
+    assert (await ensemble_regressor.predict_batch([correct_shape_sample], n_neighbors=7)).shape == (1,)
+    with pytest.raises(UnsupportedNNeighborsError):
+        await ensemble_regressor.predict_batch([correct_shape_sample], n_neighbors=5)
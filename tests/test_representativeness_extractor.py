@@ -2,7 +2,11 @@ import numpy as np
 import pytest
 from pytest import MonkeyPatch
 
-from data.extractors import NearestNeighborsBasedRepresentativenessExtractor
+from data.extractors import (
+    CoresetBasedRepresentativenessExtractor,
+    NearestNeighborsBasedRepresentativenessExtractor,
+    ProjectedRepresentativenessExtractor
+)
 from exceptions import InvalidNNeighborsError
 
 
@@ -36,3 +40,142 @@ def test_nearest_neighbors_based_extractor_with_correct_n_neighbors_specified(
         assert representativeness.shape == expected_representativeness.shape == (features.shape[0],)
         assert np.array_equal(representativeness, expected_representativeness) or \
             np.all(np.isnan(representativeness) == np.isnan(expected_representativeness))
+
+
+@pytest.mark.parametrize("n_neighbors", [1, 2, 3, 6])
+def test_nearest_neighbors_based_extractor_with_weights_matches_expanded_features(
+        features: np.ndarray, monkeypatch: MonkeyPatch, n_neighbors: int
+) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", str(n_neighbors))
+    weights = np.array([3, 1, 2, 1, 1])
+    extractor = NearestNeighborsBasedRepresentativenessExtractor()
+
+    weighted_representativeness = extractor.extract(features.astype(float), weights)
+    expanded_representativeness = extractor.extract(np.repeat(features, weights, axis=0).astype(float))
+
+    assert np.allclose(
+        np.repeat(weighted_representativeness, weights), expanded_representativeness, equal_nan=True
+    )
+
+
+def _rank_correlation(first: np.ndarray, second: np.ndarray) -> float:
+    return float(np.corrcoef(np.argsort(np.argsort(first)), np.argsort(np.argsort(second)))[0, 1])
+
+
+def _clustered_features(n_rows_per_cluster: int) -> np.ndarray:
+    random_state = np.random.default_rng(0)
+    return np.concatenate([
+        random_state.normal(center, scale, (n_rows_per_cluster, 3))
+        for center, scale in zip(random_state.random((4, 3)) * 5, [0.1, 0.3, 0.6, 1.2])
+    ])
+
+
+@pytest.mark.parametrize("strategy", ["random", "stratified"])
+def test_coreset_based_extractor_ranks_samples_like_exact_labels(monkeypatch: MonkeyPatch, strategy: str) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "5")
+    features = _clustered_features(1000)
+    extractor = CoresetBasedRepresentativenessExtractor(500, strategy=strategy, random_state=0)
+
+    exact = NearestNeighborsBasedRepresentativenessExtractor().extract(features)
+    approximate = extractor.extract(features)
+
+    assert approximate.shape == exact.shape
+    assert np.all(np.isfinite(approximate))
+    assert _rank_correlation(approximate, exact) > 0.9
+    assert extractor.probe_rank_correlation(features, None, approximate) > 0.9
+
+
+def test_coreset_based_extractor_labels_exactly_below_rank_correlation_threshold(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "5")
+    # Exact labels of uniform data only reflect sampling noise, which a coreset cannot reproduce
+    features = np.random.default_rng(0).random((4000, 3))
+    exact = NearestNeighborsBasedRepresentativenessExtractor().extract(features)
+
+    approximate = CoresetBasedRepresentativenessExtractor(500, random_state=0).extract(features)
+    assert _rank_correlation(approximate, exact) < 0.8
+
+    gated = CoresetBasedRepresentativenessExtractor(500, random_state=0, min_rank_correlation=0.8).extract(features)
+    assert np.array_equal(gated, exact)
+
+
+def test_coreset_based_extractor_clamps_n_neighbors_to_stratified_coreset(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "20")
+    random_state = np.random.default_rng(0)
+    # Many small clusters next to a large one round to empty strata
+    features = np.concatenate(
+        [random_state.normal(0, 1, (3000, 3))] + [random_state.normal(3 * i, 0.5, (50, 3)) for i in range(20)]
+    )
+    extractor = CoresetBasedRepresentativenessExtractor(20, strategy="stratified", random_state=0)
+    assert len(extractor._sample_coreset(features, None, np.random.default_rng(0))) < 20
+
+    representativeness = extractor.extract(features)
+
+    assert representativeness.shape == (len(features),)
+    assert np.all(np.isfinite(representativeness))
+
+
+def test_coreset_based_extractor_falls_back_to_exact_labels_for_small_chunks(
+        features: np.ndarray, monkeypatch: MonkeyPatch
+) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "3")
+    exact = NearestNeighborsBasedRepresentativenessExtractor().extract(features)
+    assert np.array_equal(CoresetBasedRepresentativenessExtractor(10).extract(features), exact)
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_nearest_neighbors_based_extractor_labels_several_k_in_one_pass(
+        features: np.ndarray, monkeypatch: MonkeyPatch, weighted: bool
+) -> None:
+    weights = np.array([3, 1, 2, 1, 1]) if weighted else None
+    monkeypatch.setenv("N_NEIGHBORS", "3,1,5")
+    representativeness = NearestNeighborsBasedRepresentativenessExtractor.extract(features.astype(float), weights)
+    assert representativeness.shape == (features.shape[0], 3)
+
+    for column, n_neighbors in enumerate([3, 1, 5]):
+        monkeypatch.setenv("N_NEIGHBORS", str(n_neighbors))
+        expected = NearestNeighborsBasedRepresentativenessExtractor.extract(features.astype(float), weights)
+        assert np.allclose(representativeness[:, column], expected, equal_nan=True)
+
+
+def test_coreset_based_extractor_labels_several_k_in_one_pass(monkeypatch: MonkeyPatch) -> None:
+    features = np.random.default_rng(0).random((2000, 3))
+    extractor = CoresetBasedRepresentativenessExtractor(500, random_state=0)
+
+    monkeypatch.setenv("N_NEIGHBORS", "5,10")
+    representativeness = extractor.extract(features)
+    for column, n_neighbors in enumerate([5, 10]):
+        monkeypatch.setenv("N_NEIGHBORS", str(n_neighbors))
+        assert np.allclose(representativeness[:, column], extractor.extract(features))
+
+
+def test_projected_extractor_keeps_narrow_features(features: np.ndarray, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "3")
+    extractor = ProjectedRepresentativenessExtractor(NearestNeighborsBasedRepresentativenessExtractor(), 5)
+
+    assert np.array_equal(
+        extractor.extract(features), NearestNeighborsBasedRepresentativenessExtractor.extract(features)
+    )
+    assert extractor.get_report() is None
+
+
+@pytest.mark.parametrize("method", ["random", "pca"])
+def test_projected_extractor_labels_wide_features(monkeypatch: MonkeyPatch, method: str) -> None:
+    monkeypatch.setenv("N_NEIGHBORS", "5")
+    random_state = np.random.default_rng(0)
+    # 200 features spanning a 4-dimensional subspace
+    features = random_state.random((500, 4)) @ random_state.normal(size=(4, 200))
+    extractor = ProjectedRepresentativenessExtractor(
+        NearestNeighborsBasedRepresentativenessExtractor(), 4 if method == "pca" else 150, method=method, random_state=0
+    )
+
+    projected = extractor.extract(features)
+    exact = NearestNeighborsBasedRepresentativenessExtractor.extract(features)
+    report = extractor.get_report()
+
+    assert projected.shape == exact.shape
+    assert report.n_features_in == 200 and report.chunks == 1
+    if method == "pca":
+        assert report.max_distortion < 1e-6
+        assert np.allclose(projected, exact)
+    else:
+        assert report.mean_distortion < 0.2
@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import orjson
+import pytest
+from fastapi import HTTPException
+
+from responses import (
+    ARROW_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    NPY_MEDIA_TYPE,
+    encode_predictions,
+    negotiate_media_type
+)
+
+
+@pytest.fixture
+def predictions() -> np.ndarray:
+    return np.array([0.12345, 0.5, np.nan])
+
+
+@pytest.mark.parametrize(
+    "accept, expected_media_type",
+    [
+        (None, JSON_MEDIA_TYPE),
+        ("*/*", JSON_MEDIA_TYPE),
+        ("application/json", JSON_MEDIA_TYPE),
+        ("application/x-npy", NPY_MEDIA_TYPE),
+        ("text/html, application/x-npy;q=0.5, application/json;q=0.9", JSON_MEDIA_TYPE),
+        (f"{ARROW_MEDIA_TYPE}, */*;q=0.1", ARROW_MEDIA_TYPE),
+        ("application/x-npy;q=abc, application/json;q=0.5", JSON_MEDIA_TYPE),
+    ]
+)
+def test_negotiate_media_type(accept: str | None, expected_media_type: str) -> None:
+    assert negotiate_media_type(accept) == expected_media_type
+
+
+@pytest.mark.parametrize(
+    "accept", ["text/html", "application/json;q=0", "application/json;q=abc", "application/json;q="]
+)
+def test_negotiate_unsupported_media_type(accept: str) -> None:
+    with pytest.raises(HTTPException) as error:
+        negotiate_media_type(accept)
+    assert error.value.status_code == 406
+
+
+def test_encode_predictions_as_json(predictions: np.ndarray) -> None:
+    response = encode_predictions(predictions, JSON_MEDIA_TYPE)
+    assert response.media_type == JSON_MEDIA_TYPE
+    assert orjson.loads(response.body) == {"representativeness": [0.12345, 0.5, None]}
+
+
+def test_encode_predictions_as_npy(predictions: np.ndarray) -> None:
+    response = encode_predictions(predictions, NPY_MEDIA_TYPE)
+    decoded = np.load(io.BytesIO(response.body))
+    assert np.array_equal(decoded, predictions, equal_nan=True)
+
+
+def test_encode_predictions_as_arrow(predictions: np.ndarray) -> None:
+    pa = pytest.importorskip("pyarrow")
+    response = encode_predictions(predictions, ARROW_MEDIA_TYPE)
+    table = pa.ipc.open_stream(response.body).read_all()
+    assert table.column("representativeness").to_pylist()[:2] == [0.12345, 0.5]
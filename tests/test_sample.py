@@ -1,9 +1,10 @@
 import random
 
+import numpy as np
 import pytest
 from pydantic.error_wrappers import ValidationError
 
-from data.models import Sample
+from data.models import Sample, round_features
 
 
 @pytest.fixture
@@ -27,3 +28,17 @@ def test_representativeness_to_sample_assignment(sample: Sample) -> None:
     assert sample.representativeness is None
     sample.representativeness = random.random()
     assert sample.representativeness is not None
+
+
+def test_round_features_matches_sample_validator() -> None:
+    rng = np.random.default_rng(0)
+    # Decimal ties and their neighbours are where scaling before rounding goes wrong
+    ties = (rng.integers(-10 ** 9, 10 ** 9, 10_000) + 0.5) / 10 ** 5
+    features = np.concatenate([
+        rng.normal(0, 1000, 10_000), ties, np.nextafter(ties, np.inf), np.nextafter(ties, -np.inf),
+        rng.normal(0, 1e12, 100), [2.675, -2.675, 1.000005, -0.000015, 0.0, 1e300]
+    ])
+
+    expected = Sample(features=features.tolist()).features
+    assert round_features(features).tolist() == expected
+    assert round_features(features.reshape(-1, 2)).ravel().tolist() == expected
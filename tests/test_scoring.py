@@ -0,0 +1,50 @@
+import asyncio
+import io
+
+import numpy as np
+import orjson
+import pytest
+
+import scoring
+from data.extractors import NearestNeighborsBasedRepresentativenessExtractor
+from data.models import Dataset, Sample
+from data.processors import DatasetProcessor
+from ml.models import EnsembleRandomForestBasedRegressor, RandomForestBasedRegressor
+
+
+@pytest.fixture
+def model_path(tmp_path) -> str:
+    dataset = Dataset(samples=[Sample(features=np.random.random(5).tolist()) for _ in range(200)])
+    chunks = asyncio.run(
+        DatasetProcessor.to_supervised(dataset, 2, NearestNeighborsBasedRepresentativenessExtractor())
+    )
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in chunks:
+        regressor.register_regressor(RandomForestBasedRegressor(compaction_tolerance=0.0))
+    asyncio.run(regressor.fit(chunks))
+
+    path = str(tmp_path / "model.pkl")
+    regressor.save(path)
+    return path
+
+
+@pytest.mark.parametrize("input_format", ["npy", "ndjson"])
+def test_score_matches_ensemble_predictions(model_path: str, tmp_path, input_format: str) -> None:
+    features = np.random.random((1000, 5))
+    input_path = str(tmp_path / f"features.{input_format}")
+    if input_format == "npy":
+        np.save(input_path, features)
+    else:
+        with open(input_path, "wb") as file:
+            file.write(b"".join(orjson.dumps({"features": row}) + b"\n" for row in features.tolist()))
+
+    output = io.BytesIO()
+    report = scoring.score(model_path, input_path, output, workers=2, chunk_size=128)
+
+    regressor = EnsembleRandomForestBasedRegressor()
+    regressor.restore(EnsembleRandomForestBasedRegressor.read_state(model_path))
+    expected = asyncio.run(regressor.predict_batch([Sample(features=row) for row in features.tolist()]))
+
+    assert report["rows"] == 1000
+    assert report["rows_per_second"] > 0
+    assert np.array_equal(np.array(output.getvalue().split(), dtype=np.float64), expected)
@@ -0,0 +1,81 @@
+import random
+from typing import AsyncIterator
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+import services
+from data.models import Dataset, Sample
+from ml.models import EnsembleRandomForestBasedRegressor
+
+
+@pytest_asyncio.fixture
+async def fitted_ensemble() -> AsyncIterator[EnsembleRandomForestBasedRegressor]:
+    dataset = Dataset(samples=[Sample(features=[random.random() for _ in range(5)]) for _ in range(100)])
+    regressor = EnsembleRandomForestBasedRegressor()
+    for _ in range(3):
+        regressor.register_regressor(services.create_regressor())
+    await regressor.fit(await services.prepare_dataset(dataset, splits=3))
+    yield regressor
+    regressor.stop_shards()
+
+
+@pytest.mark.asyncio
+async def test_sharded_predictions_match_in_process_predictions(fitted_ensemble) -> None:
+    features = np.random.random((20, 5))
+    expected = await fitted_ensemble._predict(features)
+
+    fitted_ensemble.start_shards(2)
+
+    assert fitted_ensemble.shards.n_shards == 2
+    assert fitted_ensemble.get_verbose_status()["prediction_shards"] == 2
+    np.testing.assert_array_equal(await fitted_ensemble._predict(features), expected)
+    assert (await fitted_ensemble._predict(np.empty((0, 5)))).shape == (0,)
+
+
+@pytest.mark.asyncio
+async def test_sharding_never_starts_more_shards_than_members(fitted_ensemble) -> None:
+    fitted_ensemble.start_shards(8)
+
+    assert fitted_ensemble.shards.n_shards == 3
+
+
+@pytest.mark.asyncio
+async def test_prediction_falls_back_to_threads_when_a_shard_is_lost(fitted_ensemble) -> None:
+    features = np.random.random((5, 5))
+    expected = await fitted_ensemble._predict(features)
+    fitted_ensemble.start_shards(2)
+    fitted_ensemble.shards._processes[0].kill()
+    fitted_ensemble.shards._processes[0].join()
+
+    np.testing.assert_array_equal(await fitted_ensemble._predict(features), expected)
+    assert fitted_ensemble.shards is None
+
+
+@pytest.mark.asyncio
+async def test_member_error_keeps_shards_running(fitted_ensemble) -> None:
+    features = np.random.random((5, 5))
+    expected = await fitted_ensemble._predict(features)
+    fitted_ensemble.start_shards(2)
+    shards = fitted_ensemble.shards
+
+    # Members reject the request in the shards, and the in-process fallback rejects it the same way
+    with pytest.raises(ValueError):
+        await fitted_ensemble._predict(np.random.random((5, 3)))
+
+    assert fitted_ensemble.shards is shards
+    assert all(process.is_alive() for process in shards._processes)
+    assert len(await shards.predict(features)) == 3
+    np.testing.assert_array_equal(await fitted_ensemble._predict(features), expected)
+
+
+@pytest.mark.asyncio
+async def test_reset_status_stops_shard_processes(fitted_ensemble) -> None:
+    fitted_ensemble.start_shards(2)
+    processes = list(fitted_ensemble.shards._processes)
+
+    fitted_ensemble.reset_status()
+
+    assert fitted_ensemble.shards is None
+    assert not any(process.is_alive() for process in processes)